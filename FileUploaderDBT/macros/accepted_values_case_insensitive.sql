@@ -7,20 +7,21 @@ with all_values as (
         count(*) as n_records
 
     from {{ model }}
-    group by {{ column_name }}
+    where {{ column_name }} is not null
+    group by lower({{ column_name }})
+
+),
+
+accepted_values as (
+
+    {{ values_lookup(values, quote=quote, lower=True) }}
 
 )
-select *
+
+select all_values.*
 from all_values
-where value_field not in (
-    {% for value in values -%}
-        {% if quote -%}
-        '{{ value }}'
-        {%- else -%}
-        lower({{ value }})
-        {%- endif -%}
-        {%- if not loop.last -%},{%- endif %}
-    {%- endfor %}
-)
+left join accepted_values
+    on all_values.value_field = accepted_values.value_field
+where accepted_values.value_field is null
 
 {% endmacro %}
@@ -0,0 +1,20 @@
+{% macro values_lookup(values, quote=True, lower=False) %}
+
+    {#- Inline lookup relation that the test queries hash anti-join against -#}
+    select
+        {% if lower -%} lower(value_field) {%- else -%} value_field {%- endif %} as value_field
+    from (
+        values
+        {% for value in values -%}
+            (
+            {%- if quote -%}
+            '{{ value | replace("'", "''") }}'
+            {%- else -%}
+            {{ value }}
+            {%- endif -%}
+            )
+            {%- if not loop.last -%},{%- endif %}
+        {% endfor %}
+    ) as lookup (value_field)
+
+{% endmacro %}
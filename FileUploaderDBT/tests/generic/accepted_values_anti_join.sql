@@ -0,0 +1,27 @@
+{% test accepted_values_anti_join(model, column_name, values, quote=True) %}
+
+with all_values as (
+
+    select
+        {{ column_name }} as value_field,
+        count(*) as n_records
+
+    from {{ model }}
+    where {{ column_name }} is not null
+    group by {{ column_name }}
+
+),
+
+accepted_values as (
+
+    {{ values_lookup(values, quote=quote) }}
+
+)
+
+select all_values.*
+from all_values
+left join accepted_values
+    on all_values.value_field = accepted_values.value_field
+where accepted_values.value_field is null
+
+{% endtest %}
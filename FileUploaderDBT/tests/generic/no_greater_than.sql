@@ -0,0 +1,9 @@
+{% test no_greater_than(model, column_name, upper_boundary) %}
+
+    select *
+    from {{ model }}
+    where {{ column_name }} is not null
+        -- Non-numeric values can not be compared and are reported as failures
+        and coalesce(try_cast({{ column_name }} as double) > {{ upper_boundary }}, true)
+
+{% endtest %}
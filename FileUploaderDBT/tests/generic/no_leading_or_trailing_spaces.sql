@@ -2,6 +2,6 @@
  
     select *
     from {{ model }}
-    where ltrim(rtrim({{ column_name }})) != {{ column_name }}
+    where {{ column_name }} like ' %' or {{ column_name }} like '% '
  
-{% endtest %}
\ No newline at end of file
+{% endtest %}
@@ -2,6 +2,8 @@
 
     select *
     from {{ model }}
-    where CAST({{ column_name }} AS INT)  < {{ lower_boundary }}
+    where {{ column_name }} is not null
+        -- Non-numeric values can not be compared and are reported as failures
+        and coalesce(try_cast({{ column_name }} as double) < {{ lower_boundary }}, true)
 
-{% endtest %}
\ No newline at end of file
+{% endtest %}
@@ -0,0 +1,34 @@
+{% test relationships_to_reference(model, column_name, reference, reference_column=None, case_insensitive=False) %}
+
+{#- Reference tables are loaded into the same database by the application before the tests run -#}
+{%- set reference_relation = api.Relation.create(
+    database=model.database,
+    schema=model.schema,
+    identifier="reference_" ~ reference
+) -%}
+{%- set reference_column = reference_column or column_name -%}
+
+with upload_values as (
+
+    select distinct
+        {% if case_insensitive -%} lower(cast({{ column_name }} as varchar)) {%- else -%} cast({{ column_name }} as varchar) {%- endif %} as value_field
+    from {{ model }}
+    where {{ column_name }} is not null
+
+),
+
+reference_values as (
+
+    select distinct
+        {% if case_insensitive -%} lower(cast({{ reference_column }} as varchar)) {%- else -%} cast({{ reference_column }} as varchar) {%- endif %} as value_field
+    from {{ reference_relation }}
+
+)
+
+select upload_values.value_field
+from upload_values
+left join reference_values
+    on upload_values.value_field = reference_values.value_field
+where reference_values.value_field is null
+
+{% endtest %}
@@ -1,13 +1,37 @@
+import math
 import os
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
 import pandas as pd
-import pyarrow.parquet as pq
 import streamlit as st
 from azure.identity import ClientSecretCredential
 from azure.storage.filedatalake import DataLakeServiceClient
 
+from blob_cache import get_cached_file
+from explorer_export import (
+    EXPLORER_MAX_BYTES,
+    EXPORT_FORMATS,
+    ExportTooLargeError,
+    write_export,
+    write_zip_export,
+)
+from parquet_query import (
+    AGGREGATES,
+    FILTER_OPERATORS,
+    get_parquet_columns,
+    query_parquet_page,
+)
+from preview_grid import PAGE_SIZE_OPTIONS
+from session_store import scratch_file_path
+from submit_index import forget_submits
+from tracing import trace_stage
+
+# Number of files downloaded at the same time by multi-file Explorer actions
+EXPLORER_DOWNLOAD_WORKERS = int(os.getenv("EXPLORER_DOWNLOAD_WORKERS", "4"))
+
 
 def load_credentials():
     """
@@ -59,7 +83,8 @@ def list_files_in_directory(service_client, file_system_name, directory_name):
     List files in a specified directory in Azure Data Lake Storage.
 
     Args:
-        service_client (DataLakeServiceClient): The service client for the Azure Data Lake Storage account.
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
         file_system_name (str): The name of the file system.
         directory_name (str): The name of the directory.
 
@@ -67,11 +92,14 @@ def list_files_in_directory(service_client, file_system_name, directory_name):
         list: A list of file names in the directory.
     """
     try:
-        # Get the file system client
-        file_system_client = service_client.get_file_system_client(file_system_name)
-        # List all paths (files and directories) in the specified directory
-        paths = file_system_client.get_paths(path=directory_name)
-        return [path.name for path in paths]
+        with trace_stage("list", directory=directory_name) as span:
+            # Get the file system client
+            file_system_client = service_client.get_file_system_client(file_system_name)
+            # List all paths (files and directories) in the specified directory
+            paths = file_system_client.get_paths(path=directory_name)
+            file_names = [path.name for path in paths]
+            span["files"] = len(file_names)
+        return file_names
     except Exception as e:
         # Handle errors during file listing
         st.error(f"Failed to list files: {e}")
@@ -80,10 +108,11 @@ def list_files_in_directory(service_client, file_system_name, directory_name):
 
 def download_file(service_client, file_system_name, selected_file):
     """
-    Download a file from Azure Data Lake Storage.
+    Download a file from Azure Data Lake Storage, through the local blob cache.
 
     Args:
-        service_client (DataLakeServiceClient): The service client for the Azure Data Lake Storage account.
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
         file_system_name (str): The name of the file system.
         selected_file (str): The path of the file to download.
 
@@ -91,36 +120,66 @@ def download_file(service_client, file_system_name, selected_file):
         bytes: The contents of the downloaded file.
     """
     try:
-        # Get the file system client
-        file_system_client = service_client.get_file_system_client(file_system_name)
-        # Get the file client for the specified file
-        file_client = file_system_client.get_file_client(selected_file)
-        # Download the file
-        download = file_client.download_file()
-        return download.readall()
+        # Download the file, or revalidate the cached copy
+        cached_path = get_cached_file(service_client, file_system_name, selected_file)
+        with open(cached_path, "rb") as cached_file:
+            return cached_file.read()
     except Exception as e:
         # Handle errors during file download
         st.error(f"Failed to download file: {e}")
         return None
 
 
-def preview_parquet(data):
+def download_files_to_cache(service_client, file_system_name, selected_files):
+    """
+    Download several files from Azure Data Lake Storage into the local blob cache
+    concurrently, with at most EXPLORER_DOWNLOAD_WORKERS downloads at a time.
+
+    The files are streamed to disk, not held in memory.
+
+    Args:
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
+        file_system_name (str): The name of the file system.
+        selected_files (list): The paths of the files to download.
+
+    Returns:
+        list: The paths of the local copies, in the order of selected_files.
+    """
+    with ThreadPoolExecutor(
+        max_workers=max(min(EXPLORER_DOWNLOAD_WORKERS, len(selected_files)), 1)
+    ) as executor:
+        return list(
+            executor.map(
+                lambda selected_file: get_cached_file(
+                    service_client, file_system_name, selected_file
+                ),
+                selected_files,
+            )
+        )
+
+
+def preview_parquet(path):
     """
     Preview the first 50 rows of a Parquet file.
 
     Args:
-        data (bytes): The Parquet file data.
+        path (str): The path of the local Parquet file.
 
     Returns:
         pd.DataFrame: The first 50 rows of the Parquet file as a DataFrame.
     """
+    import pyarrow.parquet as pq
+
     try:
-        # Load data into a buffer
-        buffer = BytesIO(data)
-        # Read the Parquet table from the buffer
-        table = pq.read_table(buffer)
-        # Convert the table to a pandas DataFrame and return the first 50 rows
-        return table.to_pandas().head(50)
+        with trace_stage("preview", bytes=os.path.getsize(path)) as span:
+            parquet_file = pq.ParquetFile(path)
+            span["rows"] = parquet_file.metadata.num_rows
+            # Only the first rows are read, not the whole file
+            batch = next(parquet_file.iter_batches(batch_size=50), None)
+            if batch is None:
+                return parquet_file.schema_arrow.empty_table().to_pandas()
+            return batch.to_pandas()
     except Exception as e:
         # Handle errors during preview
         st.error(f"Failed to preview Parquet file: {e}")
@@ -137,46 +196,269 @@ def convert_parquet_to_excel(parquet_data):
     Returns:
         bytes: The contents of the Excel file.
     """
+    import pyarrow.parquet as pq
+
     try:
-        # Load data into a buffer
-        buffer = BytesIO(parquet_data)
-        # Read the Parquet table from the buffer
-        table = pq.read_table(buffer)
-        # Convert the table to a pandas DataFrame
-        df = table.to_pandas()
-        # Columns to drop from the DataFrame
-        columns_to_drop = [
-            "deltalake_loadtime",
-            "deltalake_filename",
-            "original_filename",
-        ]
-        # Drop specified columns if they exist
-        df.drop(
-            columns=[col for col in columns_to_drop if col in df.columns],
-            axis=1,
-            inplace=True,
-        )
-        # Create an Excel buffer
-        excel_buffer = BytesIO()
-        # Write the DataFrame to an Excel file
-        with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Sheet1")
-        return excel_buffer.getvalue()
+        with trace_stage("export", bytes=len(parquet_data)) as span:
+            # Load data into a buffer
+            buffer = BytesIO(parquet_data)
+            # Read the Parquet table from the buffer
+            table = pq.read_table(buffer)
+            span["rows"] = table.num_rows
+            # Convert the table to a pandas DataFrame
+            df = table.to_pandas()
+            # Columns to drop from the DataFrame
+            columns_to_drop = [
+                "deltalake_loadtime",
+                "deltalake_filename",
+                "original_filename",
+            ]
+            # Drop specified columns if they exist
+            df.drop(
+                columns=[col for col in columns_to_drop if col in df.columns],
+                axis=1,
+                inplace=True,
+            )
+            # Create an Excel buffer
+            excel_buffer = BytesIO()
+            # Write the DataFrame to an Excel file
+            with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
+                df.to_excel(writer, index=False, sheet_name="Sheet1")
+            span["exported_bytes"] = excel_buffer.getbuffer().nbytes
+            return excel_buffer.getvalue()
     except Exception as e:
         # Handle errors during conversion
         st.error(f"Failed to convert Parquet to Excel: {e}")
         return None
 
 
+def display_parquet_query(service_client, file_system_name, selected_files):
+    """
+    Query one or more Parquet files with filters, a column selection or
+    aggregates, and page through the result.
+
+    The files are queried by DuckDB from the local blob cache, so changing
+    the query or the page does not download them again.
+
+    Args:
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
+        file_system_name (str): The name of the file system.
+        selected_files (list): The paths of the Parquet files to query.
+    """
+    import duckdb
+
+    key = "explorer_query"
+    try:
+        with st.spinner("Downloading files..."):
+            paths = [
+                get_cached_file(service_client, file_system_name, selected_file)
+                for selected_file in selected_files
+            ]
+    except Exception as e:
+        st.error(f"Failed to download files: {e}")
+        return
+
+    # The column list of the files, for the query widgets
+    con = duckdb.connect(database=":memory:")
+    try:
+        columns = list(get_parquet_columns(con, paths))
+    except duckdb.Error as e:
+        st.error(f"Failed to read the files: {e}")
+        return
+    finally:
+        con.close()
+
+    with st.expander(f"Query: {', '.join(selected_files)}", expanded=True):
+        filters_df = st.data_editor(
+            pd.DataFrame({"Column": [], "Operator": [], "Value": []}, dtype=str),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "Column": st.column_config.SelectboxColumn(options=columns),
+                "Operator": st.column_config.SelectboxColumn(
+                    options=list(FILTER_OPERATORS)
+                ),
+            },
+            key=f"{key}_filters",
+        )
+        columns_col, group_col = st.columns(2)
+        with columns_col:
+            selected_columns = st.multiselect("Columns", columns, key=f"{key}_columns")
+        with group_col:
+            group_by = st.multiselect("Group by", columns, key=f"{key}_group_by")
+        aggregates_df = st.data_editor(
+            pd.DataFrame({"Function": [], "Column": []}, dtype=str),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "Function": st.column_config.SelectboxColumn(options=list(AGGREGATES)),
+                "Column": st.column_config.SelectboxColumn(options=columns),
+            },
+            key=f"{key}_aggregates",
+        )
+
+        filters = [
+            (row["Column"], row["Operator"], row["Value"])
+            for row in filters_df.to_dict("records")
+            if row["Column"] and row["Operator"]
+        ]
+        aggregates = [
+            (row["Function"], row["Column"])
+            for row in aggregates_df.to_dict("records")
+            if row["Function"] and row["Column"]
+        ]
+        page_size = st.selectbox("Rows per page", PAGE_SIZE_OPTIONS, key=f"{key}_size")
+
+        # Go back to the first page whenever the query changes
+        view = (
+            tuple(selected_files),
+            tuple(filters),
+            tuple(selected_columns),
+            tuple(group_by),
+            tuple(aggregates),
+            page_size,
+        )
+        if st.session_state.get(f"{key}_view") != view:
+            st.session_state[f"{key}_view"] = view
+            st.session_state[f"{key}_page"] = 1
+
+        page_number = st.session_state.get(f"{key}_page", 1)
+        try:
+            with trace_stage("query", files=len(paths)) as span:
+                page, matching_rows = query_parquet_page(
+                    paths,
+                    (page_number - 1) * page_size,
+                    page_size,
+                    columns=selected_columns,
+                    filters=filters,
+                    group_by=group_by,
+                    aggregates=aggregates,
+                )
+                span["rows"] = matching_rows
+        except (duckdb.Error, ValueError) as e:
+            st.error(f"Failed to query the files: {e}")
+            return
+
+        st.dataframe(page, use_container_width=True, hide_index=True)
+
+        page_count = max(math.ceil(matching_rows / page_size), 1)
+        info_col, page_col = st.columns([4, 1])
+        with page_col:
+            st.number_input(
+                f"Page (of {page_count:,})",
+                min_value=1,
+                max_value=page_count,
+                key=f"{key}_page",
+            )
+        with info_col:
+            st.caption(f"{matching_rows:,} rows")
+
+
+def display_export(service_client, file_system_name, selected_files):
+    """
+    Export several Parquet files as one combined file or as a zip archive with
+    one export per file.
+
+    Combined exports unify the schemas of the files, so files with added,
+    removed or widened columns can be combined.
+
+    Args:
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
+        file_system_name (str): The name of the file system.
+        selected_files (list): The paths of the Parquet files to export.
+    """
+    key = "explorer_export"
+    with st.expander(f"Export {len(selected_files)} files", expanded=True):
+        st.caption(", ".join(selected_files))
+        format_col, layout_col = st.columns(2)
+        with format_col:
+            export_format = st.selectbox(
+                "Format", list(EXPORT_FORMATS), key=f"{key}_format"
+            )
+        with layout_col:
+            layout = st.radio(
+                "Export as",
+                ["One combined file", "Zip archive of files"],
+                horizontal=True,
+                key=f"{key}_layout",
+            )
+        combined = layout == "One combined file"
+
+        if st.button("Prepare download", key=f"{key}_prepare"):
+            previous_export = st.session_state.pop(key, None)
+            if previous_export and os.path.exists(previous_export["path"]):
+                os.remove(previous_export["path"])
+
+            directory_name = os.path.basename(os.path.dirname(selected_files[0]))
+            extension = EXPORT_FORMATS[export_format] if combined else ".zip"
+            file_name = (
+                f"{directory_name or 'export'}_{len(selected_files)}_files{extension}"
+            )
+            export_path = scratch_file_path(
+                f"explorer-export-{uuid.uuid4().hex}{extension}"
+            )
+            try:
+                with st.spinner("Downloading files..."):
+                    paths = download_files_to_cache(
+                        service_client, file_system_name, selected_files
+                    )
+                with (
+                    st.spinner("Exporting files..."),
+                    trace_stage(
+                        "export",
+                        files=len(paths),
+                        format=export_format,
+                        combined=combined,
+                    ) as span,
+                    open(export_path, "wb") as export_file,
+                ):
+                    if combined:
+                        write_export(paths, export_format, export_file)
+                    else:
+                        write_zip_export(
+                            paths, selected_files, export_format, export_file
+                        )
+                    span["exported_bytes"] = export_file.tell()
+                    if export_file.tell() > EXPLORER_MAX_BYTES:
+                        raise ExportTooLargeError(
+                            "The export is too large to download. Select fewer files."
+                        )
+            except ExportTooLargeError as e:
+                os.remove(export_path)
+                st.error(str(e))
+                return
+            except Exception as e:
+                if os.path.exists(export_path):
+                    os.remove(export_path)
+                st.error(f"Failed to export files: {e}")
+                return
+            st.session_state[key] = {"path": export_path, "file_name": file_name}
+
+        export = st.session_state.get(key)
+        if export and os.path.exists(export["path"]):
+            with open(export["path"], "rb") as export_file:
+                st.download_button(
+                    label=f"Download {export['file_name']}",
+                    data=export_file,
+                    file_name=export["file_name"],
+                    key=f"{key}_download",
+                )
+
+
 def delete_files(service_client, file_system_name, selected_files):
     """
     Delete specified files from Azure Data Lake Storage.
 
     Args:
-        service_client (DataLakeServiceClient): The service client for the Azure Data Lake Storage account.
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
         file_system_name (str): The name of the file system.
         selected_files (list): A list of file paths to delete.
     """
+    from key_index import forget_keys
+
     try:
         # Get the file system client
         file_system_client = service_client.get_file_system_client(file_system_name)
@@ -185,6 +467,9 @@ def delete_files(service_client, file_system_name, selected_files):
             file_client = file_system_client.get_file_client(selected_file)
             # Delete the file
             file_client.delete_file()
+        # Deleted files can be submitted again
+        forget_submits(selected_files)
+        forget_keys(selected_files)
         st.success(f"Files {', '.join(selected_files)} deleted successfully!")
     except Exception as e:
         # Handle errors during deletion
@@ -197,7 +482,8 @@ def confirm_delete(service_client, container_name, selected_files):
     Display a confirmation dialog for deleting files.
 
     Args:
-        service_client (DataLakeServiceClient): The service client for the Azure Data Lake Storage account.
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
         container_name (str): The name of the container.
         selected_files (list): A list of file paths to delete.
     """
@@ -219,9 +505,6 @@ def confirm_delete(service_client, container_name, selected_files):
         st.rerun()  # Reruns the application to refresh the display.
 
 
-import streamlit as st
-
-
 def handle_buttons(
     service_client,
     container_name,
@@ -229,17 +512,20 @@ def handle_buttons(
     preview_button_clicked,
     delete_button_clicked,
     convert_button_clicked,
+    query_button_clicked=False,
 ):
     """
-    Handle actions for the preview, delete, and convert buttons.
+    Handle actions for the preview, delete, convert and query buttons.
 
     Args:
-        service_client (DataLakeServiceClient): The service client for the Azure Data Lake Storage account.
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
         container_name (str): The name of the container.
         selected_files (list): A list of selected files.
         preview_button_clicked (bool): Flag indicating if the preview button was clicked.
         delete_button_clicked (bool): Flag indicating if the delete button was clicked.
         convert_button_clicked (bool): Flag indicating if the convert button was clicked.
+        query_button_clicked (bool): Flag indicating if the query button was clicked.
     """
     try:
         # If the delete button is clicked, proceed with the delete action.
@@ -251,32 +537,29 @@ def handle_buttons(
 
         # If the preview button is clicked, proceed with the preview action.
         if preview_button_clicked:
-            if len(selected_files) == 1:
+            if selected_files:
                 try:
-                    file_data = download_file(
-                        service_client, container_name, selected_files[0]
+                    paths = download_files_to_cache(
+                        service_client, container_name, selected_files
                     )
                 except Exception as e:
-                    st.error(f"Error downloading file: {e}")
+                    st.error(f"Error downloading files: {e}")
                     return
 
-                if file_data:
-                    try:
-                        preview_df = preview_parquet(file_data)
-                    except Exception as e:
-                        st.error(f"Error previewing file: {e}")
-                        return
-
+                for selected_file, path in zip(selected_files, paths):
+                    preview_df = preview_parquet(path)
                     if preview_df is not None:
                         with st.expander(
-                            f"Preview file (the first 50 rows): \n\n{selected_files[0]}",
+                            f"Preview file (the first 50 rows): \n\n{selected_file}",
                             expanded=True,
                         ):
-                            st.data_editor(preview_df, disabled=True)
+                            st.data_editor(
+                                preview_df,
+                                disabled=True,
+                                key=f"explorer_preview_{selected_file}",
+                            )
                     else:
-                        st.error("Failed to preview the file.")
-            elif len(selected_files) > 1:
-                st.warning("Please select only one file to preview.")
+                        st.error(f"Failed to preview the file {selected_file}.")
             else:
                 st.warning("Please select a file to preview.")
 
@@ -287,8 +570,18 @@ def handle_buttons(
                 st.session_state.show_download_excel = True
                 st.rerun()
             elif len(selected_files) > 1:
-                st.warning("Please select only one file to convert and download.")
+                # Several files are exported together from the export panel
+                st.session_state.export_files = selected_files
+                st.session_state.pop("explorer_export", None)
             else:
                 st.warning("Please select a file to convert and download.")
+
+        # If the query button is clicked, keep the query mode open for the selected
+        # files.
+        if query_button_clicked:
+            if selected_files:
+                st.session_state.query_files = selected_files
+            else:
+                st.warning("Please select at least one file to query.")
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
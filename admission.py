@@ -0,0 +1,254 @@
+import contextlib
+import functools
+import itertools
+import os
+import threading
+import time
+
+from tracing import get_spans, increment_counter
+
+# Admission control for the memory-heavy steps of an upload (parse, cast and
+# validate, encode and upload). Jobs are admitted in arrival order while their
+# estimated memory fits the budget and their user is under the concurrency
+# limit; the others wait in a queue shared by all sessions of the process.
+
+# Share of the memory limit of the container (or machine) available to jobs
+ADMISSION_MEMORY_FRACTION = float(os.getenv("ADMISSION_MEMORY_FRACTION", "0.7"))
+# Memory budget of the running jobs in bytes; overrides the fraction, 0 = no limit
+ADMISSION_MEMORY_BYTES = os.getenv("ADMISSION_MEMORY_BYTES")
+# Jobs a user can run at the same time
+ADMISSION_MAX_JOBS_PER_USER = int(os.getenv("ADMISSION_MAX_JOBS_PER_USER", "1"))
+
+# Memory of a job = file size x (ingest ratio + expansion x (1 + downstream ratio)),
+# where expansion is the size of the parsed table relative to the file, and the
+# parsed table stays in memory while it is cast, tested and encoded. The ratios
+# are calibrated from the recorded spans and default to these values.
+# Compressed CSV files are assumed to be about 7 times smaller than the CSV.
+DEFAULT_INGEST_RATIOS = {
+    ".csv": 3.0,
+    ".xlsx": 25.0,
+    ".csv.gz": 21.0,
+    ".csv.zst": 21.0,
+    ".csv.zip": 21.0,
+    ".xlsx.zip": 25.0,
+}
+DEFAULT_EXPANSION_RATIOS = {
+    ".csv": 1.5,
+    ".xlsx": 6.0,
+    ".csv.gz": 10.5,
+    ".csv.zst": 10.5,
+    ".csv.zip": 10.5,
+    ".xlsx.zip": 6.0,
+}
+DEFAULT_DOWNSTREAM_RATIO = 2.0
+# Fixed memory of a job (DuckDB, dbt), added to every estimate
+JOB_BASE_BYTES = 64 * 1024**2
+
+# Spans of smaller inputs are dominated by fixed costs and not used to calibrate
+CALIBRATION_MIN_BYTES = 1024**2
+CALIBRATION_MIN_SPANS = 5
+CALIBRATION_PERCENTILE = 90
+
+_condition = threading.Condition()
+_ticket_ids = itertools.count(1)
+# Waiting jobs in arrival order and running jobs: ticket id -> (user, bytes)
+_waiting = {}
+_running = {}
+
+
+@functools.lru_cache(maxsize=1)
+def get_memory_limit_bytes():
+    """
+    Get the memory limit of the container, or the physical memory of the machine.
+
+    Returns:
+        int: The limit in bytes.
+    """
+    for cgroup_file in (
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ):
+        try:
+            with open(cgroup_file) as limit_file:
+                limit = limit_file.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge number
+        if limit.isdigit() and int(limit) < 2**60:
+            return int(limit)
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def get_memory_budget_bytes():
+    if ADMISSION_MEMORY_BYTES is not None:
+        return int(ADMISSION_MEMORY_BYTES)
+    return int(get_memory_limit_bytes() * ADMISSION_MEMORY_FRACTION)
+
+
+def _calibrated_ratio(spans, numerator, default):
+    ratios = sorted(
+        span[numerator] / span["bytes"]
+        for span in spans
+        if span.get("status") == "ok"
+        and span.get(numerator) is not None
+        and (span.get("bytes") or 0) >= CALIBRATION_MIN_BYTES
+    )
+    if len(ratios) < CALIBRATION_MIN_SPANS:
+        return default
+    return ratios[min(len(ratios) * CALIBRATION_PERCENTILE // 100, len(ratios) - 1)]
+
+
+def get_memory_ratios(file_type):
+    """
+    Get the memory ratios of a file type, calibrated from the recorded spans.
+
+    Args:
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+
+    Returns:
+        dict: The ingest, expansion and downstream ratios.
+    """
+    ingest_spans = [
+        span for span in get_spans("ingest") if span.get("file_type") == file_type
+    ]
+    downstream_spans = get_spans("cast") + get_spans("encode")
+    return {
+        "ingest": _calibrated_ratio(
+            ingest_spans,
+            "peak_memory_delta_bytes",
+            DEFAULT_INGEST_RATIOS.get(file_type, DEFAULT_INGEST_RATIOS[".xlsx"]),
+        ),
+        "expansion": _calibrated_ratio(
+            ingest_spans,
+            "table_bytes",
+            DEFAULT_EXPANSION_RATIOS.get(file_type, DEFAULT_EXPANSION_RATIOS[".xlsx"]),
+        ),
+        "downstream": _calibrated_ratio(
+            downstream_spans, "peak_memory_delta_bytes", DEFAULT_DOWNSTREAM_RATIO
+        ),
+    }
+
+
+def estimate_job_bytes(file_size, file_type):
+    """
+    Estimate the peak memory of processing an upload.
+
+    Args:
+        file_size (int): Size of the uploaded file in bytes.
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+
+    Returns:
+        int: The estimated memory in bytes.
+    """
+    ratios = get_memory_ratios(file_type)
+    return JOB_BASE_BYTES + int(
+        file_size
+        * (ratios["ingest"] + ratios["expansion"] * (1 + ratios["downstream"]))
+    )
+
+
+def _next_admissible(budget_bytes):
+    # Users at their limit are skipped; the first other job waits for memory,
+    # so large jobs are not overtaken forever by small ones
+    running_bytes = sum(job_bytes for _, job_bytes in _running.values())
+    for ticket, (user, job_bytes) in _waiting.items():
+        if (
+            sum(1 for running_user, _ in _running.values() if running_user == user)
+            >= ADMISSION_MAX_JOBS_PER_USER
+        ):
+            continue
+        if (
+            not _running
+            or budget_bytes <= 0
+            or running_bytes + job_bytes <= budget_bytes
+        ):
+            return ticket
+        return None
+    return None
+
+
+def _try_admit(ticket):
+    # Called with the condition held
+    if _next_admissible(get_memory_budget_bytes()) != ticket:
+        return False
+    _running[ticket] = _waiting.pop(ticket)
+    return True
+
+
+def get_queue_position(ticket):
+    """
+    Get the position of a job in the queue.
+
+    Args:
+        ticket (int): The ticket of the job.
+
+    Returns:
+        int: The 1-based position, or 0 if the job is not waiting.
+    """
+    with _condition:
+        for position, waiting_ticket in enumerate(_waiting, start=1):
+            if waiting_ticket == ticket:
+                return position
+    return 0
+
+
+def get_admission_state():
+    """
+    Get the jobs running and waiting for admission.
+
+    Returns:
+        dict: The budget, the running and waiting jobs and their estimated bytes.
+    """
+    with _condition:
+        return {
+            "budget_bytes": get_memory_budget_bytes(),
+            "running_jobs": len(_running),
+            "running_bytes": sum(job_bytes for _, job_bytes in _running.values()),
+            "waiting_jobs": len(_waiting),
+            "waiting_bytes": sum(job_bytes for _, job_bytes in _waiting.values()),
+        }
+
+
+@contextlib.contextmanager
+def admission(user, estimated_bytes, on_wait=None, poll_seconds=1.0):
+    """
+    Wait until a job is admitted, and run it while holding its share of the
+    memory budget.
+
+    A job larger than the whole budget is admitted once nothing else runs.
+
+    Args:
+        user (str): The user running the job.
+        estimated_bytes (int): The estimate from estimate_job_bytes.
+        on_wait (callable, optional): Called with the queue position every
+            poll_seconds while the job waits, e.g. to display it.
+        poll_seconds (float): Seconds between two calls of on_wait.
+
+    Yields:
+        float: The seconds the job waited.
+    """
+    ticket = next(_ticket_ids)
+    started = time.perf_counter()
+    with _condition:
+        _waiting[ticket] = (user, estimated_bytes)
+    increment_counter("admission_jobs")
+    try:
+        queued = False
+        while True:
+            with _condition:
+                if _try_admit(ticket):
+                    break
+                _condition.wait(poll_seconds)
+                if _try_admit(ticket):
+                    break
+            if not queued:
+                queued = True
+                increment_counter("admission_queued")
+            if on_wait is not None:
+                on_wait(get_queue_position(ticket))
+        yield time.perf_counter() - started
+    finally:
+        with _condition:
+            _waiting.pop(ticket, None)
+            _running.pop(ticket, None)
+            _condition.notify_all()
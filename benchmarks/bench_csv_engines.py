@@ -0,0 +1,125 @@
+"""
+Benchmark the CSV engines used by read_csv_and_excel_files side by side.
+
+Generates synthetic CSV files of increasing size (text codes, integers,
+decimals and dates) and parses each one with:
+
+* duckdb: sniff_csv + read_csv_auto
+* pyarrow: sniff_csv + multi-threaded pyarrow.csv.read_csv
+* pyarrow-stream: sniff_csv + pyarrow.csv.open_csv, consumed batch by batch
+
+The crossover size is a good value for CSV_PYARROW_MIN_BYTES.
+
+Usage:
+    python benchmarks/bench_csv_engines.py [size_mb ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from csv_reader import (  # noqa: E402
+    CSV_BLOCK_SIZE,
+    CSV_THREADS,
+    init_csv_threads,
+    iter_csv_batches,
+    read_csv_duckdb,
+    read_csv_pyarrow,
+)
+
+REPEATS = 3
+
+
+def write_csv(path, size_mb):
+    # Roughly 100 bytes per row
+    rows = size_mb * 1024**2 // 100
+    duckdb.execute(
+        f"""
+        COPY (
+            SELECT
+                'CUST-' || lpad((i % 50000)::VARCHAR, 6, '0') AS CustomerCode,
+                'Company ' || (i % 37) AS CompanyName,
+                i AS LineNumber,
+                round(random() * 100000, 2) AS Amount,
+                DATE '2024-01-01' + (i % 365)::INT AS PostingDate,
+                CASE WHEN i % 3 = 0 THEN 'Yes' ELSE 'No' END AS Flag,
+                md5(i::VARCHAR)[:12] AS Reference
+            FROM range({rows}) t(i)
+        ) TO '{path}' (HEADER, DELIMITER ',')
+        """
+    )
+
+
+def sniff(con, path):
+    cursor = con.execute(f"SELECT * FROM sniff_csv('{path}')")
+    names = [description[0] for description in cursor.description]
+    return dict(zip(names, cursor.fetchone()))
+
+
+def run_duckdb(path):
+    con = duckdb.connect(database=":memory:")
+    try:
+        sniff(con, path)
+        return read_csv_duckdb(con, path).num_rows
+    finally:
+        con.close()
+
+
+def run_pyarrow(path):
+    con = duckdb.connect(database=":memory:")
+    try:
+        dialect = sniff(con, path)
+    finally:
+        con.close()
+    return read_csv_pyarrow(path, dialect).num_rows
+
+
+def run_pyarrow_stream(path):
+    con = duckdb.connect(database=":memory:")
+    try:
+        dialect = sniff(con, path)
+    finally:
+        con.close()
+    return sum(batch.num_rows for batch in iter_csv_batches(path, dialect))
+
+
+ENGINES = {
+    "duckdb": run_duckdb,
+    "pyarrow": run_pyarrow,
+    "pyarrow-stream": run_pyarrow_stream,
+}
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1, 8, 32, 128]
+    init_csv_threads()
+    print(f"threads={CSV_THREADS} block_size={CSV_BLOCK_SIZE}")
+    print(f"{'size':>8} " + " ".join(f"{engine:>15}" for engine in ENGINES))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size_mb in sizes:
+            path = os.path.join(temp_dir, f"bench_{size_mb}mb.csv")
+            write_csv(path, size_mb)
+
+            timings = []
+            for engine in ENGINES.values():
+                best = float("inf")
+                for _ in range(REPEATS):
+                    start = time.perf_counter()
+                    engine(path)
+                    best = min(best, time.perf_counter() - start)
+                timings.append(best)
+
+            print(
+                f"{size_mb:>6}MB "
+                + " ".join(f"{timing * 1000:>13.1f}ms" for timing in timings)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the dbt overhead of a validation with and without the warm manifest.
+
+Validates a sample file once to prepare a work directory, then times:
+
+* cold: a new dbtRunner that parses the project before testing (the
+  behaviour before the manifest was reused)
+* warm: run_dbt_tests, which reuses the manifest from get_dbt_manifest
+
+Usage:
+    python benchmarks/bench_dbt_startup.py [sample_file report_type]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import duckdb  # noqa: E402
+from dbt.cli.main import dbtRunner  # noqa: E402
+
+from dbt_runner import (  # noqa: E402
+    DBT_PROJECT_DIR,
+    get_dbt_manifest,
+    run_dbt_tests,
+    write_dbt_profile,
+)
+from pipeline import read_upload  # noqa: E402
+from reference_data import get_report_references, load_reference_tables  # noqa: E402
+from table_processing import (  # noqa: E402
+    cast_pyarrow_table_columns_to_types,
+    get_yaml_definitions,
+    resolve_headers,
+)
+
+REPEATS = 3
+
+
+def prepare_work_dir(work_dir, sample_file, report_type):
+    # Load the casted sample into the work directory's database, like the pipeline
+    columns_by_table, columns_type_by_table, _ = get_yaml_definitions()
+    _, table = read_upload(sample_file, os.path.splitext(sample_file)[1], report_type)
+    new_names, _, _, _ = resolve_headers(
+        table.column_names, columns_by_table[report_type]
+    )
+    casted_table, _ = cast_pyarrow_table_columns_to_types(
+        table.rename_columns(new_names), columns_type_by_table[report_type]
+    )
+    database = os.path.join(work_dir, "db.duckdb")
+    load_reference_tables(database, get_report_references(report_type))
+    con = duckdb.connect(database=database)
+    con.register("casted_table", casted_table)
+    con.execute(f"CREATE TABLE {report_type} AS SELECT * FROM casted_table")
+    con.close()
+
+
+def run_cold(report_type, work_dir):
+    write_dbt_profile(work_dir, os.path.join(work_dir, "db.duckdb"))
+    dbtRunner().invoke(
+        [
+            "test",
+            "--select",
+            f"source:uploaded_files.{report_type}",
+            "--project-dir",
+            DBT_PROJECT_DIR,
+            "--profiles-dir",
+            work_dir,
+            "--target-path",
+            os.path.join(work_dir, "cold-target"),
+            "--log-path",
+            os.path.join(work_dir, "logs"),
+            "--no-partial-parse",
+            "--quiet",
+        ]
+    )
+
+
+def best_of(function, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    sample_file = sys.argv[1] if len(sys.argv) > 1 else "samples/demo_hcp_contacts.csv"
+    report_type = sys.argv[2] if len(sys.argv) > 2 else "demo_hcp_contacts"
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepare_work_dir(work_dir, sample_file, report_type)
+
+        start = time.perf_counter()
+        get_dbt_manifest()
+        parse_seconds = time.perf_counter() - start
+
+        cold_seconds = best_of(run_cold, report_type, work_dir)
+        warm_seconds = best_of(run_dbt_tests, report_type, work_dir)
+
+    print(f"initial parse (once per process): {parse_seconds:.2f}s")
+    print(f"cold test run: {cold_seconds:.2f}s")
+    print(f"warm test run: {warm_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
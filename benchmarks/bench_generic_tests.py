@@ -0,0 +1,134 @@
+"""
+Benchmark the optimized generic dbt tests against the previous implementations.
+
+Renders the macros in FileUploaderDBT with Jinja (the same way dbt turns
+`{% test %}` blocks into `test_` macros) and runs them directly in DuckDB on a
+synthetic table.
+
+Usage:
+    python benchmarks/bench_generic_tests.py [rows] [accepted_values]
+"""
+
+import os
+import sys
+import time
+
+import duckdb
+import jinja2
+
+DBT_PROJECT_DIR = os.path.join(os.path.dirname(__file__), "..", "FileUploaderDBT")
+
+# Previous implementations, kept here as the baseline
+BASELINE_MACROS = """
+{% macro test_accepted_values_case_insensitive(
+    model, column_name, values, quote=True
+) %}
+with all_values as (
+    select lower({{ column_name }}) as value_field, count(*) as n_records
+    from {{ model }}
+    group by {{ column_name }}
+)
+select * from all_values
+where value_field not in (
+    {% for value in values -%}
+        '{{ value }}'{%- if not loop.last -%},{%- endif %}
+    {%- endfor %}
+)
+{% endmacro %}
+
+{% macro test_no_less_than(model, column_name, lower_boundary) %}
+    select * from {{ model }}
+    where CAST({{ column_name }} AS INT) < {{ lower_boundary }}
+{% endmacro %}
+
+{% macro test_no_leading_or_trailing_spaces(model, column_name) %}
+    select * from {{ model }}
+    where ltrim(rtrim({{ column_name }})) != {{ column_name }}
+{% endmacro %}
+"""
+
+
+def load_macros(paths):
+    source = ""
+    for path in paths:
+        with open(os.path.join(DBT_PROJECT_DIR, path)) as f:
+            source += f.read()
+    source = source.replace("{% test ", "{% macro test_").replace(
+        "{% endtest %}", "{% endmacro %}"
+    )
+    return jinja2.Environment().from_string(source).module
+
+
+def timed(con, sql, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        failures = con.execute(f"select count(*) from ({sql}) t").fetchone()[0]
+        best = min(best, time.perf_counter() - start)
+    return best, failures
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    accepted = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    con = duckdb.connect()
+    con.execute(
+        f"""
+        create table uploaded as
+        select
+            'CODE' || (i % {accepted * 2}) as code,
+            cast(i % 1000 as varchar) as amount
+        from range({rows}) r(i)
+        """
+    )
+    values = [f"code{i}" for i in range(accepted)]
+
+    baseline = jinja2.Environment().from_string(BASELINE_MACROS).module
+    optimized = load_macros(
+        [
+            "macros/values_lookup.sql",
+            "macros/accepted_values_case_insensitive.sql",
+            "tests/generic/no_less_than.sql",
+            "tests/generic/no_leading_or_trailing_spaces.sql",
+        ]
+    )
+    # The test macro calls values_lookup as a global, as it would in dbt
+    optimized.test_accepted_values_case_insensitive._environment.globals[
+        "values_lookup"
+    ] = optimized.values_lookup
+
+    cases = [
+        (
+            "accepted_values_case_insensitive",
+            {"model": "uploaded", "column_name": "code", "values": values},
+        ),
+        (
+            "no_less_than",
+            {"model": "uploaded", "column_name": "amount", "lower_boundary": 10},
+        ),
+        (
+            "no_leading_or_trailing_spaces",
+            {"model": "uploaded", "column_name": "code"},
+        ),
+    ]
+
+    print(f"{rows:,} rows, {accepted:,} accepted values")
+    for name, kwargs in cases:
+        macro = f"test_{name}"
+        baseline_time, baseline_failures = timed(
+            con, getattr(baseline, macro)(**kwargs)
+        )
+        optimized_time, optimized_failures = timed(
+            con, getattr(optimized, macro)(**kwargs)
+        )
+        print(
+            f"{name:36} baseline {baseline_time * 1000:8.1f} ms "
+            f"({baseline_failures} failures) | "
+            f"optimized {optimized_time * 1000:8.1f} ms "
+            f"({optimized_failures} failures) | {baseline_time / optimized_time:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
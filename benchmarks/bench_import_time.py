@@ -0,0 +1,105 @@
+"""
+Measure the import time of the app with `python -X importtime`.
+
+Imports a module (main_app by default) in a fresh interpreter, with the
+background warm-up disabled, prints the total import time and the slowest
+top-level packages, and fails if:
+
+* a lazily imported package (dbt) is imported at startup, or
+* the total exceeds --max-ms, when given.
+
+Usage:
+    python benchmarks/bench_import_time.py [--module main_app] [--max-ms 2500]
+        [--top 15]
+"""
+
+import argparse
+import collections
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Packages and modules that must only be imported on first use
+LAZY_PACKAGES = [
+    "dbt",
+    "dbt_common",
+    "duckdb",
+    "pyarrow.parquet",
+    "delta_output",
+    "key_index",
+    "profiling",
+    "worker_client",
+]
+
+REPEATS = 3
+
+
+def measure_imports(module):
+    """
+    Import a module in a new interpreter and collect its import times.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        list: (module name, self time in µs, cumulative time in µs) per import.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        # The warm-up thread would import dbt during the measurement
+        env={**os.environ, "WARMUP_ON_START": "false"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="main_app")
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure_imports(args.module) for _ in range(REPEATS)]
+    # The fastest run has the least noise from the file system cache
+    imports = min(runs, key=lambda run: sum(self_us for _, self_us, _ in run))
+    total_ms = sum(self_us for _, self_us, _ in imports) / 1000
+
+    time_by_package = collections.Counter()
+    for name, self_us, _ in imports:
+        time_by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total_ms:,.0f} ms, {len(imports)} modules")
+    for package, self_us in time_by_package.most_common(args.top):
+        print(f"  {package:<30} {self_us / 1000:8,.1f} ms")
+
+    failed = False
+    eager_packages = sorted(
+        package
+        for package in LAZY_PACKAGES
+        if any(
+            name == package or name.startswith(f"{package}.") for name, _, _ in imports
+        )
+    )
+    if eager_packages:
+        print(f"FAIL: imported at startup: {', '.join(eager_packages)}")
+        failed = True
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"FAIL: {total_ms:,.0f} ms exceeds the limit of {args.max_ms:,.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark the key index against the submit history of a report.
+
+Records --submits synthetic budgetsales submits of --rows rows each in a
+temporary index, then times hashing the keys of a new upload and checking it
+against the history, with --overlap of its rows taken from earlier submits.
+
+Usage:
+    python benchmarks/bench_key_index.py [--submits 50] [--rows 200000] [--overlap 0.1]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+REPORT_TYPE = "budgetsales"
+
+
+def make_table(start, rows):
+    """
+    Build a budgetsales table with unique keys numbered from start.
+
+    Args:
+        start (int): The number of the first key.
+        rows (int): The number of rows.
+
+    Returns:
+        pyarrow.Table: The key columns and an amount column.
+    """
+    numbers = np.arange(start, start + rows)
+    return pa.table(
+        {
+            "Version": pa.array(np.full(rows, "BUDGET", dtype=object)),
+            "Company": pa.array((numbers % 97).astype(str)),
+            "Item": pa.array((numbers // 97).astype(str)),
+            "Customer": pa.array((numbers % 1013).astype(str)),
+            "YearMonth": pa.array(np.full(rows, "2025-01", dtype=object)),
+            "GrossTurnover": pa.array(numbers * 1.5),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--submits", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--overlap", type=float, default=0.1)
+    args = parser.parse_args()
+
+    index_dir = tempfile.mkdtemp(prefix="bench_key_index_")
+    os.environ["SUBMIT_INDEX_DIR"] = index_dir
+    os.chdir(ROOT_DIR)
+    sys.path.insert(0, ROOT_DIR)
+    from key_index import find_key_overlaps, hash_keys, record_keys
+    from submit_index import record_submit
+
+    start = time.perf_counter()
+    for submit in range(args.submits):
+        table = make_table(submit * args.rows, args.rows)
+        blob_name = f"bench/{REPORT_TYPE}/submit_{submit}.parquet"
+        record_submit(REPORT_TYPE, str(submit), blob_name, "bench.csv", args.rows)
+        record_keys(REPORT_TYPE, blob_name, table)
+    print(
+        f"recorded {args.submits} submits x {args.rows:,} rows "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+    # The new upload starts inside the last submit and continues past it
+    overlapping_rows = int(args.rows * args.overlap)
+    upload = make_table(args.submits * args.rows - overlapping_rows, args.rows)
+
+    start = time.perf_counter()
+    hash_keys(upload, ["Version", "Company", "Item", "Customer", "YearMonth"])
+    hash_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    overlapping, overlaps = find_key_overlaps(REPORT_TYPE, upload)
+    check_seconds = time.perf_counter() - start
+
+    print(f"hash {args.rows:,} keys: {hash_seconds * 1000:,.0f} ms")
+    print(
+        f"check against history (incl. hashing): {check_seconds * 1000:,.0f} ms, "
+        f"{int(overlapping.sum()):,} overlapping rows in {len(overlaps)} file(s)"
+    )
+    if int(overlapping.sum()) != overlapping_rows:
+        print(f"FAIL: expected {overlapping_rows:,} overlapping rows")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Measure the rerun latency of the app with Streamlit's AppTest.
+
+Uploads a file (injected into the session, as AppTest cannot drive
+st.file_uploader), validates it once, then times:
+
+* app: a full rerun of main_app.py, which is what every widget click cost
+  before the tabs were fragments and is still the cost of the Upload tab;
+* preview, validate, submit, explorer: a rerun of only that tab's fragment,
+  which is what a click inside the tab costs now.
+
+The Explorer and Submit tabs need the storage account credentials (see .env);
+without them they only render their error message.
+
+Usage:
+    python benchmarks/bench_rerun_latency.py [--report demo_hcp_contacts]
+        [--file samples/demo_hcp_contacts.csv] [--runs 5]
+
+The report must be in ALLOWED_TABLE_NAMES.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import textwrap
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SCOPES = ["app", "preview", "validate", "submit", "explorer"]
+
+# The script run by AppTest: a full run of main_app.py, or a single tab
+HARNESS = textwrap.dedent(
+    """
+    import io
+    import os
+    import runpy
+    import sys
+
+    root_dir = os.environ["BENCH_ROOT_DIR"]
+    sys.path.insert(0, root_dir)
+    os.chdir(root_dir)
+
+    import streamlit as st
+
+
+    class UploadedFile(io.BytesIO):
+        def __init__(self, path):
+            with open(path, "rb") as file:
+                super().__init__(file.read())
+            self.name = os.path.basename(path)
+            self.file_id = self.name
+            self.size = len(self.getvalue())
+            self.type = (
+                "text/csv" if path.endswith(".csv") else "application/octet-stream"
+            )
+
+
+    path = os.environ["BENCH_FILE"]
+    if "uploaded_file" not in st.session_state:
+        st.session_state["uploaded_file"] = UploadedFile(path)
+        st.session_state["file_type"] = ".csv" if path.endswith(".csv") else ".xlsx"
+
+    scope = st.session_state["bench_scope"]
+    if scope == "app":
+        runpy.run_path(os.path.join(root_dir, "main_app.py"), run_name="__main__")
+    else:
+        import main_app
+
+        getattr(main_app, f"render_{scope}_tab")()
+    """
+)
+
+
+def time_runs(app_test, scope, runs):
+    """
+    Rerun the harness with a scope and time every run.
+
+    Args:
+        app_test (AppTest): The app test, already run once.
+        scope (str): One of SCOPES.
+        runs (int): The number of timed runs.
+
+    Returns:
+        list: The duration of every run in seconds.
+    """
+    app_test.session_state["bench_scope"] = scope
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app_test.run()
+        durations.append(time.perf_counter() - start)
+        if app_test.exception:
+            raise RuntimeError(app_test.exception[0].value)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--report", default="demo_hcp_contacts")
+    parser.add_argument(
+        "--file", default=os.path.join(ROOT_DIR, "samples", "demo_hcp_contacts.csv")
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["BENCH_ROOT_DIR"] = ROOT_DIR
+    os.environ["BENCH_FILE"] = os.path.abspath(args.file)
+    # Keep the warm-up thread from competing with the timed runs
+    os.environ["WARMUP_ON_START"] = "false"
+    os.chdir(ROOT_DIR)
+    sys.path.insert(0, ROOT_DIR)
+    from dotenv import load_dotenv
+
+    from helper_functions import get_allowed_table_names
+    from table_processing import get_yaml_definitions
+
+    load_dotenv()
+    _, _, table_names_and_alias = get_yaml_definitions()
+    allowed_table_names = get_allowed_table_names(table_names_and_alias)
+    if args.report not in allowed_table_names:
+        sys.exit(f"{args.report} is not in ALLOWED_TABLE_NAMES")
+    report_alias = allowed_table_names[args.report]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as harness:
+        harness.write(HARNESS)
+    try:
+        app_test = AppTest.from_file(harness.name, default_timeout=600)
+        app_test.session_state["bench_scope"] = "app"
+        app_test.session_state["report_alias"] = report_alias
+
+        # The first run parses and validates the upload
+        start = time.perf_counter()
+        app_test.run()
+        print(f"first run (parse + validate): {time.perf_counter() - start:.2f}s")
+
+        full_rerun = None
+        print(f"{'rerun':<10} {'median ms':>10} {'vs app':>8}")
+        for scope in SCOPES:
+            median = statistics.median(time_runs(app_test, scope, args.runs))
+            full_rerun = full_rerun or median
+            print(f"{scope:<10} {median * 1000:>10,.0f} {median / full_rerun:>7.0%}")
+    finally:
+        os.remove(harness.name)
+
+
+if __name__ == "__main__":
+    main()
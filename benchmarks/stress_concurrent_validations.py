@@ -0,0 +1,95 @@
+"""
+Stress test concurrent validations in one process.
+
+Runs the validation pipeline for the sample files from a thread pool while
+another thread keeps resolving the YAML definitions, and checks that:
+
+* every concurrent validation returns the same test results as a serial run,
+* the working directory of the process never changes.
+
+Usage:
+    python benchmarks/stress_concurrent_validations.py [threads] [rounds]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+from pipeline import validate_upload  # noqa: E402
+from table_processing import get_yaml_definitions  # noqa: E402
+
+SAMPLES = [
+    ("samples/demo_hcp_contacts.csv", "demo_hcp_contacts"),
+    ("samples/demo_hcp_contacts_bed.csv", "demo_hcp_contacts"),
+    ("samples/budgetsales_good.csv", "budgetsales"),
+    ("samples/demo_costallocationrates_good.xlsx", "demo_costallocationrates"),
+]
+
+
+def summarize(result):
+    # Test statuses by id; compiled SQL and paths differ between runs
+    return {test["unique_id"]: test["status"] for test in result["results"] or []}
+
+
+def validate(sample, output_dir):
+    path, report_type = sample
+    result = validate_upload(path, os.path.splitext(path)[1], report_type, output_dir)
+    return sample, summarize(result)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    start_dir = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        expected = dict(validate(sample, output_dir) for sample in SAMPLES)
+        serial_seconds = time.perf_counter() - start
+
+        # Keep resolving YAML definitions while validations run
+        stop = threading.Event()
+        cwd_changes = []
+
+        def watch_cwd():
+            while not stop.is_set():
+                get_yaml_definitions()
+                if os.getcwd() != start_dir:
+                    cwd_changes.append(os.getcwd())
+
+        watcher = threading.Thread(target=watch_cwd, daemon=True)
+        watcher.start()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [
+                executor.submit(validate, sample, output_dir)
+                for _ in range(rounds)
+                for sample in SAMPLES
+            ]
+            outcomes = [future.result() for future in futures]
+        concurrent_seconds = time.perf_counter() - start
+
+        stop.set()
+        watcher.join()
+
+    mismatches = [sample for sample, summary in outcomes if summary != expected[sample]]
+    print(f"serial: {len(SAMPLES)} validations in {serial_seconds:.1f}s")
+    print(
+        f"concurrent: {len(outcomes)} validations on {threads} threads "
+        f"in {concurrent_seconds:.1f}s"
+    )
+    print(f"result mismatches: {len(mismatches)}")
+    print(f"working directory changes: {len(cwd_changes)}")
+    sys.exit(1 if mismatches or cwd_changes else 0)
+
+
+if __name__ == "__main__":
+    main()
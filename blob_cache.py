@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError
+
+from tracing import increment_counter, trace_stage
+
+# Local disk cache in front of the Explorer's reads from Azure Data Lake Storage.
+# Files are cached whole, shared by all sessions of the process (and processes
+# sharing the directory), and revalidated with a conditional request on the ETag.
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_blob_cache"
+)
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(1024**3)))
+
+_evict_lock = threading.Lock()
+
+
+def _cache_paths(file_system_name, path):
+    # The cached data and its metadata (ETag, last modified, size)
+    digest = hashlib.blake2b(
+        f"{file_system_name}\0{path}".encode(), digest_size=16
+    ).hexdigest()
+    data_path = os.path.join(BLOB_CACHE_DIR, f"{digest}.blob")
+    return data_path, f"{data_path}.json"
+
+
+def _read_metadata(data_path, metadata_path):
+    try:
+        with open(metadata_path) as metadata_file:
+            metadata = json.load(metadata_file)
+    except (OSError, ValueError):
+        return None
+    return metadata if os.path.exists(data_path) else None
+
+
+def _write_atomically(path, write):
+    partial_path = f"{path}.{uuid.uuid4().hex}.partial"
+    with open(partial_path, "wb") as partial_file:
+        write(partial_file)
+    os.replace(partial_path, path)
+
+
+def get_cached_file(service_client, file_system_name, path):
+    """
+    Return a local copy of a file in Azure Data Lake Storage, downloading it
+    only if it is not cached or changed since it was cached.
+
+    A cached file is revalidated with a conditional request on its ETag
+    (If-None-Match), so an unchanged file costs one request without a body.
+
+    Args:
+        service_client (DataLakeServiceClient): The service client for the Azure
+            Data Lake Storage account.
+        file_system_name (str): The name of the file system.
+        path (str): The path of the file.
+
+    Returns:
+        str: The path of the local copy.
+    """
+    file_client = service_client.get_file_system_client(
+        file_system_name
+    ).get_file_client(path)
+    data_path, metadata_path = _cache_paths(file_system_name, path)
+    metadata = _read_metadata(data_path, metadata_path)
+
+    with trace_stage("download", file=path) as span:
+        try:
+            if metadata is None:
+                download = file_client.download_file()
+            else:
+                download = file_client.download_file(
+                    etag=metadata["etag"], match_condition=MatchConditions.IfModified
+                )
+        except HttpResponseError as e:
+            # The SDK raises ResourceNotModifiedError, ResourceModifiedError or
+            # a plain HttpResponseError for a 304, depending on the error code
+            # header of the response
+            if metadata is None or e.status_code != 304:
+                raise
+            # Mark the file as recently used for the LRU eviction
+            os.utime(data_path)
+            span["cache"] = "hit"
+            span["bytes"] = metadata["size"]
+            increment_counter("blob_cache_hits")
+            increment_counter("blob_cache_bytes_saved", metadata["size"])
+            return data_path
+
+        os.makedirs(BLOB_CACHE_DIR, exist_ok=True)
+        _write_atomically(data_path, download.readinto)
+        size = os.path.getsize(data_path)
+        properties = download.properties
+        metadata = {
+            "path": path,
+            "etag": properties.etag,
+            "last_modified": str(properties.last_modified),
+            "size": size,
+        }
+        _write_atomically(
+            metadata_path, lambda f: f.write(json.dumps(metadata).encode())
+        )
+        span["cache"] = "miss"
+        span["bytes"] = size
+        increment_counter("blob_cache_misses")
+        increment_counter("blob_cache_bytes_downloaded", size)
+
+    evict_cached_files(keep=data_path)
+    return data_path
+
+
+def evict_cached_files(keep=None):
+    """
+    Remove the least recently used files until the cache fits BLOB_CACHE_MAX_BYTES.
+
+    Args:
+        keep (str, optional): The path of a cached file that must not be removed.
+    """
+    with _evict_lock:
+        entries = []
+        try:
+            with os.scandir(BLOB_CACHE_DIR) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".blob"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, data_path in sorted(entries):
+            if total_bytes <= BLOB_CACHE_MAX_BYTES:
+                break
+            if data_path == keep:
+                continue
+            for file_path in (f"{data_path}.json", data_path):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.error(f"Failed to evict cached file {file_path}: {e}")
+            total_bytes -= size
+            increment_counter("blob_cache_evictions")
@@ -0,0 +1,183 @@
+import datetime
+import os
+from io import BytesIO
+
+import pyarrow as pa
+
+from submit_index import (
+    CONTENT_HASH_METADATA_KEY,
+    compute_content_hash,
+    find_submit,
+    record_submit,
+)
+from tracing import trace_stage
+
+# Submitting validated tables to Blob Storage or the Delta table of their
+# report, without any Streamlit UI.
+
+
+def find_previous_submit(casted_read_auto_table, report_type):
+    """
+    Check whether the same data was already submitted for a report.
+
+    Args:
+        casted_read_auto_table (pyarrow.Table): The validated table to submit.
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        tuple: The content hash of the table, and the entry of the previous
+            submit from the submit index (None if it was not submitted before).
+    """
+    content_hash = compute_content_hash(casted_read_auto_table)
+    return content_hash, find_submit(report_type, content_hash)
+
+
+def upload_file_to_blob(
+    casted_read_auto_table, report_type, uploaded_file_name, content_hash=None
+):
+    import pyarrow.parquet as pq
+
+    from delta_output import get_delta_table_uri, use_delta_output, write_delta_submit
+    from key_index import get_report_key_columns, record_keys
+
+    try:
+        # The hash of the validated data, before the load metadata columns are added
+        if content_hash is None:
+            content_hash = compute_content_hash(casted_read_auto_table)
+
+        # Load credentials from environment variables
+        tenant_id = os.getenv("AZURE_TENANT_ID")
+        client_id = os.getenv("AZURE_CLIENT_ID")
+        client_secret = os.getenv("AZURE_CLIENT_SECRET")
+
+        storage_account_name = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
+        container_name = os.getenv(
+            "AZURE_STORAGE_CONTAINER_NAME"
+        )  # The blob name to be used for the file upload
+        blob_path = os.getenv("AZURE_STORAGE_FILE_PATH")
+
+        # Current time for metadata
+        deltalake_loadtime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Generate new file name
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        # Remove extension and add timestamp
+        new_filename = f"{uploaded_file_name.split('.')[0]}_{timestamp}.parquet"
+
+        # Create new columns
+        loadtime_array = pa.array(
+            [deltalake_loadtime] * len(casted_read_auto_table), pa.string()
+        )
+        filename_array = pa.array(
+            [uploaded_file_name] * len(casted_read_auto_table), pa.string()
+        )
+        deltalake_filename_array = pa.array(
+            [new_filename] * len(casted_read_auto_table), pa.string()
+        )
+
+        # Add columns to the pyarrow table
+        casted_read_auto_table = casted_read_auto_table.append_column(
+            "deltalake_loadtime", loadtime_array
+        )
+        casted_read_auto_table = casted_read_auto_table.append_column(
+            "original_filename", filename_array
+        )
+        casted_read_auto_table = casted_read_auto_table.append_column(
+            "deltalake_filename", deltalake_filename_array
+        )
+
+        if use_delta_output():
+            # Append the submit to the Delta table of the report; the name only
+            # identifies the submit, its rows carry it in deltalake_filename
+            blob_name = f"{blob_path}/delta/{report_type}/{new_filename}"
+            with trace_stage(
+                "upload",
+                report_type=report_type,
+                rows=casted_read_auto_table.num_rows,
+                bytes=casted_read_auto_table.nbytes,
+                format="delta",
+            ) as span:
+                delta_version = write_delta_submit(
+                    casted_read_auto_table,
+                    report_type,
+                    key_columns=get_report_key_columns(report_type),
+                    commit_metadata={
+                        CONTENT_HASH_METADATA_KEY: content_hash,
+                        "original_filename": uploaded_file_name,
+                        "deltalake_filename": new_filename,
+                    },
+                )
+                span["version"] = delta_version
+            upload_message = (
+                f"File '{new_filename}' successfully appended to the Delta table "
+                f"'{get_delta_table_uri(report_type)}' (version {delta_version})."
+            )
+        else:
+            # Imported on first upload to keep the app start fast
+            from azure.identity import ClientSecretCredential
+            from azure.storage.blob import BlobServiceClient
+
+            # Create Azure AD credentials
+            credential = ClientSecretCredential(
+                tenant_id=tenant_id, client_id=client_id, client_secret=client_secret
+            )
+
+            # Create a Blob Storage service client using the service principal
+            # for authentication
+            blob_service_client = BlobServiceClient(
+                account_url=f"https://{storage_account_name}.blob.core.windows.net",
+                credential=credential,
+            )
+
+            # Generate blob name
+            blob_name = f"{blob_path}/{report_type}/{new_filename}"
+            blob_client = blob_service_client.get_blob_client(
+                container=container_name, blob=blob_name
+            )
+
+            # Convert the PyArrow Table to Parquet format and write directly to
+            # Blob Storage
+            with trace_stage(
+                "encode",
+                report_type=report_type,
+                rows=casted_read_auto_table.num_rows,
+                bytes=casted_read_auto_table.nbytes,
+            ) as span:
+                # Keep the content hash in the Parquet key-value metadata
+                casted_read_auto_table = casted_read_auto_table.replace_schema_metadata(
+                    {
+                        **(casted_read_auto_table.schema.metadata or {}),
+                        CONTENT_HASH_METADATA_KEY: content_hash,
+                    }
+                )
+                buffer = BytesIO()
+                pq.write_table(casted_read_auto_table, buffer)
+                buffer.seek(0)  # Reset the buffer position to the beginning
+                span["encoded_bytes"] = buffer.getbuffer().nbytes
+
+            with trace_stage(
+                "upload", report_type=report_type, bytes=buffer.getbuffer().nbytes
+            ):
+                blob_client.upload_blob(buffer.getvalue(), overwrite=True)
+            upload_message = (
+                f"File '{new_filename}' successfully uploaded to Blob Storage."
+            )
+        ######################################
+
+        record_submit(
+            report_type,
+            content_hash,
+            blob_name,
+            uploaded_file_name,
+            casted_read_auto_table.num_rows,
+        )
+        record_keys(report_type, blob_name, casted_read_auto_table)
+
+        return (
+            upload_message,
+            f"Original uploaded file name: '{uploaded_file_name}",
+            f"Report type: {report_type}",
+        )
+
+    except Exception as e:
+        return f"Error uploading file to Blob Storage: {e}"
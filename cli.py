@@ -0,0 +1,290 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from compressed_files import FILE_NAME_SUFFIXES, get_file_type
+
+# Headless batch ingestion: reads, casts, validates and optionally submits
+# files without the Streamlit app, with the same YAML definitions and dbt tests.
+#
+#   python cli.py --report budgetsales samples/budgetsales_good.csv
+#   python cli.py --report budgetsales exports/budgetsales.csv.gz
+#   python cli.py --submit drop/budgetsales/           # report = directory name
+#   python cli.py --submit --watch drop/budgetsales/   # process files as they arrive
+#
+# One JSON result per file is printed to stdout (JSON lines); logs go to stderr.
+# The exit code is 1 if any file did not pass (one-shot mode only).
+
+load_dotenv()
+
+CLI_WORKERS = int(os.getenv("CLI_WORKERS", str(os.cpu_count() or 1)))
+
+# Subdirectories of a watched folder that processed files are moved to
+PROCESSED_DIR_NAME = "processed"
+FAILED_DIR_NAME = "failed"
+
+
+def init_cli_process():
+    # stdout carries the JSON results; the pipeline only logs, to stderr
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    from worker_service import init_worker_process
+
+    init_worker_process()
+
+
+def get_status(result):
+    """
+    Summarize a validation result in one status.
+
+    Args:
+        result (dict): The result of pipeline.validate_upload.
+
+    Returns:
+        str: 'invalid_columns', 'invalid_types', 'tests_failed' or 'passed'.
+    """
+    if not result["column_is_valid"]:
+        return "invalid_columns"
+    if not result["all_column_type_matched"]:
+        return "invalid_types"
+    if not result["all_tests_passed"]:
+        return "tests_failed"
+    return "passed"
+
+
+def process_file(path, report_type, output_dir, submit):
+    """
+    Validate a file, and submit it if it passed. Runs in a worker process.
+
+    Args:
+        path (str): Path of the CSV or Excel file, which can be compressed.
+        report_type (str): The report name as defined in the YAML configuration.
+        output_dir (str): Directory for the validated table, or None to remove
+            it once the file is processed.
+        submit (bool): Whether to submit files that passed.
+
+    Returns:
+        dict: The path, report type, status ('passed', 'submitted', 'duplicate',
+            a failed validation status or 'error') and the validation result.
+    """
+    # Imported in the worker process, not in the parent
+    import pyarrow.parquet as pq
+
+    from pipeline import submit_upload, validate_upload
+
+    started = time.perf_counter()
+    file_result = {"path": path, "report_type": report_type}
+    try:
+        result = validate_upload(
+            path,
+            get_file_type(path),
+            report_type,
+            output_dir or tempfile.gettempdir(),
+        )
+        file_result["status"] = get_status(result)
+        if submit and file_result["status"] == "passed":
+            file_result["submit"] = submit_upload(
+                pq.read_table(result["output_path"]),
+                report_type,
+                os.path.basename(path),
+            )
+            file_result["status"] = file_result["submit"]["status"]
+        if output_dir is None and result["output_path"]:
+            os.remove(result["output_path"])
+            result["output_path"] = None
+        file_result["result"] = result
+    except Exception as e:
+        logging.exception(f"Processing {path} failed")
+        file_result["status"] = "error"
+        file_result["error"] = str(e)
+    file_result["seconds"] = round(time.perf_counter() - started, 3)
+    return file_result
+
+
+def find_files(paths, report_type=None):
+    """
+    List the supported files of the given files and directories.
+
+    Args:
+        paths (list): Files and directories; directories are not searched
+            recursively.
+        report_type (str, optional): The report of every file. By default,
+            the name of the directory a file is in.
+
+    Returns:
+        list: (file path, report type) per file, sorted by path.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if os.path.isfile(os.path.join(path, name))
+            ]
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            if candidate.lower().endswith(FILE_NAME_SUFFIXES):
+                files.append(
+                    (
+                        os.path.abspath(candidate),
+                        report_type
+                        or os.path.basename(
+                            os.path.dirname(os.path.abspath(candidate))
+                        ),
+                    )
+                )
+    return sorted(files)
+
+
+def emit(file_result):
+    print(json.dumps(file_result, default=str), flush=True)
+
+
+def move_processed_file(file_result):
+    # Files of a watched folder are moved out of it, with their result next to them
+    directory, name = os.path.split(file_result["path"])
+    target_dir = os.path.join(
+        directory,
+        PROCESSED_DIR_NAME
+        if file_result["status"] in ("passed", "submitted", "duplicate")
+        else FAILED_DIR_NAME,
+    )
+    os.makedirs(target_dir, exist_ok=True)
+    target_path = os.path.join(target_dir, name)
+    shutil.move(file_result["path"], target_path)
+    with open(f"{target_path}.json", "w") as result_file:
+        json.dump(file_result, result_file, default=str, indent=2)
+
+
+def run_once(executor, files, output_dir, submit):
+    futures = [
+        executor.submit(process_file, path, report_type, output_dir, submit)
+        for path, report_type in files
+    ]
+    all_passed = True
+    for future in futures:
+        file_result = future.result()
+        emit(file_result)
+        all_passed = all_passed and file_result["status"] in (
+            "passed",
+            "submitted",
+            "duplicate",
+        )
+    return all_passed
+
+
+def watch(executor, paths, report_type, output_dir, submit, poll_seconds):
+    """
+    Process the files dropped into the given directories until interrupted.
+
+    A file is picked up once its size and modification time did not change
+    between two polls, so files that are still being copied are left alone.
+    Processed files are moved to the 'processed' or 'failed' subdirectory,
+    with their JSON result next to them.
+
+    Args:
+        executor (ProcessPoolExecutor): The pool the files are processed on.
+        paths (list): The watched directories.
+        report_type (str): The report of every file, or None to use the name
+            of the directory a file is in.
+        output_dir (str): Directory for the validated tables, or None.
+        submit (bool): Whether to submit files that passed.
+        poll_seconds (float): Seconds between two polls of the directories.
+    """
+    pending = {}
+    last_seen = {}
+    while True:
+        for path, file_report_type in find_files(paths, report_type):
+            if path in pending:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if last_seen.get(path) == signature:
+                pending[path] = executor.submit(
+                    process_file, path, file_report_type, output_dir, submit
+                )
+                del last_seen[path]
+            else:
+                last_seen[path] = signature
+
+        for path, future in list(pending.items()):
+            if future.done():
+                del pending[path]
+                file_result = future.result()
+                emit(file_result)
+                move_processed_file(file_result)
+        time.sleep(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate and submit files without the Streamlit app."
+    )
+    parser.add_argument("paths", nargs="+", help="Files and directories to process.")
+    parser.add_argument(
+        "--report",
+        help="Report type of every file (default: the name of the file's directory).",
+    )
+    parser.add_argument(
+        "--submit", action="store_true", help="Submit the files that pass."
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep processing files dropped into the directories.",
+    )
+    parser.add_argument("--poll-seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=CLI_WORKERS)
+    parser.add_argument(
+        "--output-dir",
+        help="Keep the validated tables as Parquet files in this directory.",
+    )
+    args = parser.parse_args()
+    # The worker processes run in the app directory
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else None
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    # dbt and DuckDB are not fork-safe, so worker processes are spawned
+    executor = ProcessPoolExecutor(
+        max_workers=max(args.workers, 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_cli_process,
+    )
+    try:
+        if args.watch:
+            watch(
+                executor,
+                args.paths,
+                args.report,
+                output_dir,
+                args.submit,
+                args.poll_seconds,
+            )
+        else:
+            files = find_files(args.paths, args.report)
+            if not files:
+                sys.exit(f"No {', '.join(FILE_NAME_SUFFIXES)} files found.")
+            all_passed = run_once(executor, files, output_dir, args.submit)
+            sys.exit(0 if all_passed else 1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
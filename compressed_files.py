@@ -0,0 +1,169 @@
+import os
+import shutil
+import zipfile
+
+import pyarrow as pa
+
+# Uploads can be compressed: gzip and zstd CSV files are decompressed while
+# they are parsed, and a zip archive holds one CSV or Excel file.
+
+# The type of a file is the format of its data followed by its compression
+SUPPORTED_FILE_TYPES = (
+    ".csv",
+    ".xlsx",
+    ".csv.gz",
+    ".csv.zst",
+    ".csv.zip",
+    ".xlsx.zip",
+)
+
+# Names of the supported files; the content of zip archives is checked by
+# get_file_type
+FILE_NAME_SUFFIXES = (".csv", ".xlsx", ".csv.gz", ".csv.zst", ".zip")
+
+# Extensions accepted by the file uploader; the data format of compressed
+# files is checked by get_file_type
+UPLOAD_EXTENSIONS = ["csv", "xlsx", "gz", "zst", "zip"]
+
+# Compression of a file type suffix, as named by DuckDB and pyarrow
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd", ".zip": "zip"}
+
+
+def split_file_type(file_type):
+    """
+    Split a file type into the format of its data and its compression.
+
+    Args:
+        file_type (str): One of SUPPORTED_FILE_TYPES, e.g. '.csv.gz'.
+
+    Returns:
+        tuple: The data format ('.csv' or '.xlsx') and the compression
+            ('gzip', 'zstd', 'zip' or None).
+    """
+    data_type, suffix = os.path.splitext(file_type)
+    if data_type and suffix in COMPRESSIONS:
+        return data_type, COMPRESSIONS[suffix]
+    return file_type, None
+
+
+def _find_data_member(archive):
+    members = [
+        info.filename
+        for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not os.path.basename(info.filename).startswith(".")
+        and info.filename.lower().endswith((".csv", ".xlsx"))
+    ]
+    if len(members) != 1:
+        raise ValueError(
+            "A zip archive must contain exactly one CSV or Excel file, "
+            f"found {len(members)}."
+        )
+    return members[0]
+
+
+def find_zip_member(source):
+    """
+    Find the CSV or Excel file in a zip archive. Only the archive's directory
+    is read.
+
+    Args:
+        source: The path of the archive, or a seekable binary file.
+
+    Returns:
+        str: The name of the file in the archive.
+
+    Raises:
+        ValueError: If the archive does not contain exactly one CSV or Excel file.
+    """
+    with zipfile.ZipFile(source) as archive:
+        return _find_data_member(archive)
+
+
+def get_file_type(file_name, source=None):
+    """
+    Get the type of a file from its name, looking into zip archives.
+
+    Args:
+        file_name (str): The name of the file.
+        source (optional): The path or a seekable binary file of the file,
+            read for zip archives; defaults to file_name.
+
+    Returns:
+        str: One of SUPPORTED_FILE_TYPES.
+
+    Raises:
+        ValueError: If the file type is not supported.
+    """
+    name = file_name.lower()
+    if name.endswith(".zip"):
+        member = find_zip_member(source if source is not None else file_name)
+        return f"{os.path.splitext(member)[1].lower()}.zip"
+    for file_type in SUPPORTED_FILE_TYPES:
+        if name.endswith(file_type):
+            return file_type
+    raise ValueError(
+        f"Unsupported file type: {file_name}. Use CSV or Excel files, CSV files "
+        "compressed with gzip (.csv.gz) or zstd (.csv.zst), or a zip archive."
+    )
+
+
+def get_uncompressed_size(source, compression):
+    """
+    Get the size of a compressed file once decompressed, as recorded in the
+    file: in the directory of a zip archive, or the trailer of a gzip file.
+
+    Args:
+        source: The path of the file, or a pyarrow NativeFile over its bytes.
+        compression (str): 'gzip', 'zstd' or 'zip'.
+
+    Returns:
+        int: The size in bytes, or None if the file does not record it (zstd).
+    """
+    if compression == "zip":
+        with zipfile.ZipFile(source) as archive:
+            return archive.getinfo(_find_data_member(archive)).file_size
+    if compression == "gzip":
+        # The size modulo 2^32 of the last member, enough to choose a parser
+        with open(source, "rb") if isinstance(source, str) else source as file:
+            file.seek(-4, os.SEEK_END)
+            return int.from_bytes(file.read(4), "little")
+    return None
+
+
+def open_decompressed(source, compression):
+    """
+    Open a compressed CSV file as a stream of its decompressed bytes, so it is
+    never decompressed as a whole.
+
+    Args:
+        source: The path of the file, or a pyarrow NativeFile over its bytes.
+        compression (str): 'gzip', 'zstd' or 'zip'.
+
+    Returns:
+        A readable file object for pyarrow.csv.
+    """
+    if compression == "zip":
+        archive = zipfile.ZipFile(source)
+        return archive.open(_find_data_member(archive))
+    return pa.CompressedInputStream(source, compression)
+
+
+def extract_zip_member(source, directory):
+    """
+    Extract the CSV or Excel file of a zip archive, for readers that need a path.
+
+    Args:
+        source: The path of the archive, or a seekable binary file.
+        directory (str): The directory to extract the file to.
+
+    Returns:
+        str: The path of the extracted file.
+    """
+    with zipfile.ZipFile(source) as archive:
+        member = _find_data_member(archive)
+        path = os.path.join(directory, os.path.basename(member))
+        with archive.open(member) as member_file, open(path, "wb") as output:
+            shutil.copyfileobj(member_file, output)
+    return path
@@ -0,0 +1,272 @@
+import logging
+import os
+
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# CSV engine: "duckdb" (read_csv_auto), "pyarrow" (multi-threaded pyarrow.csv)
+# or "auto" to pick by file size
+CSV_ENGINES = ["auto", "duckdb", "pyarrow"]
+CSV_ENGINE = os.getenv("CSV_ENGINE", "auto").lower()
+
+# Size of the blocks pyarrow parses in parallel; larger blocks mean fewer,
+# bigger tasks and better type inference on wide files
+CSV_BLOCK_SIZE = int(os.getenv("CSV_BLOCK_SIZE", str(16 * 1024**2)))
+
+# Threads used to parse a CSV file (both engines)
+CSV_THREADS = int(os.getenv("CSV_THREADS", str(os.cpu_count() or 1)))
+
+# With "auto", files of at least this size are parsed with pyarrow.
+# See benchmarks/bench_csv_engines.py for the measurements behind the default.
+CSV_PYARROW_MIN_BYTES = int(os.getenv("CSV_PYARROW_MIN_BYTES", str(1024**2)))
+
+# Arrow types of the column types DuckDB's sniffer detects, so both engines
+# return the same schema
+SNIFFED_TYPES = {
+    "VARCHAR": pa.string(),
+    "BIGINT": pa.int64(),
+    "DOUBLE": pa.float64(),
+    "BOOLEAN": pa.bool_(),
+    "DATE": pa.date32(),
+    "TIME": pa.time64("us"),
+    "TIMESTAMP": pa.timestamp("us"),
+}
+
+# DuckDB types of the pyarrow types of the report YAML (decimals aside)
+DUCKDB_TYPES = {
+    pa.string(): "VARCHAR",
+    pa.int32(): "INTEGER",
+    pa.int64(): "BIGINT",
+    pa.float32(): "FLOAT",
+    pa.float64(): "DOUBLE",
+    pa.bool_(): "BOOLEAN",
+    pa.date32(): "DATE",
+}
+
+# Boolean spellings DuckDB accepts (pyarrow matches them case-sensitively)
+TRUE_VALUES = ["true", "t", "yes", "y", "1"]
+FALSE_VALUES = ["false", "f", "no", "n", "0"]
+
+
+def init_csv_threads():
+    """
+    Size Arrow's thread pool, which parses CSV files with pyarrow, to CSV_THREADS.
+
+    The pool is shared by the whole process, so it is only resized by the
+    processes that call this at startup.
+    """
+    if pa.cpu_count() != CSV_THREADS:
+        pa.set_cpu_count(CSV_THREADS)
+
+
+def get_duckdb_type(data_type):
+    """
+    Get the DuckDB type of a pyarrow type, e.g. to read a CSV column as the
+    type of the report YAML.
+
+    Args:
+        data_type (pyarrow.DataType): The type.
+
+    Returns:
+        str: The DuckDB type, or None if it has none.
+    """
+    if pa.types.is_decimal(data_type):
+        return f"DECIMAL({data_type.precision},{data_type.scale})"
+    return DUCKDB_TYPES.get(data_type)
+
+
+def choose_csv_engine(file_size, engine=None):
+    """
+    Choose the engine used to parse a CSV file.
+
+    Args:
+        file_size (int): The size of the file in bytes.
+        engine (str, optional): "auto", "duckdb" or "pyarrow"; defaults to CSV_ENGINE.
+
+    Returns:
+        str: "duckdb" or "pyarrow".
+
+    Raises:
+        ValueError: If the engine is not supported.
+    """
+    engine = (engine or CSV_ENGINE).lower()
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unsupported CSV engine: {engine}. Use one of {CSV_ENGINES}.")
+    if engine == "auto":
+        return "pyarrow" if file_size >= CSV_PYARROW_MIN_BYTES else "duckdb"
+    return engine
+
+
+def _single_character(value, default):
+    # DuckDB reports "no character" as a NUL byte
+    return value if value and value != "\x00" else default
+
+
+def _spellings(values):
+    return [
+        spelling
+        for value in values
+        for spelling in dict.fromkeys([value, value.capitalize(), value.upper()])
+    ]
+
+
+def get_pyarrow_csv_options(dialect, column_types=None, block_size=None):
+    """
+    Build pyarrow.csv options that parse a file the way DuckDB's sniffer detected it.
+
+    Args:
+        dialect (dict): A row of DuckDB's sniff_csv (Delimiter, Quote, Escape,
+            SkipRows, HasHeader and Columns).
+        column_types (dict, optional): Column name -> pyarrow.DataType. Overrides
+            the sniffed type of the column, e.g. with the type from the report YAML.
+        block_size (int, optional): The block size in bytes; defaults to CSV_BLOCK_SIZE.
+
+    Returns:
+        tuple: pyarrow.csv ReadOptions, ParseOptions and ConvertOptions.
+    """
+    column_names = [column["name"] for column in dialect["Columns"]]
+    types = {
+        column["name"]: SNIFFED_TYPES[column["type"]]
+        for column in dialect["Columns"]
+        if column["type"] in SNIFFED_TYPES
+    }
+    types.update(column_types or {})
+
+    quote = _single_character(dialect["Quote"], '"')
+    escape = _single_character(dialect["Escape"], None)
+
+    read_options = pv.ReadOptions(
+        column_names=column_names,
+        skip_rows=dialect["SkipRows"] + (1 if dialect["HasHeader"] else 0),
+        block_size=block_size or CSV_BLOCK_SIZE,
+        use_threads=True,
+    )
+    parse_options = pv.ParseOptions(
+        delimiter=dialect["Delimiter"],
+        quote_char=quote,
+        double_quote=escape in (None, quote),
+        escape_char=escape if escape not in (None, quote) else False,
+        newlines_in_values=True,
+    )
+    # Like DuckDB, only empty fields are NULL (e.g. "NA" stays a value)
+    convert_options = pv.ConvertOptions(
+        column_types=types,
+        null_values=[""],
+        true_values=_spellings(TRUE_VALUES),
+        false_values=_spellings(FALSE_VALUES),
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True,
+    )
+    return read_options, parse_options, convert_options
+
+
+def read_csv_pyarrow(source, dialect, column_types=None, block_size=None):
+    """
+    Read a CSV file with the multi-threaded pyarrow.csv reader.
+
+    Args:
+        source: A file path or a pyarrow NativeFile, e.g. a BufferReader over
+            the uploaded bytes, or a stream decompressing them.
+        dialect (dict): A row of DuckDB's sniff_csv for the file.
+        column_types (dict, optional): Column name -> pyarrow.DataType.
+        block_size (int, optional): The block size in bytes.
+
+    Returns:
+        pyarrow.Table: The parsed table.
+
+    Raises:
+        pyarrow.ArrowInvalid: If a value cannot be converted to its column type.
+    """
+    read_options, parse_options, convert_options = get_pyarrow_csv_options(
+        dialect, column_types, block_size
+    )
+    return pv.read_csv(
+        source,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options,
+    )
+
+
+def iter_csv_batches(source, dialect, column_types=None, block_size=None):
+    """
+    Stream a CSV file as record batches of roughly block_size bytes each,
+    so large files can be processed without holding the whole table in memory.
+
+    Args:
+        source: A file path or a pyarrow NativeFile.
+        dialect (dict): A row of DuckDB's sniff_csv for the file.
+        column_types (dict, optional): Column name -> pyarrow.DataType.
+        block_size (int, optional): The block size in bytes.
+
+    Yields:
+        pyarrow.RecordBatch: The next batch of rows.
+    """
+    read_options, parse_options, convert_options = get_pyarrow_csv_options(
+        dialect, column_types, block_size
+    )
+    with pv.open_csv(
+        source,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options,
+    ) as reader:
+        yield from reader
+
+
+def _duckdb_types_option(column_types):
+    types = ", ".join(
+        "'{}': '{}'".format(name.replace("'", "''"), duckdb_type)
+        for name, duckdb_type in column_types.items()
+    )
+    return f", types = {{{types}}}" if types else ""
+
+
+def read_csv_duckdb(con, path, threads=None, compression=None, column_types=None):
+    """
+    Read a CSV file with DuckDB's read_csv_auto.
+
+    Columns of column_types are read as these types, like the pyarrow engine
+    does, so both engines return the same schema. If a value does not match
+    its type, the file is read again with only the text columns enforced, and
+    the other columns keep their sniffed type (or text) so the validation can
+    report the value.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection to read with.
+        path (str): The path of the file, as seen by the connection.
+        threads (int, optional): The number of threads; defaults to CSV_THREADS.
+        compression (str, optional): 'gzip' or 'zstd'; DuckDB decompresses the
+            file while reading it.
+        column_types (dict, optional): Column name -> pyarrow.DataType, e.g.
+            the types of the report YAML.
+
+    Returns:
+        pyarrow.Table: The parsed table.
+    """
+    import duckdb
+
+    con.execute(f"SET threads = {threads or CSV_THREADS}")
+    options = f", compression = '{compression}'" if compression else ""
+    duckdb_types = {
+        name: get_duckdb_type(data_type)
+        for name, data_type in (column_types or {}).items()
+        if get_duckdb_type(data_type) is not None
+    }
+    try:
+        return con.execute(
+            f"SELECT * FROM read_csv_auto('{path}'{options}"
+            f"{_duckdb_types_option(duckdb_types)})"
+        ).fetch_arrow_table()
+    except duckdb.ConversionException as e:
+        logging.info(f"Reading CSV with the sniffed types of non-text columns: {e}")
+    # Text columns never fail to convert, and keep e.g. leading zeros
+    text_types = {
+        name: duckdb_type
+        for name, duckdb_type in duckdb_types.items()
+        if duckdb_type == "VARCHAR"
+    }
+    return con.execute(
+        f"SELECT * FROM read_csv_auto('{path}'{options}"
+        f"{_duckdb_types_option(text_types)})"
+    ).fetch_arrow_table()
@@ -0,0 +1,245 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+
+from incremental_validation import (
+    DbtTestResult,
+    annotate_test_results,
+    get_test_metadata,
+)
+
+DBT_PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "FileUploaderDBT"
+)
+DBT_PROFILE_NAME = "FileUploaderDBT"
+
+# Files and directories of the dbt project that are parsed into the manifest
+DBT_PROJECT_FILES = [
+    "dbt_project.yml",
+    "packages.yml",
+    "models",
+    "macros",
+    "tests",
+    "dbt_packages",
+]
+
+# Where the project is parsed; every process keeps its own subdirectory so
+# dbt's partial parse file is never shared between processes
+DBT_PARSE_DIR = os.getenv("DBT_PARSE_DIR") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_dbt_parse"
+)
+
+# dbt keeps global state (flags, adapters, event manager) per process, so
+# invocations are serialized; everything around them can run in parallel
+_dbt_lock = threading.RLock()
+
+# The parsed manifest, reused by every test run until the project files change
+_manifest = None
+_manifest_signature = None
+_test_metadata = {}
+
+
+def write_dbt_profile(profiles_dir, database):
+    """
+    Write a profiles.yml that points the dbt project to a DuckDB database.
+
+    Args:
+        profiles_dir (str): The directory to write profiles.yml to.
+        database (str): Path to the DuckDB database. Keep the file name
+            db.duckdb: compiled tests refer to the database by its file stem.
+    """
+    import yaml
+
+    profile = {
+        DBT_PROFILE_NAME: {
+            "target": "dev",
+            # Close the database after each run, so the app can open it again
+            # (e.g. read-only) and removed work directories are released
+            "outputs": {
+                "dev": {"type": "duckdb", "path": database, "keep_open": False}
+            },
+        }
+    }
+    with open(os.path.join(profiles_dir, "profiles.yml"), "w") as profiles_file:
+        yaml.safe_dump(profile, profiles_file)
+
+
+def get_project_signature():
+    """
+    Fingerprint the files dbt parses, to detect changes to the project.
+
+    Returns:
+        tuple: The path, modification time and size of every project file.
+    """
+    entries = []
+    for name in DBT_PROJECT_FILES:
+        path = os.path.join(DBT_PROJECT_DIR, name)
+        if os.path.isfile(path):
+            file_paths = [path]
+        else:
+            file_paths = [
+                os.path.join(root, file_name)
+                for root, _, file_names in os.walk(path)
+                for file_name in file_names
+            ]
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            entries.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+
+def get_parse_dir():
+    """
+    Get the directory this process parses the dbt project in.
+
+    Returns:
+        str: The path of the directory, removed when the process exits.
+    """
+    parse_dir = os.path.join(DBT_PARSE_DIR, str(os.getpid()))
+    if not os.path.exists(parse_dir):
+        os.makedirs(parse_dir)
+        atexit.register(shutil.rmtree, parse_dir, ignore_errors=True)
+    return parse_dir
+
+
+def get_dbt_manifest():
+    """
+    Get the parsed dbt manifest, parsing the project only if its files changed.
+
+    The first call parses the whole project; later changes to the YAML schemas,
+    macros or tests are picked up with dbt's partial parsing, which re-parses
+    only the changed files.
+
+    Returns:
+        tuple: The dbt Manifest and the test metadata from get_test_metadata.
+
+    Raises:
+        Exception: The exception raised by dbt, if the project could not be parsed.
+    """
+    # dbt takes seconds to import, so it is only imported when first used
+    from dbt.cli.main import dbtRunner
+
+    global _manifest, _manifest_signature, _test_metadata
+    signature = get_project_signature()
+    with _dbt_lock:
+        if _manifest is None or signature != _manifest_signature:
+            parse_dir = get_parse_dir()
+            write_dbt_profile(parse_dir, os.path.join(parse_dir, "db.duckdb"))
+            res = dbtRunner().invoke(
+                [
+                    "parse",
+                    "--project-dir",
+                    DBT_PROJECT_DIR,
+                    "--profiles-dir",
+                    parse_dir,
+                    "--target-path",
+                    os.path.join(parse_dir, "target"),
+                    "--log-path",
+                    os.path.join(parse_dir, "logs"),
+                    "--partial-parse",
+                    "--log-level",
+                    "none",
+                    "--log-level-file",
+                    "debug",
+                ]
+            )
+            if res.exception is not None:
+                raise res.exception
+            if not res.success:
+                raise RuntimeError("dbt could not parse the project.")
+
+            _manifest = res.result
+            _manifest_signature = signature
+            _test_metadata = get_test_metadata(
+                {
+                    unique_id: node.to_dict()
+                    for unique_id, node in _manifest.nodes.items()
+                    if node.resource_type == "test"
+                }
+            )
+        return _manifest, _test_metadata
+
+
+def collect_test_results(run_results, test_metadata) -> list[DbtTestResult]:
+    """
+    Convert the in-memory results of a dbt test run to test results.
+
+    Args:
+        run_results (dbt RunExecutionResult): The result of dbtRunner.invoke.
+        test_metadata (dict): The test metadata from get_test_metadata.
+
+    Returns:
+        list: The DbtTestResult of every test.
+    """
+    return annotate_test_results(
+        [
+            {
+                "unique_id": result.node.unique_id,
+                "status": str(result.status),
+                "failures": result.failures,
+                "message": result.message,
+                "compiled_code": result.node.compiled_code,
+            }
+            for result in run_results
+        ],
+        test_metadata,
+    )
+
+
+def run_dbt_tests(report_type, work_dir):
+    """
+    Run the dbt tests of a report against the db.duckdb in a work directory.
+
+    dbt is pointed at the project, a generated profile and the target and log
+    directories with explicit paths instead of changing the working directory,
+    so concurrent validations with different work directories never share files.
+    The project is not parsed again: the runner reuses the manifest from
+    get_dbt_manifest.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+        work_dir (str): A directory containing the db.duckdb to test.
+
+    Returns:
+        list: The DbtTestResult of every test, or None if dbt produced no results.
+
+    Raises:
+        Exception: The exception raised by dbt, if the invocation failed.
+    """
+    from dbt.cli.main import dbtRunner
+
+    write_dbt_profile(work_dir, os.path.join(work_dir, "db.duckdb"))
+    cli_args = [
+        "test",
+        "--select",
+        f"source:uploaded_files.{report_type}",
+        "--project-dir",
+        DBT_PROJECT_DIR,
+        "--profiles-dir",
+        work_dir,
+        "--target-path",
+        os.path.join(work_dir, "target"),
+        "--log-path",
+        os.path.join(work_dir, "logs"),
+        # The results are read from the returned objects, not run_results.json
+        "--no-write-json",
+        # dbt only logs to the log path; stdout belongs to the caller, e.g.
+        # the JSON lines of cli.py
+        "--log-level",
+        "none",
+        "--log-level-file",
+        "debug",
+    ]
+
+    with _dbt_lock:
+        manifest, test_metadata = get_dbt_manifest()
+        res = dbtRunner(manifest=manifest).invoke(cli_args)
+    if res.exception is not None:
+        raise res.exception
+
+    if res.result is None:
+        return None
+
+    return collect_test_results(res.result, test_metadata)
@@ -0,0 +1,155 @@
+import logging
+import os
+
+import pyarrow as pa
+
+# Submits are written as loose Parquet files (default) or appended to a Delta
+# table per report
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "parquet").strip().lower()
+
+# Location of the Delta tables, one per report: <DELTA_TABLE_URI>/<report>.
+# Defaults to a "delta" directory next to the Parquet files in the storage
+# account; a local path can be used instead.
+DELTA_TABLE_URI = os.getenv("DELTA_TABLE_URI", "")
+
+# Compact a table every N submits, Z-ordered on the report's key columns when
+# it has a natural key (0 = never)
+DELTA_OPTIMIZE_EVERY = int(os.getenv("DELTA_OPTIMIZE_EVERY", "0"))
+
+# Columns with file statistics in the transaction log (Delta's default)
+DELTA_STATS_COLUMNS = 32
+
+# Target size of the files written by compaction
+DELTA_TARGET_FILE_BYTES = int(os.getenv("DELTA_TARGET_FILE_BYTES", str(128 * 1024**2)))
+
+
+def use_delta_output():
+    return OUTPUT_FORMAT == "delta"
+
+
+def get_delta_table_uri(report_type):
+    """
+    Get the location of the Delta table of a report.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        str: An abfss:// URI in the storage account, or the configured location.
+    """
+    if DELTA_TABLE_URI:
+        return f"{DELTA_TABLE_URI.rstrip('/')}/{report_type}"
+    return (
+        f"abfss://{os.getenv('AZURE_STORAGE_CONTAINER_NAME')}@"
+        f"{os.getenv('AZURE_STORAGE_ACCOUNT_NAME')}.dfs.core.windows.net/"
+        f"{os.getenv('AZURE_STORAGE_FILE_PATH')}/delta/{report_type}"
+    )
+
+
+def get_storage_options(table_uri):
+    """
+    Get the deltalake storage options for a table location.
+
+    Args:
+        table_uri (str): The location of the Delta table.
+
+    Returns:
+        dict: The service principal credentials for Azure locations, or None
+            for local paths.
+    """
+    if not table_uri.startswith(("abfss://", "abfs://", "az://", "azure://")):
+        return None
+    return {
+        "azure_storage_account_name": os.getenv("AZURE_STORAGE_ACCOUNT_NAME"),
+        "azure_tenant_id": os.getenv("AZURE_TENANT_ID"),
+        "azure_client_id": os.getenv("AZURE_CLIENT_ID"),
+        "azure_client_secret": os.getenv("AZURE_CLIENT_SECRET"),
+    }
+
+
+def write_delta_submit(table, report_type, key_columns=None, commit_metadata=None):
+    """
+    Append a submit to the Delta table of its report, creating the table on the
+    first submit.
+
+    The transaction log records min/max/null count statistics of the new files,
+    which always include the key columns when the report has a natural key, so
+    readers can skip files. The statistics columns are set when the table is
+    created. New columns are merged into the table schema.
+
+    Args:
+        table (pyarrow.Table): The submitted table, with the load metadata columns.
+        report_type (str): The report name as defined in the YAML configuration.
+        key_columns (list, optional): The natural key of the report.
+        commit_metadata (dict, optional): String values stored with the commit,
+            e.g. the original file name.
+
+    Returns:
+        int: The version of the table after the commit.
+    """
+    # Imported on first use to keep the app start fast
+    from deltalake import CommitProperties, DeltaTable, write_deltalake
+
+    # Delta has no null type, e.g. for an empty column of a CSV file
+    table = table.cast(
+        pa.schema(
+            field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+            for field in table.schema
+        )
+    )
+
+    table_uri = get_delta_table_uri(report_type)
+    storage_options = get_storage_options(table_uri)
+    configuration = None
+    if key_columns:
+        # Statistics are kept for the first DELTA_STATS_COLUMNS columns; the
+        # key columns come first so they always have statistics
+        stats_columns = key_columns + [
+            column for column in table.column_names if column not in key_columns
+        ]
+        configuration = {
+            "delta.dataSkippingStatsColumns": ",".join(
+                stats_columns[:DELTA_STATS_COLUMNS]
+            )
+        }
+
+    write_deltalake(
+        table_uri,
+        table,
+        mode="append",
+        schema_mode="merge",
+        configuration=configuration,
+        storage_options=storage_options,
+        commit_properties=CommitProperties(custom_metadata=commit_metadata),
+    )
+    delta_table = DeltaTable(table_uri, storage_options=storage_options)
+    version = delta_table.version()
+
+    if DELTA_OPTIMIZE_EVERY > 0 and version > 0 and version % DELTA_OPTIMIZE_EVERY == 0:
+        try:
+            optimize_delta_table(delta_table, key_columns)
+        except Exception as e:
+            # The submit is committed; compaction is retried after the next N submits
+            logging.error(f"Optimizing the Delta table {table_uri} failed: {e}")
+    return version
+
+
+def optimize_delta_table(delta_table, key_columns=None):
+    """
+    Compact the small files of a Delta table into files of DELTA_TARGET_FILE_BYTES.
+
+    With key columns, the rows are Z-ordered on them, so files cover narrow key
+    ranges and a query on the key skips most of them.
+
+    Args:
+        delta_table (deltalake.DeltaTable): The table to optimize.
+        key_columns (list, optional): The natural key of the report.
+
+    Returns:
+        dict: The metrics of the optimization (files added and removed, ...).
+    """
+    if key_columns:
+        return delta_table.optimize.z_order(
+            key_columns, target_size=DELTA_TARGET_FILE_BYTES
+        )
+    return delta_table.optimize.compact(target_size=DELTA_TARGET_FILE_BYTES)
@@ -0,0 +1,188 @@
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# Largest export (and largest table read into memory, e.g. for Excel) the
+# Explorer builds for multiple files
+EXPLORER_MAX_BYTES = int(os.getenv("EXPLORER_MAX_BYTES", str(512 * 1024**2)))
+
+# Rows per batch when files are streamed into an export
+EXPORT_BATCH_ROWS = 64 * 1024
+
+EXPORT_FORMATS = {"Excel": ".xlsx", "CSV": ".csv", "Parquet": ".parquet"}
+
+# Load metadata columns that are not exported to Excel
+EXCEL_DROPPED_COLUMNS = [
+    "deltalake_loadtime",
+    "deltalake_filename",
+    "original_filename",
+]
+
+
+class ExportTooLargeError(Exception):
+    """Raised when an export would exceed EXPLORER_MAX_BYTES."""
+
+
+def unify_parquet_schemas(paths):
+    """
+    Unify the schemas of Parquet files, e.g. versions of a report whose
+    columns were added, removed or widened over time.
+
+    Only the file footers are read.
+
+    Args:
+        paths (list): Paths of the local Parquet files.
+
+    Returns:
+        pyarrow.Schema: A schema with every column of every file; columns
+            with different types get a type all of them can be cast to.
+    """
+    import pyarrow.parquet as pq
+
+    return pa.unify_schemas(
+        [pq.read_schema(path) for path in paths], promote_options="permissive"
+    )
+
+
+def conform_batch(batch, schema):
+    """
+    Cast a record batch to a unified schema, filling missing columns with nulls.
+
+    Args:
+        batch (pyarrow.RecordBatch): The batch to conform.
+        schema (pyarrow.Schema): The schema from unify_parquet_schemas.
+
+    Returns:
+        pyarrow.RecordBatch: The batch with the columns of the schema.
+    """
+    arrays = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        if index == -1:
+            arrays.append(pa.nulls(batch.num_rows, field.type))
+        else:
+            arrays.append(batch.column(index).cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_unified_batches(paths, schema):
+    """
+    Stream the rows of Parquet files in batches with a unified schema.
+
+    Args:
+        paths (list): Paths of the local Parquet files.
+        schema (pyarrow.Schema): The schema from unify_parquet_schemas.
+
+    Yields:
+        pyarrow.RecordBatch: The next batch of rows.
+    """
+    import pyarrow.parquet as pq
+
+    for path in paths:
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=EXPORT_BATCH_ROWS):
+            yield conform_batch(batch, schema)
+
+
+def get_total_uncompressed_size(paths):
+    """
+    Estimate the in-memory size of Parquet files from their row group metadata.
+
+    Args:
+        paths (list): Paths of the local Parquet files.
+
+    Returns:
+        int: The total uncompressed size in bytes.
+    """
+    import pyarrow.parquet as pq
+
+    total_bytes = 0
+    for path in paths:
+        metadata = pq.read_metadata(path)
+        total_bytes += sum(
+            metadata.row_group(index).total_byte_size
+            for index in range(metadata.num_row_groups)
+        )
+    return total_bytes
+
+
+def write_export(paths, export_format, output):
+    """
+    Write Parquet files as a single export file.
+
+    CSV and Parquet exports are streamed batch by batch; an Excel export is
+    built in memory, so it is refused when the files exceed EXPLORER_MAX_BYTES.
+
+    Args:
+        paths (list): Paths of the local Parquet files, concatenated in order.
+        export_format (str): One of EXPORT_FORMATS.
+        output: A writable binary file object.
+
+    Raises:
+        ExportTooLargeError: If an Excel export would exceed EXPLORER_MAX_BYTES.
+        ValueError: If the export format is not supported.
+    """
+    import pyarrow.parquet as pq
+
+    schema = unify_parquet_schemas(paths)
+
+    if export_format == "Parquet":
+        with pq.ParquetWriter(output, schema) as writer:
+            for batch in iter_unified_batches(paths, schema):
+                writer.write_batch(batch)
+    elif export_format == "CSV":
+        with pv.CSVWriter(output, schema) as writer:
+            for batch in iter_unified_batches(paths, schema):
+                writer.write_batch(batch)
+    elif export_format == "Excel":
+        if get_total_uncompressed_size(paths) > EXPLORER_MAX_BYTES:
+            raise ExportTooLargeError(
+                "The files are too large to export to Excel. "
+                "Export them as CSV or Parquet instead."
+            )
+        df = pa.Table.from_batches(
+            iter_unified_batches(paths, schema), schema=schema
+        ).to_pandas()
+        df.drop(
+            columns=[col for col in EXCEL_DROPPED_COLUMNS if col in df.columns],
+            inplace=True,
+        )
+        # xlsxwriter needs a seekable file, e.g. not a zip entry
+        excel_buffer = io.BytesIO()
+        with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
+            df.to_excel(writer, index=False, sheet_name="Sheet1")
+        output.write(excel_buffer.getvalue())
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def write_zip_export(paths, file_names, export_format, output):
+    """
+    Write a zip archive with one export per Parquet file.
+
+    The files are exported one at a time and streamed into the archive, so
+    only one file's export is in progress at a time.
+
+    Args:
+        paths (list): Paths of the local Parquet files.
+        file_names (list): The names of the files in storage, one per path.
+        export_format (str): One of EXPORT_FORMATS.
+        output: A writable binary file object.
+
+    Raises:
+        ExportTooLargeError: If the archive exceeds EXPLORER_MAX_BYTES.
+    """
+    extension = EXPORT_FORMATS[export_format]
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, file_name in zip(paths, file_names):
+            entry_name = os.path.splitext(os.path.basename(file_name))[0] + extension
+            with archive.open(entry_name, "w", force_zip64=True) as entry:
+                write_export([path], export_format, entry)
+            if output.tell() > EXPLORER_MAX_BYTES:
+                raise ExportTooLargeError(
+                    "The archive is too large to download. Select fewer files."
+                )
@@ -1,24 +1,52 @@
-import datetime
-import json
+import contextlib
+import hashlib
 import logging
 import os
-import re
 import shutil
-import tempfile
-from io import BytesIO
+import uuid
+from typing import Optional
 
-import duckdb
 import pandas as pd
 import pyarrow as pa
-import pyarrow.compute as pc
-import pyarrow.parquet as pq
 import streamlit as st
-import yaml
-from azure.identity import ClientSecretCredential
-from azure.storage.blob import BlobServiceClient
 from bidict import bidict
-from dbt.cli.main import dbtRunner, dbtRunnerResult
 from dotenv import dotenv_values, load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from admission import admission, estimate_job_bytes, get_admission_state
+from compressed_files import split_file_type
+from incremental_validation import (
+    FAILING_ROWS_LIMIT,
+    DbtTestResult,
+    compute_column_hashes,
+    get_changed_columns,
+    get_failing_rows,
+    merge_test_results,
+    run_tests_in_duckdb,
+    select_tests_to_rerun,
+)
+from preview_grid import display_table_page
+from session_store import delete_table, get_table, put_table, scratch_file_path
+from table_processing import (
+    MEMORY_FILESYSTEM,
+    MemoryFile,
+    cast_pyarrow_table_columns_to_types,
+    get_file_size,
+    get_yaml_definitions,
+    read_uploaded_table,
+    resolve_headers,
+)
+from tracing import (
+    export_openmetrics,
+    get_counters,
+    get_spans,
+    stage_summary,
+    trace_stage,
+)
+
+# Request header with the signed-in user, set by the authenticating proxy (e.g.
+# Azure App Service authentication); sessions without it count as separate users
+ADMISSION_USER_HEADER = os.getenv("ADMISSION_USER_HEADER", "X-Ms-Client-Principal-Name")
 
 # Setting up logging
 logging.basicConfig(
@@ -41,120 +69,34 @@ if os.path.exists(".env"):
     config = dotenv_values(".env")
 
 
-def get_pyarrow_dtype(dtype):
+def hash_uploaded_file(uploaded_file):
     """
-    Map a YAML string data type descriptor to a corresponding PyArrow data type.
+    Computes a digest of the content of an uploaded file without copying it.
 
     Args:
-    dtype (str): A string representing the data type, e.g., 'string', 'decimal(10,2)', 'date'.
+        uploaded_file: The uploaded file (an in-memory BytesIO).
 
     Returns:
-    pyarrow.DataType: The corresponding PyArrow data type.
-
-    Raises:
-    ValueError: If the provided data type is not supported.
-    """
-    if dtype == "string":
-        return pa.string()
-    elif dtype.startswith("decimal"):
-        # Extract precision and scale for decimal types
-        precision, scale = map(
-            int, dtype[dtype.find("(") + 1 : dtype.find(")")].split(",")
-        )
-        return pa.decimal128(precision, scale)
-    elif dtype == "date":
-        return pa.date32()
-    elif dtype == "int32":
-        return pa.int32()
-    elif dtype == "int64":
-        return pa.int64()
-    elif dtype == "float32":
-        return pa.float32()
-    elif dtype == "float64":
-        return pa.float64()
-    elif dtype == "bool":
-        return pa.bool_()
-    # Add additional data types as necessary
-    else:
-        raise ValueError(f"Unsupported data type: {dtype}")
-
-
-def cast_pyarrow_table_columns_to_types(table, model_data_types):
+        str: The hex digest of the file content.
     """
-    Casts columns of a PyArrow Table to specified data types based on a schema.
+    # getvalue() returns the bytes the BytesIO was created from; getbuffer()
+    # would make the BytesIO copy them
+    return hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
 
-    Args:
-        table (pyarrow.Table): The input table to be converted.
-        model_data_types (dict): A dictionary mapping column names to data type descriptors.
 
-    Returns:
-        pyarrow.Table: The table with columns cast to the specified data types.
-    """
-    new_columns = []
-    all_column_type_matched = True
-
-    for column_name in table.schema.names:
-        if column_name in model_data_types:
-            try:
-                dtype = model_data_types[column_name]
-                arrow_type = get_pyarrow_dtype(dtype)
-
-                # pyarrow.csv or duckdb int values such as [1, 2, 3] will be casted to int64
-                # due to pyarrow cannot cast directly from int64 to decimal(16,4)
-                # Check if the column is of int64 type and needs to be cast to decimal(16,4)
-                if (
-                    table.column(column_name).type == pa.int64()
-                    and dtype == "decimal(16,4)"
-                ):
-                    # Step 1: Cast from int64 to int32
-                    intermediate_column = table.column(column_name).cast(pa.int32())
-                    # Step 2: Cast from int32 to decimal(16,4)
-                    casted_column = intermediate_column.cast(arrow_type)
-                else:
-                    # Direct casting for other types
-                    casted_column = table.column(column_name).cast(arrow_type)
-
-                new_columns.append(casted_column)
-                print(f"Column '{column_name}' successfully cast to {dtype}.")
-            except Exception as e:
-                # Attempt to show unique values from the problematic column
-                try:
-                    unique_values = pc.unique(table.column(column_name))
-                    if len(unique_values) > 5:
-                        unique_values = unique_values.slice(0, 5)
-                    examples = unique_values.to_pandas().tolist()
-                except Exception as e_inner:
-                    examples = ["Error fetching examples: " + str(e_inner)]
-
-                error_message = f"""
-                    Error converting column '{column_name}' to `{dtype}`.
-                    - Error Details: `{str(e)}`
-                    - Examples of data from the column: {examples}
-                    """
-                print(error_message)
-                st.warning(error_message)
-                new_columns.append(table.column(column_name))
-                all_column_type_matched = False
-        else:
-            # If the column is not in the schema, use the original column
-            new_columns.append(table.column(column_name))
-
-    if all_column_type_matched:
-        print("All columns have been successfully cast.")
-    else:
-        print("Not all columns could be converted to the specified types.")
-
-    return pa.Table.from_arrays(
-        new_columns, names=table.schema.names
-    ), all_column_type_matched
-
-
-def save_uploaded_file(uploaded_file):
+def save_uploaded_file(uploaded_file, directory=None):
     """
     Saves uploaded file to a temporary file and returns the path.
 
+    In the session's scratch directory, the file is named after the content
+    hash, so it is only written once per content, however often the app
+    reruns. In another directory, every call writes its own file, which the
+    caller removes once it is no longer needed.
+
     Args:
         uploaded_file: The uploaded file to save.
+        directory (str, optional): The directory to save the file in; defaults
+            to the session's scratch directory.
 
     Returns:
         str: The file path where the uploaded file is saved.
@@ -168,16 +110,22 @@ def save_uploaded_file(uploaded_file):
     file_type = st.session_state["file_type"]
 
     try:
-        # Create a temporary file with the appropriate file extension
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix=file_type, mode="wb"
-        ) as temp_file:
-            # Write the content of the uploaded file to the temporary file
-            shutil.copyfileobj(uploaded_file, temp_file)
-            temp_file_path = temp_file.name
-
-        # Optional: Show the path in the Streamlit app (for debugging)
-        # st.write(f"Temporary file saved to {temp_file_path}")
+        # By default the temporary file lives in the session's scratch
+        # directory, which is removed once the session ends
+        file_name = f"upload-{hash_uploaded_file(uploaded_file)}{file_type}"
+        if directory is not None:
+            # Sessions uploading the same file must not remove each other's copy
+            file_name = f"upload-{uuid.uuid4().hex}{file_type}"
+            os.makedirs(directory, exist_ok=True)
+            temp_file_path = os.path.join(directory, file_name)
+        else:
+            temp_file_path = scratch_file_path(file_name)
+        if not os.path.exists(temp_file_path):
+            # Write under a unique name first so readers never see a partial file
+            partial_file_path = f"{temp_file_path}.{uuid.uuid4().hex}.partial"
+            with open(partial_file_path, "wb") as temp_file:
+                temp_file.write(uploaded_file.getvalue())
+            os.replace(partial_file_path, temp_file_path)
 
         return temp_file_path
 
@@ -186,66 +134,30 @@ def save_uploaded_file(uploaded_file):
         return None
 
 
-# Function to read schema.yml files and get table column definitions
-def get_yaml_definitions():
-    # Current working directory
-    base_dir = os.getcwd()
-    # Relative path from the current working directory
-    yaml_relative_path = os.path.join(
-        base_dir, "FileUploaderDBT", "models", "validation"
-    )
-    configuration_file_paths = []
-    for root, _, files in os.walk(yaml_relative_path):
-        for file in files:
-            if file.endswith(".yml"):
-                configuration_file_paths.append(os.path.join(root, file))
+def register_uploaded_file(uploaded_file):
+    """
+    Makes an uploaded file readable by DuckDB without writing it to disk.
 
-    report_name_and_alias_dict = bidict()
-    columns_by_table = {}
-    columns_type_by_table = {}
+    The upload's bytes are shared with an in-memory fsspec file, not copied.
+    The file must be removed with `unregister_uploaded_file` once it is read.
+
+    Args:
+        uploaded_file: The uploaded file to register.
+
+    Returns:
+        str: A memory:// path that DuckDB can read once the filesystem is registered.
+    """
+    file_type = st.session_state["file_type"]
+    path = f"/uploads/{uuid.uuid4().hex}{file_type}"
+    MEMORY_FILESYSTEM.store[path] = MemoryFile(
+        MEMORY_FILESYSTEM, path, uploaded_file.getvalue()
+    )
+    return f"memory://{path}"
 
-    for path in configuration_file_paths:
-        try:
-            # For each model definition
-            with open(path) as file:
-                content = yaml.safe_load(file)
-
-                # Get the first defined source
-                model = content.get("sources", [])[0]
-
-                # Get the first defined table
-                table = model.get("tables", [])[0]
-
-                # Get Report name
-                report_name = table.get("name")
-                report_name_and_alias_dict[report_name] = report_name
-
-                # Get report alias if exists.
-                table_alias = table.get("table_alias")
-                if table_alias:
-                    report_name_and_alias_dict[report_name] = table_alias
-
-                # Placeholder for column_names & column_datatypes
-                column_name_dict = {}
-                column_datatype_dict = {}
-                # Get column information
-                for col in table.get("columns", []):
-                    # Column names
-                    sanatized_name = sanatize_string(col["name"])
-                    column_name_dict[sanatized_name] = col["name"]
-
-                    # datatypes
-                    column_datatype_dict[col["name"]] = col["data_type"]
-
-                columns_by_table[report_name] = column_name_dict
-                columns_type_by_table[report_name] = column_datatype_dict
-
-        except yaml.YAMLError as exc:
-            logging.error(f"Error reading YAML file {path}: {exc}")
-        except FileNotFoundError:
-            logging.error(f"File not found: {path}")
 
-    return columns_by_table, columns_type_by_table, report_name_and_alias_dict
+def unregister_uploaded_file(path):
+    if MEMORY_FILESYSTEM.exists(path):
+        MEMORY_FILESYSTEM.rm(path)
 
 
 def read_csv_and_excel_files(temp_file_path, file_type):
@@ -254,7 +166,7 @@ def read_csv_and_excel_files(temp_file_path, file_type):
 
     Args:
         temp_file_path (str): Path to the file to be processed.
-        file_type (str): Type of the file ('.csv' or '.xlsx').
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
 
     Returns:
         tuple: Depending on the file type, returns a tuple:
@@ -264,75 +176,34 @@ def read_csv_and_excel_files(temp_file_path, file_type):
 
     file_type = st.session_state["file_type"]
 
-    # Connect to the DuckDB instance
-    con = duckdb.connect(database=":memory:", read_only=False)
-
-    # Install and load the spatial extension
-    con.execute("INSTALL spatial;")
-    con.execute("LOAD spatial;")
-
-    # Try to read the file based on its type and catch any exceptions
     try:
-        if file_type == ".csv":
-            # Processing CSV files
-            try:
-                # Use DuckDB's sniff_csv to get properties
-                df_csv_prop_sniff = con.execute(
-                    f"SELECT * FROM sniff_csv('{temp_file_path}')"
-                ).fetchdf()
-                read_auto_table = con.execute(
-                    f"SELECT * FROM read_csv_auto('{temp_file_path}')"
-                ).fetch_arrow_table()
-
-                # Remove empty rows
-                read_auto_table = remove_empty_rows(read_auto_table)
-
-                # Strip column names for special characters.
-                read_auto_table = sanatize_table_column_names(read_auto_table)
-
-                # Transpose the sniffed properties DataFrame and filter
-                df_csv_prop_transposed = df_csv_prop_sniff.T
-                df_csv_prop_transposed.reset_index(inplace=True)
-                df_csv_prop_transposed.columns = ["Properties", "Values"]
-                df_csv_prop_filtered = df_csv_prop_transposed[
-                    ~df_csv_prop_transposed["Properties"].isin(["Columns", "Prompt"])
-                ]  # Filter out 'Columns' and 'Prompt' rows
-
-                return df_csv_prop_filtered, read_auto_table
-
-            except Exception as e:
-                st.error(f"Error processing CSV file: {e}")
-                return pd.DataFrame(), pa.Table.from_pandas(pd.DataFrame())
-
-        elif file_type == ".xlsx":
-            # Processing Excel files using DuckDB
-            try:
-                read_auto_table = con.execute(
-                    f"SELECT * FROM st_read('{temp_file_path}', open_options = ['HEADERS=FORCE'])"
-                ).fetch_arrow_table()
-
-                # Remove empty rows
-                read_auto_table = remove_empty_rows(read_auto_table)
-
-                # Strip column names for special characters.
-                read_auto_table = sanatize_table_column_names(read_auto_table)
-
-                return pd.DataFrame(), read_auto_table
-
-            except Exception as e:
-                st.error(f"Error processing Excel file: {e}")
-                return pd.DataFrame(), pa.Table.from_pandas(pd.DataFrame())
-
-        else:
-            raise ValueError("Unsupported file type provided. Use 'csv' or 'xlsx'.")
-
+        with trace_stage(
+            "ingest",
+            report_type=st.session_state.get("report_type"),
+            file_type=file_type,
+            bytes=get_file_size(temp_file_path),
+        ) as span:
+            df_prop_filtered, read_auto_table = read_uploaded_table(
+                temp_file_path,
+                file_type,
+                span=span,
+                report_type=st.session_state.get("report_type"),
+            )
+            span["rows"] = read_auto_table.num_rows
+            span["columns"] = read_auto_table.num_columns
+            # Calibrates the memory estimate of admission control
+            span["table_bytes"] = read_auto_table.nbytes
     except Exception as e:
-        st.error(f"An error occurred: {e}")
+        data_type, _ = split_file_type(file_type)
+        if data_type == ".csv":
+            st.error(f"Error processing CSV file: {e}")
+        elif data_type == ".xlsx":
+            st.error(f"Error processing Excel file: {e}")
+        else:
+            st.error(f"An error occurred: {e}")
         return pd.DataFrame(), pa.Table.from_pandas(pd.DataFrame())
 
-    finally:
-        # Ensure the connection is closed after processing
-        con.close()
+    return df_prop_filtered, read_auto_table
 
 
 def preview_file(
@@ -351,9 +222,7 @@ def preview_file(
             - Arrow Table from reading the file.
     """
     file_type = st.session_state["file_type"]
-
-    # Ensure file_type is normalized to be without the initial dot
-    file_type = file_type.lower().replace(".", "")
+    data_type, _ = split_file_type(file_type)
 
     # Check if the uploaded file is not None
     if uploaded_file is None:
@@ -361,8 +230,26 @@ def preview_file(
         return None, None
 
     try:
-        # Save the uploaded file and update the session state
+        if data_type == ".csv" and MEMORY_FILESYSTEM is not None:
+            # CSV files are read by DuckDB straight from the upload buffer,
+            # and compressed ones are decompressed while they are read
+            memory_file_path = register_uploaded_file(uploaded_file)
+            try:
+                return read_csv_and_excel_files(memory_file_path, file_type)
+            finally:
+                unregister_uploaded_file(memory_file_path)
+
+        # Excel files are read by GDAL, which needs a path on disk
         temp_file_path = save_uploaded_file(uploaded_file)
+
+        # Replace the previous temporary file of this session
+        previous_temp_file_path = st.session_state.get("temp_file_path")
+        if (
+            previous_temp_file_path
+            and previous_temp_file_path != temp_file_path
+            and os.path.exists(previous_temp_file_path)
+        ):
+            os.remove(previous_temp_file_path)
         st.session_state["temp_file_path"] = temp_file_path
 
         # Use the read_csv_and_excel_files function to process the file
@@ -380,6 +267,49 @@ def preview_file(
         return None, None
 
 
+def get_upload_profile(uploaded_file, read_auto_table, report_type):
+    """
+    Get the column profile of an upload, computing it only once per file and report.
+
+    Args:
+        uploaded_file: The uploaded file.
+        read_auto_table (pyarrow.Table): The table read from the uploaded file.
+        report_type (str): The selected report type.
+
+    Returns:
+        pandas.DataFrame: One row per column with its statistics.
+    """
+    from profiling import profile_table
+
+    profile_key = (uploaded_file.file_id, report_type)
+    cached_profile = st.session_state.get("upload_profile")
+    if cached_profile and cached_profile["key"] == profile_key:
+        return cached_profile["profile"]
+
+    # Compare values with the YAML type of each column the header resolves to
+    columns_by_table, columns_type_by_table, _ = get_yaml_definitions()
+    new_names, _, _, _ = resolve_headers(
+        read_auto_table.column_names, columns_by_table.get(report_type, {})
+    )
+    column_types = columns_type_by_table.get(report_type, {})
+    expected_types = {
+        column: column_types[name]
+        for column, name in zip(read_auto_table.column_names, new_names)
+        if name in column_types
+    }
+
+    with trace_stage(
+        "profile",
+        report_type=report_type,
+        rows=read_auto_table.num_rows,
+        columns=read_auto_table.num_columns,
+    ):
+        profile = profile_table(read_auto_table, expected_types)
+
+    st.session_state["upload_profile"] = {"key": profile_key, "profile": profile}
+    return profile
+
+
 def validate_column_names(arrow_table, yaml_columns):
     """
     Validates column names in the uploaded file against the expected columns defined in the YAML configuration.
@@ -389,74 +319,195 @@ def validate_column_names(arrow_table, yaml_columns):
         yaml_columns (dict): Get expected columns for the report from YAML configuration
 
     Returns:
-        bool: True if the uploaded file's columns match the expected columns, False otherwise.
+        tuple:
+            - bool: True if the uploaded file's columns match the expected columns,
+              False otherwise.
+            - list: Column names to rename the table to, following the YAML schema.
     """
-    # Convert column names to lowercase for comparison
-    file_columns = [col.lower() for col in arrow_table.schema.names]
-
-    # Strip special characters
-    file_columns = sanatize_string_list(file_columns)
-
     # Find missing and extra columns
-    missing_in_file = set(yaml_columns) - set(file_columns)
-    extra_in_file = set(file_columns) - set(yaml_columns)
+    new_names, missing_in_file, extra_in_file, suggestions = resolve_headers(
+        arrow_table.schema.names, yaml_columns
+    )
 
     # Validate column names against YAML configuration
+    column_is_valid = display_column_name_results(
+        missing_in_file, extra_in_file, suggestions
+    )
+    return column_is_valid, new_names
+
+
+def display_column_name_results(missing_in_file, extra_in_file, suggestions):
+    """
+    Displays the result of matching the file's columns with the YAML columns.
+
+    Args:
+        missing_in_file (set): YAML columns that are missing in the file.
+        extra_in_file (set): File columns that are not defined in the YAML.
+        suggestions (dict): Extra file column -> closest missing YAML column.
+
+    Returns:
+        bool: True if the columns match.
+    """
     if missing_in_file or extra_in_file:
         if missing_in_file:
             st.error(f"Columns in the YAML but not in the file: {missing_in_file}")
         if extra_in_file:
             st.error(f"Columns in the file but not in the YAML: {extra_in_file}")
+        for column, suggestion in sorted(suggestions.items()):
+            st.info(f"Column '{column}' in the file: did you mean '{suggestion}'?")
         return False
     else:
         st.success("Column names in the file match the YAML file.")
         return True
 
 
-# Later in your code, use this context manager
-def run_dbt(table_name):
-    # Initialize DBT runner
+def get_validation_work_dir():
+    """
+    Returns the directory holding the session's DuckDB database and dbt files.
+
+    Every session validates in its own directory, so concurrent validations
+    never share a database or dbt target directory.
+
+    Returns:
+        str: The path of the work directory.
+    """
+    work_dir = scratch_file_path("dbt")
+    os.makedirs(work_dir, exist_ok=True)
+    return work_dir
 
-    os.chdir("FileUploaderDBT")
 
-    dbt = dbtRunner()
+def run_dbt(table_name, work_dir):
+    """
+    Runs the DBT tests of a report against the database in the work directory.
 
-    # Create CLI arguments as a list of strings
-    cli_args = ["test", "--select", f"source:uploaded_files.{table_name}"]
+    Args:
+        table_name (str): The report name as defined in the YAML configuration.
+        work_dir (str): The validation work directory.
 
-    # Run the DBT command
-    try:
-        res: dbtRunnerResult = dbt.invoke(cli_args)
+    Returns:
+        list: The annotated test results, or None if DBT produced no results.
+    """
+    from dbt_runner import run_dbt_tests
 
-        # Check and display the results
-        if res.result:
-            for r in res.result:
-                print(f"{r.node.name}: {r.status}")
-                # st.write(f"{r.node.name}: {r.status}")
-        else:
-            print("No result from DBT run")
+    try:
+        return run_dbt_tests(table_name, work_dir)
     except Exception as e:
-        print(f"Error during DBT run: {e}")
+        logging.exception(f"Error during DBT run of {table_name}")
         st.error(f"Error during DBT run: {e}")
-
-    os.chdir("..")
+        return None
 
 
 # Creating columns for width control
 def display_test_summary(summary_df):
     col1, _, _ = st.columns([3, 3, 3])  # Adjusting the width of the columns
     # Display the summary of DBT test results using Streamlit
-    with col1:
-        with st.expander("Summary", expanded=True):
-            st.dataframe(summary_df, use_container_width=True)
+    with col1, st.expander("Summary", expanded=True):
+        st.dataframe(summary_df, use_container_width=True)
+
+
+def show_admin_panel():
+    # The admin panel is optional and only shown when enabled in the environment
+    return os.getenv("SHOW_ADMIN_PANEL", "false").strip().lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+
+# Display per-stage latency and memory metrics collected by the tracing layer
+def display_admin_panel():
+    from reference_data import refresh_reference_data
+
+    if st.button("Refresh reference data"):
+        refresh_reference_data()
+        st.success("Reference data will be reloaded on the next validation.")
+
+    # Hit ratio and traffic saved by the Explorer's local blob cache
+    counters = get_counters()
+    cache_requests = counters.get("blob_cache_hits", 0) + counters.get(
+        "blob_cache_misses", 0
+    )
+    if cache_requests:
+        hit_col, saved_col, downloaded_col = st.columns(3)
+        hit_col.metric(
+            "Blob cache hit ratio",
+            f"{counters.get('blob_cache_hits', 0) / cache_requests:.0%}",
+        )
+        saved_col.metric(
+            "Bytes saved (MB)",
+            f"{counters.get('blob_cache_bytes_saved', 0) / (1024 * 1024):,.1f}",
+        )
+        downloaded_col.metric(
+            "Bytes downloaded (MB)",
+            f"{counters.get('blob_cache_bytes_downloaded', 0) / (1024 * 1024):,.1f}",
+        )
+
+    # Memory budget of admission control and the jobs using or waiting for it
+    admission_state = get_admission_state()
+    budget_col, running_col, waiting_col = st.columns(3)
+    budget_col.metric(
+        "Admission budget (MB)",
+        f"{admission_state['budget_bytes'] / (1024 * 1024):,.0f}"
+        if admission_state["budget_bytes"] > 0
+        else "No limit",
+    )
+    running_col.metric(
+        "Running jobs (estimated MB)",
+        f"{admission_state['running_jobs']} "
+        f"({admission_state['running_bytes'] / (1024 * 1024):,.0f})",
+    )
+    waiting_col.metric(
+        "Queued jobs (estimated MB)",
+        f"{admission_state['waiting_jobs']} "
+        f"({admission_state['waiting_bytes'] / (1024 * 1024):,.0f})",
+    )
+
+    summary = stage_summary()
+    if not summary:
+        st.info("No pipeline stages have been recorded yet.")
+        return
+
+    summary_df = pd.DataFrame(summary)
+    summary_df["max_peak_memory_delta_bytes"] = (
+        summary_df["max_peak_memory_delta_bytes"] / (1024 * 1024)
+    ).round(1)
+    summary_df.columns = [
+        "Stage",
+        "Count",
+        "Errors",
+        "p50 (ms)",
+        "p95 (ms)",
+        "Max peak memory delta (MB)",
+    ]
+
+    with st.expander("Stage latency", expanded=True):
+        st.dataframe(summary_df, use_container_width=True, hide_index=True)
+
+    with st.expander("Recent spans", expanded=False):
+        st.dataframe(
+            pd.DataFrame(get_spans()[-200:][::-1]),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    st.download_button(
+        label="Download OpenMetrics",
+        data=export_openmetrics(),
+        file_name="file_uploader_metrics.txt",
+        mime="text/plain",
+    )
 
 
 # Processes failed DBT tests and returns a DataFrame with their details.
 def process_failed_tests(failed_tests):
-    for test in failed_tests:
-        test["unique_id"] = test["unique_id"].split(".")[
-            -2
-        ]  # Trim the unique_id to display a more readable format
+    failed_tests = [
+        {
+            **test,
+            # Trim the unique_id to display a more readable format
+            "unique_id": test["unique_id"].split(".")[-2],
+        }
+        for test in failed_tests
+    ]
 
     # Create a DataFrame for detailed information of failed tests
     failed_tests_df = pd.DataFrame(failed_tests)
@@ -472,18 +523,110 @@ def process_failed_tests(failed_tests):
     return failed_tests_df
 
 
-# Function to process and display the results of DBT tests
-def process_dbt_results(results_file):
-    # Check if the results file exists
-    if os.path.exists(results_file):
-        # Load the results file
-        with open(results_file) as f:
-            run_results = json.load(f)
+def display_failing_rows(failed_tests, database):
+    """
+    Show a sample of the rows a failed test flagged. The rows are only queried
+    once the user asks for them.
+
+    Args:
+        failed_tests (list): The results of the failed tests.
+        database (str): Path to the DuckDB database the tests ran against.
+    """
+    import duckdb
+
+    tests_by_id = {
+        test["unique_id"]: test for test in failed_tests if test.get("compiled_code")
+    }
+    if not tests_by_id:
+        return
+
+    with st.expander("Failing rows"):
+        unique_id = st.selectbox("Test", list(tests_by_id), key="failing_rows_test")
+        if st.toggle("Show failing rows", key="show_failing_rows"):
+            try:
+                failing_rows = get_failing_rows(database, tests_by_id[unique_id])
+            except duckdb.Error as e:
+                st.error(f"Could not load the failing rows: {e}")
+                return
+            st.caption(f"First {FAILING_ROWS_LIMIT} failing rows.")
+            st.dataframe(failing_rows, use_container_width=True)
+
+
+def display_key_overlaps(casted_read_auto_table, report_type):
+    """
+    Show the rows whose natural key was already submitted in an earlier file
+    of the report, and the files they overlap with.
+
+    Args:
+        casted_read_auto_table (pyarrow.Table): The validated table.
+        report_type (str): The report name as defined in the YAML configuration.
+    """
+    from key_index import (
+        OVERLAPPING_ROWS_LIMIT,
+        find_key_overlaps,
+        get_report_key_columns,
+    )
+
+    with trace_stage(
+        "keys", report_type=report_type, rows=casted_read_auto_table.num_rows
+    ) as span:
+        overlapping, overlaps = find_key_overlaps(report_type, casted_read_auto_table)
+        span["overlapping_files"] = len(overlaps)
+    if overlapping is None:
+        return
+
+    st.markdown("---")
+    st.subheader("Previously submitted keys")
+    key_columns = ", ".join(get_report_key_columns(report_type))
+    overlapping_rows = int(overlapping.sum())
+    if not overlapping_rows:
+        st.success(f"No rows overlap earlier submits on the key ({key_columns}).")
+        return
+
+    st.warning(
+        f"{overlapping_rows} of {casted_read_auto_table.num_rows} rows have a key "
+        f"({key_columns}) that was already submitted in {len(overlaps)} file(s)."
+    )
+    overlaps_df = pd.DataFrame(overlaps)[
+        ["blob_name", "original_filename", "submitted_at", "overlapping_rows"]
+    ]
+    overlaps_df.columns = [
+        "File",
+        "Original file name",
+        "Submitted at",
+        "Overlapping rows",
+    ]
+    st.dataframe(overlaps_df, hide_index=True, use_container_width=True)
+    with st.expander("Overlapping rows"):
+        st.caption(f"First {OVERLAPPING_ROWS_LIMIT} overlapping rows.")
+        st.dataframe(
+            casted_read_auto_table.filter(pa.array(overlapping))
+            .slice(0, OVERLAPPING_ROWS_LIMIT)
+            .to_pandas(),
+            use_container_width=True,
+        )
+
+
+def process_dbt_results(results: Optional[list[DbtTestResult]], database=None) -> bool:
+    """
+    Display the results of the dbt tests: a summary, the failed tests and,
+    on demand, their failing rows.
+
+    Args:
+        results (list): The DbtTestResult of every test, or None if no tests ran.
+        database (str, optional): The DuckDB database the tests ran against,
+            to query failing rows; not available for worker results.
 
+    Returns:
+        bool: Whether all tests passed; False if there are no results.
+    """
+    # Check if the results exist
+    if results is not None:
         # Calculate the total number of tests and failed tests
-        total_tests = len(run_results["results"])
+        total_tests = len(results)
+        # Tests that could not run (e.g. missing reference data) count as failed
         failed_tests = [
-            result for result in run_results["results"] if result["status"] == "fail"
+            result for result in results if result["status"] in ("fail", "error")
         ]
         passed_tests_count = total_tests - len(failed_tests)
 
@@ -509,6 +652,10 @@ def process_dbt_results(results_file):
             with st.expander("Details", expanded=True):
                 st.dataframe(failed_tests_df, use_container_width=True)
 
+            # Failing rows can only be queried while the session's database exists
+            if database is not None:
+                display_failing_rows(failed_tests, database)
+
             st.session_state["dbt_tests_passed"] = False
 
             return False
@@ -524,189 +671,404 @@ def process_dbt_results(results_file):
 
             return True
     else:
-        # Display an error message if the results file is not found
-        st.error("DBT test results file not found.")
+        # Display an error message if dbt produced no results
+        st.error("DBT test results not found.")
 
         return False
 
 
-def validate_file(read_auto_table):
+def validate_file(read_auto_table, incremental=False):
+    import duckdb
+
+    from reference_data import get_report_references, load_reference_tables
+
     report_type = st.session_state["report_type"]
 
     # Get YAML table definitions
     columns_by_table, columns_type_by_table, _ = get_yaml_definitions()
 
     # Column names validation
-    column_is_valid = validate_column_names(
+    column_is_valid, new_column_names = validate_column_names(
         read_auto_table, columns_by_table[report_type]
     )
     st.session_state["column_is_valid"] = column_is_valid
 
     # Rename columns to follow schema
-    read_auto_table = read_auto_table.rename_columns(columns_by_table[report_type])
+    read_auto_table = read_auto_table.rename_columns(new_column_names)
 
     # # Column types validation
     if column_is_valid:
-        casted_read_auto_table, all_column_type_matched = (
-            cast_pyarrow_table_columns_to_types(
-                read_auto_table, columns_type_by_table[report_type]
-            )
+        # Compare with the previous validation of this session's file
+        previous_validation = (
+            st.session_state.get("validation_cache") if incremental else None
+        )
+        previous_table = (
+            get_table("casted_read_auto_table") if previous_validation else None
+        )
+        if previous_table is None:
+            # The previous table was evicted from the session store
+            previous_validation = None
+        column_hashes = compute_column_hashes(read_auto_table)
+        changed_columns = get_changed_columns(
+            previous_validation, report_type, read_auto_table, column_hashes
         )
 
+        # Only changed columns are re-cast; unchanged ones are reused
+        columns_to_cast = (
+            read_auto_table.column_names if changed_columns is None else changed_columns
+        )
+        with trace_stage(
+            "cast",
+            report_type=report_type,
+            rows=read_auto_table.num_rows,
+            bytes=read_auto_table.nbytes,
+            columns=len(columns_to_cast),
+        ) as span:
+            cast_errors = []
+            casted_changed_table, all_column_type_matched = (
+                cast_pyarrow_table_columns_to_types(
+                    read_auto_table.select(columns_to_cast),
+                    columns_type_by_table[report_type],
+                    cast_errors,
+                )
+            )
+            span["all_column_type_matched"] = all_column_type_matched
+            span["cast_errors"] = len(cast_errors)
+        for cast_error in cast_errors:
+            st.warning(cast_error)
+
+        if changed_columns is None:
+            casted_read_auto_table = casted_changed_table
+        else:
+            casted_read_auto_table = pa.Table.from_arrays(
+                [
+                    casted_changed_table.column(name)
+                    if name in changed_columns
+                    else previous_table.column(name)
+                    for name in read_auto_table.column_names
+                ],
+                names=read_auto_table.column_names,
+            )
+            st.info(
+                f"Incremental validation: {len(changed_columns)} of "
+                f"{read_auto_table.num_columns} columns changed since the last "
+                "validation."
+            )
+
         st.session_state["all_column_type_matched"] = all_column_type_matched
 
         # Display casted_read_auto_table
         with st.expander("File content", expanded=True):
-            st.data_editor(
+            display_table_page(
                 casted_read_auto_table,
-                disabled=True,
-                use_container_width=True,
                 key="unique_data_editor_read_auto_table_validation",
             )
 
         if all_column_type_matched:
-            # Insert casted_read_auto_table into duckdb for futrther dbt testing
-            con = duckdb.connect(database="db.duckdb", read_only=False)
-            con.execute(
-                f"CREATE OR REPLACE TABLE {report_type} AS SELECT * FROM casted_read_auto_table"
-            )
-            con.close()
+            work_dir = get_validation_work_dir()
+            database = os.path.join(work_dir, "db.duckdb")
+
+            # Load the reference data checked by relationships_to_reference tests
+            try:
+                reference_signature = load_reference_tables(
+                    database, get_report_references(report_type)
+                )
+            except FileNotFoundError as e:
+                st.error(f"Reference data is not available: {e}")
+                reference_signature = None
+
+            # Tests that only touch unchanged columns keep their previous result,
+            # unless the reference data changed since
+            tests_to_rerun = None
+            if (
+                changed_columns is not None
+                and previous_validation["reference_signature"] == reference_signature
+            ):
+                tests_to_rerun = select_tests_to_rerun(
+                    previous_validation["results"], changed_columns
+                )
+            reuse_results = tests_to_rerun is not None and not changed_columns
+
+            # Unchanged uploads are already loaded in DuckDB
+            if not reuse_results:
+                # Insert casted_read_auto_table into duckdb for futrther dbt testing
+                con = duckdb.connect(database=database, read_only=False)
+                con.execute(
+                    f"CREATE OR REPLACE TABLE {report_type} AS "
+                    "SELECT * FROM casted_read_auto_table"
+                )
+                con.close()
 
             ##############################################################
             # Run DBT tests after inserting in DuckDB
             with st.spinner(
                 f"Running DBT tests for report {report_type}..."
             ):  # Display a spinner while the function is running
-                run_dbt(report_type)
+                if reuse_results:
+                    results = previous_validation["results"]
+                elif tests_to_rerun is not None:
+                    with trace_stage(
+                        "validate",
+                        report_type=report_type,
+                        rows=casted_read_auto_table.num_rows,
+                        incremental=True,
+                        tests=len(tests_to_rerun),
+                    ):
+                        results = merge_test_results(
+                            previous_validation["results"],
+                            run_tests_in_duckdb(database, tests_to_rerun),
+                        )
+                    st.info(
+                        f"Re-ran {len(tests_to_rerun)} of "
+                        f"{len(previous_validation['results'])} DBT tests."
+                    )
+                else:
+                    with trace_stage(
+                        "validate",
+                        report_type=report_type,
+                        rows=casted_read_auto_table.num_rows,
+                    ):
+                        results = run_dbt(report_type, work_dir)
                 ##############################################################
                 # Horizontal line for visual separation of sections
                 st.markdown("---")
                 st.subheader("DBT tests")
 
-                # Define the path to the DBT results file and process the results
-                results_file = os.path.join(
-                    "FileUploaderDBT", "target", "run_results.json"
-                )
-                all_tests_passed = process_dbt_results(results_file)
+                all_tests_passed = process_dbt_results(results, database)
                 ##############################################################
 
+                display_key_overlaps(casted_read_auto_table, report_type)
+
                 st.session_state["all_tests_passed"] = all_tests_passed
-                st.session_state["casted_read_auto_table"] = casted_read_auto_table
+                casted_read_auto_table = put_table(
+                    "casted_read_auto_table", casted_read_auto_table
+                )
+
+                # Keep this validation as the baseline for the next re-upload
+                if results is not None:
+                    st.session_state["validation_cache"] = {
+                        "report_type": report_type,
+                        "num_rows": read_auto_table.num_rows,
+                        "column_hashes": column_hashes,
+                        "reference_signature": reference_signature,
+                        "results": results,
+                    }
 
                 log_event("File processed and displayed")
 
     else:
-        if "casted_read_auto_table" in st.session_state:
-            del st.session_state["casted_read_auto_table"]
+        delete_table("casted_read_auto_table")
 
 
-def upload_file_to_blob(casted_read_auto_table, report_type, uploaded_file_name):
+def remove_file(path):
     try:
-        # Load credentials from environment variables
-        tenant_id = os.getenv("AZURE_TENANT_ID")
-        client_id = os.getenv("AZURE_CLIENT_ID")
-        client_secret = os.getenv("AZURE_CLIENT_SECRET")
-
-        storage_account_name = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
-        container_name = os.getenv(
-            "AZURE_STORAGE_CONTAINER_NAME"
-        )  # The blob name to be used for the file upload
-        blob_path = os.getenv("AZURE_STORAGE_FILE_PATH")
-
-        # Create Azure AD credentials
-        credential = ClientSecretCredential(
-            tenant_id=tenant_id, client_id=client_id, client_secret=client_secret
-        )
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"Could not remove file {path}: {e}")
 
-        # Create a Blob Storage service client using the service principal for authentication
-        blob_service_client = BlobServiceClient(
-            account_url=f"https://{storage_account_name}.blob.core.windows.net",
-            credential=credential,
-        )
 
-        # Current time for metadata
-        deltalake_loadtime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def remove_validation_job_files(validation_job):
+    remove_file(validation_job["upload_path"])
+    if validation_job["output_path"]:
+        remove_file(validation_job["output_path"])
 
-        # Generate new file name
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        new_filename = f"{uploaded_file_name.split('.')[0]}_{timestamp}.parquet"  # Remove extension and add timestamp
 
-        # Generate blob name
-        blob_name = f"{blob_path}/{report_type}/{new_filename}"
-        blob_client = blob_service_client.get_blob_client(
-            container=container_name, blob=blob_name
-        )
+def load_validation_output(validation_job, result):
+    """
+    Get the table validated by a worker job for preview and submit.
 
-        # Create new columns
-        loadtime_array = pa.array(
-            [deltalake_loadtime] * len(casted_read_auto_table), pa.string()
-        )
-        filename_array = pa.array(
-            [uploaded_file_name] * len(casted_read_auto_table), pa.string()
-        )
-        deltalake_filename_array = pa.array(
-            [new_filename] * len(casted_read_auto_table), pa.string()
-        )
+    The worker's Parquet file is moved from the shared directory to the
+    session's scratch directory when it is first loaded, so the table can be
+    reloaded if the session store evicts it, and is removed with the session.
 
-        # Add columns to the pyarrow table
-        casted_read_auto_table = casted_read_auto_table.append_column(
-            "deltalake_loadtime", loadtime_array
-        )
-        casted_read_auto_table = casted_read_auto_table.append_column(
-            "original_filename", filename_array
-        )
-        casted_read_auto_table = casted_read_auto_table.append_column(
-            "deltalake_filename", deltalake_filename_array
-        )
+    Args:
+        validation_job (dict): The validation job of the session.
+        result (dict): The result of the job.
 
-        # Convert the PyArrow Table to Parquet format and write directly to Blob Storage
-        buffer = BytesIO()
-        pq.write_table(casted_read_auto_table, buffer)
-        buffer.seek(0)  # Reset the buffer position to the beginning
-        blob_client.upload_blob(buffer.getvalue(), overwrite=True)
-        ######################################
-
-        return (
-            f"File '{new_filename}' successfully uploaded to Blob Storage.",
-            f"Original uploaded file name: '{uploaded_file_name}",
-            f"Report type: {report_type}",
-        )
+    Returns:
+        pyarrow.Table: The validated table, or None if the worker's Parquet
+            file or the session's copy of it no longer exists.
+    """
+    import pyarrow.parquet as pq
 
-    except Exception as e:
-        return f"Error uploading file to Blob Storage: {e}"
+    if not validation_job["loaded"]:
+        output_path = scratch_file_path(os.path.basename(result["output_path"]))
+        try:
+            shutil.move(result["output_path"], output_path)
+        except FileNotFoundError:
+            # The workers swept the output of a job that was not loaded in time
+            return None
+        validation_job["output_path"] = output_path
+        validation_job["loaded"] = True
+    else:
+        casted_read_auto_table = get_table("casted_read_auto_table")
+        if casted_read_auto_table is not None:
+            return casted_read_auto_table
+        if not os.path.exists(validation_job["output_path"]):
+            return None
+    return put_table(
+        "casted_read_auto_table", pq.read_table(validation_job["output_path"])
+    )
 
 
-def sanatize_string(string):
-    # Remove special characters using regular expression
-    sanitized_string = re.sub(r"[^a-zA-Z0-9 ]", "", string)
-    # Convert to lowercase
-    sanitized_string = sanitized_string.lower()
-    return sanitized_string
+def dispatch_validation_job(uploaded_file, job_key):
+    """
+    Hands the uploaded file to the validation workers.
 
+    Args:
+        uploaded_file: The uploaded file to validate.
+        job_key (tuple): The file id and report type the job validates.
 
-def sanatize_string_list(string_list):
-    sanitized_list = []
-    for string in string_list:
-        sanitized_list.append(sanatize_string(string))
-    return sanitized_list
+    Returns:
+        dict: The validation job of the session, or None if the file could not
+            be saved.
+    """
+    from worker_client import VALIDATION_UPLOAD_DIR, submit_validation
 
+    # Hand the upload to the workers through the shared directory
+    upload_path = save_uploaded_file(uploaded_file, VALIDATION_UPLOAD_DIR)
+    if upload_path is None:
+        return None
+    validation_job = {
+        "key": job_key,
+        "job_id": submit_validation(
+            upload_path, st.session_state["file_type"], st.session_state["report_type"]
+        ),
+        "upload_path": upload_path,
+        "output_path": None,
+        "loaded": False,
+    }
+    st.session_state["validation_job"] = validation_job
+    log_event(f"Validation job {validation_job['job_id']} dispatched")
+    return validation_job
+
+
+def validate_file_with_worker(uploaded_file):
+    """
+    Validates the uploaded file on the validation worker service and displays
+    the results the same way as `validate_file`.
 
-def sanatize_table_column_names(pyarrow_table):
-    new_names = sanatize_string_list(pyarrow_table.column_names)
-    return pyarrow_table.rename_columns(new_names)
+    The job is dispatched once per uploaded file and report type; reruns only
+    poll the existing job.
 
+    Args:
+        uploaded_file: The uploaded file to validate.
+    """
+    from worker_client import wait_for_validation
 
-def remove_empty_rows(table):
-    if isinstance(table, pd.DataFrame):  # Pandas table
-        return table.dropna(how="all").reset_index(drop=True)
-    elif isinstance(table, pa.lib.Table):  # Pyarrow table
-        df = table.to_pandas().dropna(how="all").reset_index(drop=True)
-        return pa.Table.from_pandas(df)
+    report_type = st.session_state["report_type"]
+    job_key = (uploaded_file.file_id, report_type)
+
+    # If the validated table was swept before it could be loaded, the file is
+    # validated once more
+    for _ in range(2):
+        validation_job = st.session_state.get("validation_job")
+        if not validation_job or validation_job["key"] != job_key:
+            if validation_job:
+                remove_validation_job_files(validation_job)
+            validation_job = dispatch_validation_job(uploaded_file, job_key)
+            if validation_job is None:
+                return
+
+        with st.spinner(f"Validating report {report_type} on the validation worker..."):
+            job = wait_for_validation(validation_job["job_id"])
+
+        # The workers are done with the upload
+        remove_file(validation_job["upload_path"])
+
+        if job["status"] == "failed":
+            st.error(f"Validation failed: {job['error']}")
+            st.session_state["column_is_valid"] = False
+            delete_table("casted_read_auto_table")
+            return
+
+        result = job["result"]
+        casted_read_auto_table = None
+        if not result["output_path"]:
+            break
+        casted_read_auto_table = load_validation_output(validation_job, result)
+        if casted_read_auto_table is not None:
+            break
+        del st.session_state["validation_job"]
     else:
-        raise ValueError(
-            "Unsupported table type. Must be a pandas DataFrame or PyArrow Table."
+        st.error("The validated file is no longer available. Please upload it again.")
+        st.session_state["column_is_valid"] = False
+        return
+
+    column_is_valid = display_column_name_results(
+        set(result["missing_in_file"]),
+        set(result["extra_in_file"]),
+        result["suggestions"],
+    )
+    st.session_state["column_is_valid"] = column_is_valid
+    if not column_is_valid:
+        delete_table("casted_read_auto_table")
+        return
+
+    for cast_error in result["cast_errors"]:
+        st.warning(cast_error)
+    st.session_state["all_column_type_matched"] = result["all_column_type_matched"]
+    if not result["all_column_type_matched"]:
+        return
+
+    with st.expander("File content", expanded=True):
+        display_table_page(
+            casted_read_auto_table,
+            key="unique_data_editor_read_auto_table_validation",
+        )
+
+    st.markdown("---")
+    st.subheader("DBT tests")
+    st.session_state["all_tests_passed"] = process_dbt_results(result["results"])
+    display_key_overlaps(casted_read_auto_table, report_type)
+    log_event("File processed and displayed")
+
+
+def get_session_user():
+    """
+    Get the user of the current session, for the per-user limits of admission control.
+
+    Returns:
+        str: The user name set by the authenticating proxy in the
+            ADMISSION_USER_HEADER header, or the session id.
+    """
+    user = st.context.headers.get(ADMISSION_USER_HEADER)
+    if user:
+        return user
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "anonymous"
+
+
+@contextlib.contextmanager
+def admitted_job(file_size, file_type, action):
+    """
+    Run a memory-heavy step of the session's upload once admission control
+    admits it, showing the queue position while it waits.
+
+    Args:
+        file_size (int): Size of the uploaded file in bytes.
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+        action (str): What the job does, e.g. 'Validation', for the queue message.
+    """
+    estimated_bytes = estimate_job_bytes(file_size, file_type)
+    placeholder = st.empty()
+
+    def show_queue_position(position):
+        placeholder.info(
+            f"{action} is queued: the server is busy with other large files. "
+            f"Position in the queue: {position}."
         )
 
+    with admission(
+        get_session_user(), estimated_bytes, on_wait=show_queue_position
+    ) as waited_seconds:
+        placeholder.empty()
+        if waited_seconds >= 1:
+            log_event(f"{action} admitted after waiting {waited_seconds:.1f}s")
+        yield
+
 
 def get_allowed_table_names(table_names_and_alias):
     # Fetch allowed table names from environment variable
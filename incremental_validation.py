@@ -0,0 +1,316 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, TypedDict
+
+import pyarrow as pa
+
+# Number of threads used to hash columns (hashlib releases the GIL on large buffers)
+HASH_THREADS = int(os.getenv("INCREMENTAL_HASH_THREADS", str(os.cpu_count() or 1)))
+
+# Number of failing rows fetched when a failed test is inspected
+FAILING_ROWS_LIMIT = 100
+
+# Configuration of a test without manifest metadata (dbt's defaults)
+DEFAULT_TEST_CONFIG = {
+    "column_name": None,
+    "severity": "ERROR",
+    "fail_calc": "count(*)",
+    "warn_if": "!= 0",
+    "error_if": "!= 0",
+}
+
+
+class DbtTestResult(TypedDict):
+    """
+    The result of a dbt test, run by dbt or re-run directly in DuckDB.
+
+    Results are passed from the pipeline (and the validation workers, as JSON)
+    to the UI, which displays them and re-runs them incrementally.
+    """
+
+    unique_id: str
+    # 'pass', 'warn', 'fail', 'error' or 'skipped'
+    status: str
+    failures: Optional[int]
+    message: Optional[str]
+    compiled_code: Optional[str]
+    # None for table level tests
+    column_name: Optional[str]
+    severity: str
+    fail_calc: str
+    warn_if: str
+    error_if: str
+
+
+def make_test_result(test, status, failures, message, compiled_code=None):
+    """
+    Build the result of a test from its metadata and outcome.
+
+    Args:
+        test (dict): The test metadata from get_test_metadata with its unique_id,
+            or a previous DbtTestResult of the test.
+        status (str): The status of the test.
+        failures (int): The number of failures, or None if the test errored.
+        message (str): The dbt message, or None.
+        compiled_code (str, optional): The compiled SQL; defaults to the
+            previous result's.
+
+    Returns:
+        DbtTestResult: The test result.
+    """
+    config = {
+        key: test.get(key, default) for key, default in DEFAULT_TEST_CONFIG.items()
+    }
+    return DbtTestResult(
+        unique_id=test["unique_id"],
+        status=status,
+        failures=failures,
+        message=message,
+        compiled_code=compiled_code or test.get("compiled_code"),
+        **config,
+    )
+
+
+def hash_column(column):
+    """
+    Compute a digest of a single Arrow column.
+
+    The column is serialized once to the Arrow IPC format and the resulting
+    buffer is hashed in C, so the cost is a few memory passes per column
+    regardless of the number of rows.
+
+    Args:
+        column (pyarrow.ChunkedArray): The column to hash.
+
+    Returns:
+        str: The hex digest of the column type and values.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(column.type).encode())
+    # Combine chunks so the digest does not depend on how the reader split the data
+    array = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    batch = pa.RecordBatch.from_arrays([array], names=["column"])
+    digest.update(memoryview(batch.serialize()))
+    return digest.hexdigest()
+
+
+def compute_column_hashes(table):
+    """
+    Compute a digest per column of a PyArrow Table.
+
+    Args:
+        table (pyarrow.Table): The table to hash.
+
+    Returns:
+        dict: A dictionary mapping column names to hex digests.
+    """
+    with ThreadPoolExecutor(max_workers=max(HASH_THREADS, 1)) as executor:
+        digests = executor.map(hash_column, table.columns)
+        return dict(zip(table.column_names, digests))
+
+
+def get_changed_columns(previous_validation, report_type, table, column_hashes):
+    """
+    Compare an upload with the previously validated version of the same file.
+
+    Args:
+        previous_validation (dict): The cached validation of the previous upload,
+            or None.
+        report_type (str): The report type of the current upload.
+        table (pyarrow.Table): The current upload, renamed to the YAML schema.
+        column_hashes (dict): The column digests of the current upload.
+
+    Returns:
+        list: The names of the columns whose content changed, or None if the
+            upload cannot be compared and a full validation is needed.
+    """
+    if (
+        not previous_validation
+        or previous_validation["report_type"] != report_type
+        or previous_validation["num_rows"] != table.num_rows
+        or list(previous_validation["column_hashes"]) != table.column_names
+    ):
+        return None
+
+    return [
+        column
+        for column, digest in column_hashes.items()
+        if previous_validation["column_hashes"][column] != digest
+    ]
+
+
+def get_test_metadata(nodes):
+    """
+    Extract the column and failure configuration of the dbt tests among manifest nodes.
+
+    Args:
+        nodes (dict): Manifest nodes by unique id, as dictionaries.
+
+    Returns:
+        dict: A dictionary mapping test unique ids to their column name and config.
+    """
+    return {
+        unique_id: {
+            "column_name": node.get("column_name"),
+            "severity": node["config"].get("severity", "ERROR"),
+            "fail_calc": node["config"].get("fail_calc", "count(*)"),
+            "warn_if": node["config"].get("warn_if", "!= 0"),
+            "error_if": node["config"].get("error_if", "!= 0"),
+        }
+        for unique_id, node in nodes.items()
+        if node.get("resource_type") == "test"
+    }
+
+
+def annotate_test_results(results, test_metadata) -> list[DbtTestResult]:
+    """
+    Keep the fields needed to display and re-run each test result.
+
+    Args:
+        results (list): dbt's test results as dictionaries.
+        test_metadata (dict): The test metadata from get_test_metadata.
+
+    Returns:
+        list: The test results, including column name and config.
+    """
+    return [
+        make_test_result(
+            {
+                **test_metadata.get(result["unique_id"], {}),
+                "unique_id": result["unique_id"],
+            },
+            result.get("status"),
+            result.get("failures"),
+            result.get("message"),
+            result.get("compiled_code"),
+        )
+        for result in results
+    ]
+
+
+def get_failing_rows(database, test, limit=FAILING_ROWS_LIMIT):
+    """
+    Fetch a sample of the rows a test flagged, like dbt's store_failures.
+
+    Args:
+        database (str): Path to the DuckDB database the test was compiled against.
+        test (dict): The test result, including its compiled SQL.
+        limit (int, optional): The maximum number of rows to fetch.
+
+    Returns:
+        pyarrow.Table: The failing rows.
+    """
+    import duckdb
+
+    con = duckdb.connect(database=database, read_only=True)
+    try:
+        # The compiled SQL may end with a comment, so it is kept on its own lines
+        failing_rows_sql = f"""
+            select *
+            from (
+                {test["compiled_code"]}
+            ) dbt_internal_test
+            limit {int(limit)}
+        """
+        return con.execute(failing_rows_sql).fetch_arrow_table()
+    finally:
+        con.close()
+
+
+def select_tests_to_rerun(previous_results, changed_columns):
+    """
+    Select the tests that can be affected by the changed columns.
+
+    Column tests are re-run only when their column changed; table level tests
+    (e.g. unique combinations or expressions) are always re-run.
+
+    Args:
+        previous_results (list): The cached results of the previous validation.
+        changed_columns (list): The names of the columns that changed.
+
+    Returns:
+        list: The previous results of the tests to re-run, or None if a test is
+            missing the compiled SQL needed to re-run it directly.
+    """
+    changed = {column.lower() for column in changed_columns}
+    tests_to_rerun = []
+    for result in previous_results:
+        if not result.get("compiled_code") or "column_name" not in result:
+            return None
+        column_name = result["column_name"]
+        if column_name is None or column_name.strip('"').lower() in changed:
+            tests_to_rerun.append(result)
+    return tests_to_rerun
+
+
+def run_tests_in_duckdb(database, tests):
+    """
+    Re-run compiled dbt tests directly against DuckDB.
+
+    Mirrors dbt's test materialization: the failures are computed with the
+    test's fail_calc and compared with its warn_if/error_if thresholds.
+
+    Args:
+        database (str): Path to the DuckDB database the tests were compiled against.
+        tests (list): The previous results of the tests to re-run.
+
+    Returns:
+        list: The DbtTestResult of every test.
+    """
+    import duckdb
+
+    results = []
+    con = duckdb.connect(database=database, read_only=True)
+    try:
+        for test in tests:
+            fail_calc = test["fail_calc"]
+            test_sql = f"""
+                select
+                    {fail_calc} as failures,
+                    ({fail_calc}) {test["warn_if"]} as should_warn,
+                    ({fail_calc}) {test["error_if"]} as should_error
+                from (
+                    {test["compiled_code"]}
+                ) dbt_internal_test
+            """
+            try:
+                failures, should_warn, should_error = con.execute(test_sql).fetchone()
+            except duckdb.Error as e:
+                results.append(make_test_result(test, "error", None, str(e)))
+                continue
+
+            if test["severity"].upper() == "ERROR" and should_error:
+                status, threshold = "fail", test["error_if"]
+            elif should_warn:
+                status, threshold = "warn", test["warn_if"]
+            else:
+                status, threshold = "pass", None
+
+            message = None
+            if threshold is not None:
+                noun = "result" if failures == 1 else "results"
+                message = (
+                    f"Got {failures} {noun}, configured to {status} if {threshold}"
+                )
+
+            results.append(make_test_result(test, status, failures, message))
+    finally:
+        con.close()
+
+    return results
+
+
+def merge_test_results(previous_results, rerun_results):
+    """
+    Replace the previous results of re-run tests with their new results.
+
+    Args:
+        previous_results (list): The cached results of the previous validation.
+        rerun_results (list): The results of the re-run tests.
+
+    Returns:
+        list: The merged results, in the order of the previous results.
+    """
+    rerun_by_id = {result["unique_id"]: result for result in rerun_results}
+    return [rerun_by_id.get(result["unique_id"], result) for result in previous_results]
@@ -0,0 +1,197 @@
+import contextlib
+import functools
+import hashlib
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from submit_index import SUBMIT_INDEX_DIR, read_submits
+
+YAML_DIR = os.path.join("FileUploaderDBT", "models", "validation")
+
+# Hashed natural keys of the submitted files, one sorted segment per submit:
+# <KEY_INDEX_DIR>/<report>/<key columns digest>/<blob name digest>.npy
+KEY_INDEX_DIR = os.path.join(SUBMIT_INDEX_DIR, "keys")
+
+# Generic test whose columns are the natural key of a report, unless the key is
+# set explicitly with `meta: {key_columns: [...]}` on the table
+UNIQUE_COMBINATION_TEST = "dbt_utils.unique_combination_of_columns"
+
+# Rows with overlapping keys shown in the validation results
+OVERLAPPING_ROWS_LIMIT = 100
+
+
+def get_report_key_columns(report_type):
+    """
+    Get the natural key columns of a report.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        list: The key columns, or an empty list if the report has no natural key.
+    """
+    yaml_paths = []
+    for root, _, files in os.walk(YAML_DIR):
+        for file in files:
+            if file.endswith(".yml"):
+                yaml_paths.append(os.path.join(root, file))
+
+    yaml_signature = tuple(
+        (path, os.path.getmtime(path)) for path in sorted(yaml_paths)
+    )
+    return _load_report_key_columns(yaml_signature).get(report_type, [])
+
+
+@functools.lru_cache(maxsize=1)
+def _load_report_key_columns(yaml_signature):
+    import yaml
+
+    key_columns_by_table = {}
+    for path, _ in yaml_signature:
+        with open(path) as file:
+            content = yaml.safe_load(file)
+
+        for source in content.get("sources", []):
+            for table in source.get("tables", []):
+                key_columns = (table.get("meta") or {}).get("key_columns")
+                if not key_columns:
+                    for test in table.get("tests", []):
+                        if isinstance(test, dict) and UNIQUE_COMBINATION_TEST in test:
+                            key_columns = test[UNIQUE_COMBINATION_TEST][
+                                "combination_of_columns"
+                            ]
+                            break
+                if key_columns:
+                    key_columns_by_table[table["name"]] = list(key_columns)
+    return key_columns_by_table
+
+
+def hash_keys(table, key_columns):
+    """
+    Hash the natural key of every row of a table to 64 bits.
+
+    The key columns are hashed as strings, so the hashes do not depend on the
+    column types.
+
+    Args:
+        table (pyarrow.Table): The table with the key columns.
+        key_columns (list): The key columns.
+
+    Returns:
+        numpy.ndarray: The uint64 hash of every row.
+    """
+    keys = pa.table(
+        {column: pc.cast(table[column], pa.string()) for column in key_columns}
+    ).to_pandas()
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def _segment_dir(report_type, key_columns):
+    # Segments of a different key definition are not comparable
+    key_digest = hashlib.blake2b(
+        "\0".join(key_columns).encode(), digest_size=8
+    ).hexdigest()
+    return os.path.join(KEY_INDEX_DIR, report_type, key_digest)
+
+
+def _segment_name(blob_name):
+    digest = hashlib.blake2b(blob_name.encode(), digest_size=16).hexdigest()
+    return f"{digest}.npy"
+
+
+def record_keys(report_type, blob_name, table):
+    """
+    Add the keys of a submitted file to the key index of its report.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+        blob_name (str): The path of the file in the storage account.
+        table (pyarrow.Table): The submitted table.
+    """
+    key_columns = get_report_key_columns(report_type)
+    if not key_columns:
+        return
+
+    segment_dir = _segment_dir(report_type, key_columns)
+    os.makedirs(segment_dir, exist_ok=True)
+    segment_path = os.path.join(segment_dir, _segment_name(blob_name))
+    partial_path = f"{segment_path}.{uuid.uuid4().hex}.partial"
+    with open(partial_path, "wb") as partial_file:
+        np.save(partial_file, np.unique(hash_keys(table, key_columns)))
+    os.replace(partial_path, segment_path)
+
+
+def forget_keys(blob_names):
+    """
+    Remove the keys of deleted files from the key index.
+
+    Args:
+        blob_names (list): Paths of deleted files, '<base path>/<report>/<file>'.
+    """
+    for blob_name in blob_names:
+        report_type = os.path.basename(os.path.dirname(blob_name))
+        report_dir = os.path.join(KEY_INDEX_DIR, report_type)
+        if not report_type or not os.path.isdir(report_dir):
+            continue
+        for key_digest in os.listdir(report_dir):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(
+                    os.path.join(report_dir, key_digest, _segment_name(blob_name))
+                )
+
+
+def find_key_overlaps(report_type, table):
+    """
+    Find the rows of a table whose keys were already submitted for the report.
+
+    Every segment is memory-mapped and searched with a binary search of the
+    sorted keys of the table, so only the pages holding them are read.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+        table (pyarrow.Table): The validated table.
+
+    Returns:
+        tuple: A boolean numpy array marking the overlapping rows (None if the
+            report has no natural key), and a list of the overlapping submits
+            (the submit entry with an ``overlapping_rows`` count), most
+            overlapping first.
+    """
+    key_columns = get_report_key_columns(report_type)
+    if not key_columns or not all(
+        column in table.column_names for column in key_columns
+    ):
+        return None, []
+
+    keys = hash_keys(table, key_columns)
+    overlapping = np.zeros(len(keys), dtype=bool)
+    segment_dir = _segment_dir(report_type, key_columns)
+    if not os.path.isdir(segment_dir):
+        return overlapping, []
+
+    # Sorted keys make the binary searches walk every segment in order
+    order = np.argsort(keys)
+    keys = keys[order]
+    overlaps = []
+    for blob_name, entry in read_submits(report_type).items():
+        try:
+            segment = np.load(
+                os.path.join(segment_dir, _segment_name(blob_name)), mmap_mode="r"
+            )
+        except FileNotFoundError:
+            continue
+        if len(segment) == 0:
+            continue
+        positions = np.minimum(np.searchsorted(segment, keys), len(segment) - 1)
+        matches = segment[positions] == keys
+        if matches.any():
+            overlapping[order[matches]] = True
+            overlaps.append({**entry, "overlapping_rows": int(matches.sum())})
+
+    overlaps.sort(key=lambda overlap: overlap["overlapping_rows"], reverse=True)
+    return overlapping, overlaps
@@ -1,4 +1,5 @@
 import os
+import zipfile
 
 import pandas as pd
 import streamlit as st
@@ -7,21 +8,40 @@ st.set_page_config(layout="wide")
 
 from adls_utils import (
     convert_parquet_to_excel,
+    display_export,
+    display_parquet_query,
     download_file,
     handle_buttons,
     initialize_storage_account,
     list_files_in_directory,
     load_credentials,
 )
+from blob_upload import find_previous_submit, upload_file_to_blob
+from compressed_files import UPLOAD_EXTENSIONS, get_file_type, split_file_type
+from csv_reader import init_csv_threads
 from helper_functions import (
+    admitted_job,
+    display_admin_panel,
     get_allowed_table_names,
-    get_yaml_definitions,
+    get_upload_profile,
     log_event,
     preview_file,
-    upload_file_to_blob,
+    show_admin_panel,
     validate_file,
+    validate_file_with_worker,
     version,
 )
+from preview_grid import display_table_page
+from session_store import get_table, has_table, put_table
+from startup import start_warmup
+from table_processing import get_yaml_definitions
+
+
+@st.cache_resource(show_spinner=False)
+def get_service_client(tenant_id, client_id, client_secret, account_name):
+    # One client per process, so its credential and access token are reused
+    return initialize_storage_account(tenant_id, client_id, client_secret, account_name)
+
 
 try:
     # Get YAML table definitions
@@ -34,287 +54,449 @@ try:
 
     # Load credentials and initialize the Azure Data Lake Storage client
     config = load_credentials()
-    service_client = initialize_storage_account(
+    service_client = get_service_client(
         config["tenant_id"],
         config["client_id"],
         config["client_secret"],
         config["account_name"],
     )
 
+    # Load dbt, the DuckDB extensions and an access token in the background
+    start_warmup(service_client)
+
 except Exception as e:
     st.error(f"An unexpected error occurred before main: {e}")
 
 
-# Main function to render the Streamlit app
-def main():
-    try:
-        try:
-            st.title("File Uploader")
-            st.caption(
-                f"Current version of the application: {version()}"
-            )  # Display the current version on the application
-
-            upload_tab, preview_tab, validate_tab, submit_tab, explore_tab = st.tabs(
-                ["Upload", "Preview", "Validate", "Submit", "Explorer"]
+def get_read_auto_table(uploaded_file):
+    """
+    Get the parsed upload, parsing it on first use.
+
+    The upload is parsed once; reruns reuse the memory-mapped table.
+
+    Args:
+        uploaded_file: The uploaded file.
+
+    Returns:
+        tuple: The detected CSV properties and the parsed PyArrow Table (None
+            if the file could not be read).
+    """
+    read_auto_table = get_table("read_auto_table", key=uploaded_file.file_id)
+    if read_auto_table is None:
+        with admitted_job(
+            uploaded_file.size, st.session_state["file_type"], "Reading the file"
+        ):
+            df_prop_filtered, read_auto_table = preview_file(uploaded_file)
+        st.session_state["df_prop_filtered"] = df_prop_filtered
+        if read_auto_table is not None:
+            read_auto_table = put_table(
+                "read_auto_table",
+                read_auto_table,
+                key=uploaded_file.file_id,
             )
+    return st.session_state.get("df_prop_filtered"), read_auto_table
 
-        except Exception as e:
-            st.error(f"An unexpected error occurred before tabs: {e}")
 
-        with upload_tab:
-            try:
-                if available_allowed_table_names_dict:
-                    select_report_type_list = list(
-                        available_allowed_table_names_dict.values()
-                    )
-                    select_report_type_list.sort()
+# The Upload tab selects the report and the file every other tab depends on, so
+# it reruns the whole app. The other tabs are fragments: their widgets only rerun
+# their own tab, e.g. a click in the Explorer does not re-validate the upload.
+def render_upload_tab():
+    try:
+        if available_allowed_table_names_dict:
+            select_report_type_list = list(available_allowed_table_names_dict.values())
+            select_report_type_list.sort()
 
-                    # Set selectbox with user friendly alias
-                    selected_report_type = st.selectbox(
-                        "Select a report type:", select_report_type_list
-                    )
+            # Set selectbox with user friendly alias
+            selected_report_type = st.selectbox(
+                "Select a report type:", select_report_type_list, key="report_alias"
+            )
 
-                    # Get report name based on alias.
-                    report_type = available_allowed_table_names_dict.inverse[
-                        selected_report_type
-                    ]
-                    st.session_state["report_type"] = report_type
-                    uploaded_file = st.file_uploader(
-                        "Upload your Excel or CSV file", type=["csv", "xlsx"]
-                    )
+            # Get report name based on alias.
+            report_type = available_allowed_table_names_dict.inverse[
+                selected_report_type
+            ]
+            st.session_state["report_type"] = report_type
+            uploaded_file = st.file_uploader(
+                "Upload your Excel or CSV file",
+                type=UPLOAD_EXTENSIONS,
+                help="CSV files can be compressed with gzip (.csv.gz) or zstd "
+                "(.csv.zst), and CSV or Excel files can be uploaded in a zip archive.",
+            )
 
-                    if uploaded_file:
-                        log_event(f"Report type selected: {report_type}")
-                        st.session_state["uploaded_file"] = uploaded_file
-                        st.session_state["file_type"] = (
-                            ".csv" if uploaded_file.name.endswith(".csv") else ".xlsx"
-                        )  # Set the 'file_type' in the session state based on the file extension of the uploaded file;
+            if uploaded_file:
+                # Set the 'file_type' in the session state based on the file
+                # extension of the uploaded file, and the content of zip archives
+                try:
+                    file_type = get_file_type(uploaded_file.name, uploaded_file)
+                except (ValueError, zipfile.BadZipFile) as e:
+                    st.error(str(e))
+                    st.session_state.pop("uploaded_file", None)
+                    uploaded_file = None
+            if uploaded_file:
+                log_event(f"Report type selected: {report_type}")
+                st.session_state["uploaded_file"] = uploaded_file
+                st.session_state["file_type"] = file_type
+
+                # Remove the temporary file if it exists
+                if "temp_file_path" in st.session_state and os.path.exists(
+                    st.session_state["temp_file_path"]
+                ):
+                    os.remove(st.session_state["temp_file_path"])
 
-                        # Remove the temporary file if it exists
-                        if "temp_file_path" in st.session_state and os.path.exists(
-                            st.session_state["temp_file_path"]
-                        ):
-                            os.remove(st.session_state["temp_file_path"])
+            st.markdown("---")
+            st.caption("Download templates")
 
-                    st.markdown("---")
-                    st.caption("Download templates")
+            # Assume templates are named based on the report type and stored in the
+            # 'templates' directory
+            excel_template_path = os.path.join(
+                base_templates_path, f"{report_type}.xlsx"
+            )
+            csv_template_path = os.path.join(base_templates_path, f"{report_type}.csv")
 
-                    # Assume templates are named based on the report type and stored in the 'templates' directory
-                    excel_template_path = os.path.join(
-                        base_templates_path, f"{report_type}.xlsx"
-                    )
-                    csv_template_path = os.path.join(
-                        base_templates_path, f"{report_type}.csv"
+            # Download buttons for templates
+            try:
+                with open(excel_template_path, "rb") as excel_file:
+                    st.download_button(
+                        label="Excel template",
+                        data=excel_file,
+                        file_name=f"{report_type}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     )
+            except FileNotFoundError:
+                st.error(f"Excel template for {report_type} not found.")
+                st.write(excel_template_path)
 
-                    # Download buttons for templates
-                    try:
-                        with open(excel_template_path, "rb") as excel_file:
-                            st.download_button(
-                                label="Excel template",
-                                data=excel_file,
-                                file_name=f"{report_type}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            )
-                    except FileNotFoundError:
-                        st.error(f"Excel template for {report_type} not found.")
-                        st.write(excel_template_path)
-
-                    try:
-                        with open(csv_template_path, "rb") as csv_file:
-                            st.download_button(
-                                label="CSV template  \u00a0",
-                                data=csv_file,
-                                file_name=f"{report_type}.csv",
-                                mime="text/csv",
-                            )
-                    except FileNotFoundError:
-                        st.error(f"CSV template for {report_type} not found.")
-
-            except Exception as e:
-                st.error(f"An unexpected error occurred in upload_tab: {e}")
-                log_event(f"An unexpected error occurred in upload_tab: {e}")
-
-        with preview_tab:
             try:
-                if "uploaded_file" in st.session_state:
-                    uploaded_file = st.session_state["uploaded_file"]
-
-                    df_prop_filtered, read_auto_table = preview_file(uploaded_file)
-                    st.session_state["read_auto_table"] = read_auto_table
-
-                    with st.expander("File content:", expanded=True):
-                        st.data_editor(
-                            read_auto_table,
-                            disabled=True,
-                            use_container_width=True,
-                            key="unique_data_editor_read_auto_table_preview",
-                        )
+                with open(csv_template_path, "rb") as csv_file:
+                    st.download_button(
+                        label="CSV template  \u00a0",
+                        data=csv_file,
+                        file_name=f"{report_type}.csv",
+                        mime="text/csv",
+                    )
+            except FileNotFoundError:
+                st.error(f"CSV template for {report_type} not found.")
 
-                    # Create 2 columns in Streamlit with different widths
-                    col1, _ = st.columns([0.7, 1])  # Setting the width of the columns
+    except Exception as e:
+        st.error(f"An unexpected error occurred in upload_tab: {e}")
+        log_event(f"An unexpected error occurred in upload_tab: {e}")
 
-                    # Show CSV detected properties only if file type is CSV
-                    if st.session_state["file_type"] == ".csv":
-                        with col1:
-                            with st.expander("Detected properties", expanded=False):
-                                # st.dataframe(df_prop_filtered, use_container_width=True)
-                                st.data_editor(
-                                    df_prop_filtered,
-                                    disabled=True,
-                                    use_container_width=True,
-                                    key="unique_data_editor_df_prop_filtered",
-                                )
 
-                else:
-                    st.warning("Please upload the file before preview.")
+@st.fragment
+def render_preview_tab():
+    try:
+        if "uploaded_file" in st.session_state:
+            uploaded_file = st.session_state["uploaded_file"]
+            df_prop_filtered, read_auto_table = get_read_auto_table(uploaded_file)
+
+            with st.expander("File content:", expanded=True):
+                display_table_page(
+                    read_auto_table,
+                    key="unique_data_editor_read_auto_table_preview",
+                )
+
+            with st.expander("Column profile", expanded=False):
+                st.dataframe(
+                    get_upload_profile(
+                        uploaded_file,
+                        read_auto_table,
+                        st.session_state["report_type"],
+                    ),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
+            # Create 2 columns in Streamlit with different widths
+            col1, _ = st.columns([0.7, 1])  # Setting the width of the columns
+
+            # Show CSV detected properties only if file type is CSV
+            if split_file_type(st.session_state["file_type"])[0] == ".csv":
+                with col1, st.expander("Detected properties", expanded=False):
+                    # st.dataframe(df_prop_filtered, use_container_width=True)
+                    st.data_editor(
+                        df_prop_filtered,
+                        disabled=True,
+                        use_container_width=True,
+                        key="unique_data_editor_df_prop_filtered",
+                    )
 
-            except Exception as e:
-                st.error(f"An unexpected error occurred in validate_tab: {e}")
-                log_event(f"An unexpected error occurred in validate_tab: {e}")
+        else:
+            st.warning("Please upload the file before preview.")
 
-        with validate_tab:
-            try:
-                # Check if the file has been uploaded
-                if "uploaded_file" not in st.session_state:
-                    st.warning("Please upload the file before validation.")
-                else:
-                    # validate_file(df_read_auto, read_auto_table)
-                    validate_file(read_auto_table)
+    except Exception as e:
+        st.error(f"An unexpected error occurred in validate_tab: {e}")
+        log_event(f"An unexpected error occurred in validate_tab: {e}")
 
-            except Exception as e:
-                st.error(f"An unexpected error occurred in validate_tab: {e}")
-                log_event(f"An unexpected error occurred in validate_tab: {e}")
 
-        with submit_tab:
-            try:
-                # if 'casted_df_read_auto' in st.session_state and st.session_state.get('column_is_valid') and st.session_state.get('dbt_tests_passed'):
-                #     processed_csv = st.session_state['casted_df_read_auto'].to_csv(index=False).encode('utf-8')
+@st.fragment
+def render_validate_tab():
+    from worker_client import use_validation_worker
 
-                if (
-                    "casted_read_auto_table" in st.session_state
-                    and st.session_state.get("column_is_valid")
-                    and st.session_state.get("dbt_tests_passed")
+    try:
+        # Check if the file has been uploaded
+        if "uploaded_file" not in st.session_state:
+            st.warning("Please upload the file before validation.")
+        elif use_validation_worker():
+            validate_file_with_worker(st.session_state["uploaded_file"])
+        else:
+            uploaded_file = st.session_state["uploaded_file"]
+            incremental = st.toggle(
+                "Incremental re-validation",
+                value=True,
+                help=(
+                    "Only re-cast and re-test the columns that changed since the "
+                    "last validation of this file."
+                ),
+            )
+            _, read_auto_table = get_read_auto_table(uploaded_file)
+
+            # An incremental rerun for the same upload and report reuses its
+            # validation, unless the validated table was evicted since
+            validation_key = (uploaded_file.file_id, st.session_state["report_type"])
+            reuses_validation = (
+                incremental
+                and st.session_state.get("validated_key") == validation_key
+                and has_table("casted_read_auto_table")
+            )
+            if reuses_validation:
+                validate_file(read_auto_table, incremental=True)
+            else:
+                # Casting and testing the upload holds copies of the table
+                with admitted_job(
+                    uploaded_file.size, st.session_state["file_type"], "Validation"
                 ):
-                    # processed_csv = st.session_state['casted_read_auto_table'].to_csv(index=False).encode('utf-8')
-                    # st.download_button("Download Processed CSV", processed_csv, f"{st.session_state['report_type']}.csv", "text/csv", key='download-csv')
+                    # validate_file(df_read_auto, read_auto_table)
+                    validate_file(read_auto_table, incremental=incremental)
+            st.session_state["validated_key"] = validation_key
+
+    except Exception as e:
+        st.error(f"An unexpected error occurred in validate_tab: {e}")
+        log_event(f"An unexpected error occurred in validate_tab: {e}")
 
-                    log_event("Processed file available for download")
 
-                    if st.button("Submit"):
-                        ##############################################################
-                        with st.spinner("Uploading file to Blob Storage..."):
+@st.fragment
+def render_submit_tab():
+    try:
+        # if 'casted_df_read_auto' in st.session_state and st.session_state.get('column_is_valid') and st.session_state.get('dbt_tests_passed'):
+        #     processed_csv = st.session_state['casted_df_read_auto'].to_csv(index=False).encode('utf-8')
+
+        if (
+            has_table("casted_read_auto_table")
+            and st.session_state.get("column_is_valid")
+            and st.session_state.get("dbt_tests_passed")
+        ):
+            # processed_csv = st.session_state['casted_read_auto_table'].to_csv(index=False).encode('utf-8')
+            # st.download_button("Download Processed CSV", processed_csv, f"{st.session_state['report_type']}.csv", "text/csv", key='download-csv')
+
+            log_event("Processed file available for download")
+
+            if st.button("Submit"):
+                ##############################################################
+                with st.spinner("Uploading file to Blob Storage..."):
+                    casted_read_auto_table = get_table("casted_read_auto_table")
+                    # Identical data is not submitted twice
+                    content_hash, previous_submit = find_previous_submit(
+                        casted_read_auto_table, st.session_state["report_type"]
+                    )
+                    if previous_submit:
+                        st.warning(
+                            f"This data was already submitted as "
+                            f"'{previous_submit['blob_name']}' on "
+                            f"{previous_submit['submitted_at']} (original file "
+                            f"'{previous_submit['original_filename']}'). "
+                            "Nothing was uploaded."
+                        )
+                        log_event(
+                            "Submit skipped, already submitted as "
+                            f"{previous_submit['blob_name']}"
+                        )
+                    else:
+                        with admitted_job(
+                            st.session_state["uploaded_file"].size,
+                            st.session_state["file_type"],
+                            "Submit",
+                        ):
                             # upload_status = upload_file_to_blob(st.session_state['casted_df_read_auto'], st.session_state['report_type'], st.session_state['uploaded_file'].name)
                             upload_status = upload_file_to_blob(
-                                st.session_state["casted_read_auto_table"],
+                                casted_read_auto_table,
                                 st.session_state["report_type"],
                                 st.session_state["uploaded_file"].name,
+                                content_hash=content_hash,
                             )
+                        if isinstance(upload_status, str):
+                            st.error(upload_status)
+                        else:
                             st.success(upload_status[0])
                             st.info(upload_status[1] + "\n\n" + upload_status[2])
                             log_event("File stored into ADLS")
-                        ##############################################################
-
-                    os.remove(st.session_state["temp_file_path"])
-
-                else:
-                    st.warning("Please validate the file before submitting.")
+                ##############################################################
 
-            except Exception as e:
-                st.error(f"An unexpected error occurred in submit_tab: {e}")
-                log_event(f"An unexpected error occurred in submit_tab: {e}")
+            if os.path.exists(st.session_state.get("temp_file_path", "")):
+                os.remove(st.session_state["temp_file_path"])
 
-        # Tab 5: Browse, Preview, Delete and Download Files
-        with explore_tab:
-            try:
-                # st.caption("Browse, Preview, Delete and Download Files")
+        else:
+            st.warning("Please validate the file before submitting.")
 
-                st.caption("""*Only one file can be Previewed, Converted to Excel or Downloaded at a time. 
-                                One or multiple files can be Deleted simultaneously.""")
+    except Exception as e:
+        st.error(f"An unexpected error occurred in submit_tab: {e}")
+        log_event(f"An unexpected error occurred in submit_tab: {e}")
 
-                # Ensure the report type is selected
-                if report_type:
-                    full_path = f"{config['base_path']}/{report_type}"
 
-                    # Arrange buttons in a row
-                    col1, col2, col3, col4 = st.columns([1, 1, 1, 7], gap="medium")
-                    with col1:
-                        preview_button_clicked = st.button(
-                            "Preview", use_container_width=True
-                        )
-                    with col2:
-                        delete_button_clicked = st.button(
-                            "Delete", use_container_width=True
-                        )
-                    with col3:
-                        convert_button_clicked = st.button(
-                            "Convert to Excel", use_container_width=True
+# Tab 5: Browse, Preview, Delete and Download Files
+@st.fragment
+def render_explorer_tab():
+    try:
+        # st.caption("Browse, Preview, Delete and Download Files")
+
+        st.caption(
+            "*One or multiple files can be Previewed, Converted, Deleted or Queried "
+            "simultaneously. Multiple files are converted to one combined file or a "
+            "zip archive."
+        )
+
+        # Ensure the report type is selected
+        report_type = st.session_state.get("report_type")
+        if report_type:
+            full_path = f"{config['base_path']}/{report_type}"
+
+            # Arrange buttons in a row
+            col1, col2, col3, col5, col4 = st.columns([1, 1, 1, 1, 6], gap="medium")
+            with col1:
+                preview_button_clicked = st.button("Preview", use_container_width=True)
+            with col2:
+                delete_button_clicked = st.button("Delete", use_container_width=True)
+            with col3:
+                convert_button_clicked = st.button(
+                    "Convert to Excel", use_container_width=True
+                )
+            with col5:
+                query_button_clicked = st.button("Query", use_container_width=True)
+            with col4:
+                # Check if there is a flag to show the download button
+                if st.session_state.get("show_download_excel", False):
+                    try:
+                        # Convert the selected Parquet file to Excel format
+                        excel_data = convert_parquet_to_excel(
+                            download_file(
+                                service_client,
+                                config["container_name"],
+                                st.session_state.selected_file,
+                            )
                         )
-                    with col4:
-                        # Check if there is a flag to show the download button
-                        if st.session_state.get("show_download_excel", False):
-                            try:
-                                # Convert the selected Parquet file to Excel format
-                                excel_data = convert_parquet_to_excel(
-                                    download_file(
-                                        service_client,
-                                        config["container_name"],
-                                        st.session_state.selected_file,
-                                    )
-                                )
-                                # Provide the download button if the conversion is successful
-                                if excel_data:
-                                    st.download_button(
-                                        label="Download Excel File",
-                                        data=excel_data,
-                                        file_name=f"{st.session_state.selected_file}.xlsx",
-                                    )
-                                # Reset session state flags after download
-                                st.session_state.show_download_excel = False
-                                st.session_state.selected_file = None
-                            except Exception as e:
-                                st.error(f"Error converting or downloading file: {e}")
-                                log_event(f"Error converting or downloading file: {e}")
-
-                    # List files in the selected directory
-                    file_list = list_files_in_directory(
-                        service_client, config["container_name"], full_path
+                        # Provide the download button if the conversion is successful
+                        if excel_data:
+                            st.download_button(
+                                label="Download Excel File",
+                                data=excel_data,
+                                file_name=f"{st.session_state.selected_file}.xlsx",
+                            )
+                        # Reset session state flags after download
+                        st.session_state.show_download_excel = False
+                        st.session_state.selected_file = None
+                    except Exception as e:
+                        st.error(f"Error converting or downloading file: {e}")
+                        log_event(f"Error converting or downloading file: {e}")
+
+            # List files in the selected directory
+            file_list = list_files_in_directory(
+                service_client, config["container_name"], full_path
+            )
+            if file_list:
+                # Create a DataFrame for the file list with a checkbox for deletion
+                df = pd.DataFrame(file_list, columns=["File Name"])
+                df["Select"] = False
+
+                # Display the DataFrame as an editable table
+                edited_df = st.data_editor(
+                    df,
+                    use_container_width=True,
+                    hide_index=True,
+                    num_rows="fixed",
+                    column_config={"Select": st.column_config.CheckboxColumn("Select")},
+                )
+                # Get the list of files selected for deletion
+                selected_files = edited_df[edited_df["Select"]]["File Name"].tolist()
+
+                # Handle button actions (preview, delete, convert)
+                handle_buttons(
+                    service_client,
+                    config["container_name"],
+                    selected_files,
+                    preview_button_clicked,
+                    delete_button_clicked,
+                    convert_button_clicked,
+                    query_button_clicked,
+                )
+
+                # The export panel stays open for the selected files of this directory
+                export_files = st.session_state.get("export_files")
+                if export_files and set(export_files) <= set(file_list):
+                    display_export(
+                        service_client, config["container_name"], export_files
                     )
-                    if file_list:
-                        # Create a DataFrame for the file list with a checkbox for deletion
-                        df = pd.DataFrame(file_list, columns=["File Name"])
-                        df["Select"] = False
-
-                        # Display the DataFrame as an editable table
-                        edited_df = st.data_editor(
-                            df,
-                            use_container_width=True,
-                            hide_index=True,
-                            num_rows="fixed",
-                            column_config={
-                                "Select": st.column_config.CheckboxColumn("Select")
-                            },
-                        )
-                        # Get the list of files selected for deletion
-                        selected_files = edited_df[edited_df["Select"]][
-                            "File Name"
-                        ].tolist()
-
-                        # Handle button actions (preview, delete, convert)
-                        handle_buttons(
-                            service_client,
-                            config["container_name"],
-                            selected_files,
-                            preview_button_clicked,
-                            delete_button_clicked,
-                            convert_button_clicked,
-                        )
-                    else:
-                        # Message if no files are found in the directory
-                        st.write("No files found in this directory.")
-            except Exception as e:
-                st.error(f"An unexpected error occurred in explore_tab: {e}")
-                log_event(f"An unexpected error occurred in explore_tab: {e}")
+
+                # Query mode stays open for the queried files of this directory
+                query_files = st.session_state.get("query_files")
+                if query_files and set(query_files) <= set(file_list):
+                    display_parquet_query(
+                        service_client, config["container_name"], query_files
+                    )
+            else:
+                # Message if no files are found in the directory
+                st.write("No files found in this directory.")
+    except Exception as e:
+        st.error(f"An unexpected error occurred in explore_tab: {e}")
+        log_event(f"An unexpected error occurred in explore_tab: {e}")
+
+
+# Tab 6 (optional): Per-stage latency and memory metrics
+@st.fragment
+def render_admin_tab():
+    try:
+        display_admin_panel()
+    except Exception as e:
+        st.error(f"An unexpected error occurred in admin_tab: {e}")
+        log_event(f"An unexpected error occurred in admin_tab: {e}")
+
+
+# Main function to render the Streamlit app
+def main():
+    # The app's Arrow thread pool parses CSV files with CSV_THREADS threads
+    init_csv_threads()
+    try:
+        try:
+            st.title("File Uploader")
+            st.caption(
+                f"Current version of the application: {version()}"
+            )  # Display the current version on the application
+
+            tab_names = ["Upload", "Preview", "Validate", "Submit", "Explorer"]
+            if show_admin_panel():
+                tab_names.append("Admin")
+            tabs = st.tabs(tab_names)
+            upload_tab, preview_tab, validate_tab, submit_tab, explore_tab = tabs[:5]
+
+        except Exception as e:
+            st.error(f"An unexpected error occurred before tabs: {e}")
+
+        with upload_tab:
+            render_upload_tab()
+
+        with preview_tab:
+            render_preview_tab()
+
+        with validate_tab:
+            render_validate_tab()
+
+        with submit_tab:
+            render_submit_tab()
+
+        with explore_tab:
+            render_explorer_tab()
+
+        if len(tabs) > 5:
+            with tabs[5]:
+                render_admin_tab()
 
     except Exception as e:
         st.error(f"An unexpected error occurred in main: {e}")
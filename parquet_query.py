@@ -0,0 +1,160 @@
+from preview_grid import quote_identifier
+
+# Filter operators offered in the Explorer query mode and their SQL; comparison
+# values are cast to the column type so DuckDB can skip row groups using the
+# min/max statistics of the Parquet files
+FILTER_OPERATORS = {
+    "=": "{column} = CAST(? AS {type})",
+    "!=": "{column} <> CAST(? AS {type})",
+    "<": "{column} < CAST(? AS {type})",
+    "<=": "{column} <= CAST(? AS {type})",
+    ">": "{column} > CAST(? AS {type})",
+    ">=": "{column} >= CAST(? AS {type})",
+    "contains": "CAST({column} AS VARCHAR) ILIKE '%' || ? || '%'",
+    "is empty": "{column} IS NULL",
+    "is not empty": "{column} IS NOT NULL",
+}
+
+# Operators that do not take a value
+UNARY_OPERATORS = ["is empty", "is not empty"]
+
+AGGREGATES = {
+    "count": "count({column})",
+    "count distinct": "count(DISTINCT {column})",
+    "sum": "sum({column})",
+    "avg": "avg({column})",
+    "min": "min({column})",
+    "max": "max({column})",
+}
+
+
+def _parquet_source(paths):
+    # The paths are local files; union_by_name lines up files with different schemas
+    file_list = ", ".join("'" + path.replace("'", "''") + "'" for path in paths)
+    return f"read_parquet([{file_list}], union_by_name = true)"
+
+
+def get_parquet_columns(con, paths):
+    """
+    Read the column names and types of Parquet files from their metadata.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection to query with.
+        paths (list): Paths of the local Parquet files.
+
+    Returns:
+        dict: Column name -> DuckDB type name, in file order.
+    """
+    rows = con.execute(f"DESCRIBE SELECT * FROM {_parquet_source(paths)}").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def build_parquet_query(
+    paths, column_types, columns=None, filters=None, group_by=None, aggregates=None
+):
+    """
+    Build a DuckDB query over Parquet files.
+
+    Args:
+        paths (list): Paths of the local Parquet files.
+        column_types (dict): Column name -> type, from get_parquet_columns.
+        columns (list, optional): The columns to return; all columns by default.
+            Ignored when aggregating.
+        filters (list, optional): (column, operator, value) tuples, combined with
+            AND. The operator is one of FILTER_OPERATORS.
+        group_by (list, optional): The columns to group by.
+        aggregates (list, optional): (function, column) tuples, with a function
+            from AGGREGATES.
+
+    Returns:
+        tuple: The SQL query and its parameters.
+
+    Raises:
+        ValueError: If a column, operator or aggregate function is not supported.
+    """
+
+    def column_sql(column):
+        if column not in column_types:
+            raise ValueError(f"Unknown column: {column}")
+        return quote_identifier(column)
+
+    parameters = []
+    conditions = []
+    for column, operator, value in filters or []:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        conditions.append(
+            FILTER_OPERATORS[operator].format(
+                column=column_sql(column), type=column_types[column]
+            )
+        )
+        if operator not in UNARY_OPERATORS:
+            parameters.append(value)
+
+    if group_by or aggregates:
+        select_list = [column_sql(column) for column in group_by or []]
+        for function, column in aggregates or []:
+            if function not in AGGREGATES:
+                raise ValueError(f"Unsupported aggregate: {function}")
+            select_list.append(
+                AGGREGATES[function].format(column=column_sql(column))
+                + " AS "
+                + quote_identifier(f"{function} {column}")
+            )
+    else:
+        select_list = [column_sql(column) for column in columns or []] or ["*"]
+
+    query = f"SELECT {', '.join(select_list)} FROM {_parquet_source(paths)}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        group_columns = ", ".join(column_sql(column) for column in group_by)
+        query += f" GROUP BY {group_columns} ORDER BY {group_columns}"
+    return query, parameters
+
+
+def query_parquet_page(
+    paths,
+    offset,
+    limit,
+    columns=None,
+    filters=None,
+    group_by=None,
+    aggregates=None,
+):
+    """
+    Fetch one page of the result of a query over Parquet files.
+
+    DuckDB reads only the projected columns and skips the row groups whose
+    statistics rule out the filters, so only the matching rows of the page are
+    materialized.
+
+    Args:
+        paths (list): Paths of the local Parquet files.
+        offset (int): The index of the first row of the page.
+        limit (int): The number of rows in the page.
+        columns, filters, group_by, aggregates: See build_parquet_query.
+
+    Returns:
+        tuple:
+            - pyarrow.Table: The rows of the page.
+            - int: The number of rows in the result.
+    """
+    import duckdb
+
+    con = duckdb.connect(database=":memory:")
+    try:
+        column_types = get_parquet_columns(con, paths)
+        query, parameters = build_parquet_query(
+            paths, column_types, columns, filters, group_by, aggregates
+        )
+        matching_rows = con.execute(
+            f"SELECT count(*) FROM ({query})", parameters
+        ).fetchone()[0]
+        page = con.execute(
+            f"SELECT * FROM ({query}) LIMIT ? OFFSET ?", parameters + [limit, offset]
+        ).fetch_arrow_table()
+    finally:
+        con.close()
+
+    return page, matching_rows
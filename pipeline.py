@@ -0,0 +1,210 @@
+import os
+import tempfile
+import uuid
+from typing import Optional, TypedDict
+
+import duckdb
+import pyarrow.parquet as pq
+
+from blob_upload import find_previous_submit, upload_file_to_blob
+from dbt_runner import run_dbt_tests
+from incremental_validation import DbtTestResult
+from key_index import find_key_overlaps
+from reference_data import get_report_references, load_reference_tables
+from table_processing import (
+    cast_pyarrow_table_columns_to_types,
+    get_yaml_definitions,
+    read_uploaded_table,
+    resolve_headers,
+)
+from tracing import trace_stage
+
+# The validation pipeline without any Streamlit UI, used by the worker service
+# and the command line interface
+
+
+class ValidationResult(TypedDict):
+    """
+    The result of validate_upload, returned as JSON by the validation workers.
+    """
+
+    report_type: str
+    rows: int
+    columns: int
+    column_is_valid: bool
+    missing_in_file: list[str]
+    extra_in_file: list[str]
+    # File header -> suggested report column
+    suggestions: dict[str, str]
+    all_column_type_matched: bool
+    cast_errors: list[str]
+    # None until the dbt tests ran
+    results: Optional[list[DbtTestResult]]
+    all_tests_passed: bool
+    overlapping_rows: Optional[int]
+    key_overlaps: list[dict]
+    output_path: Optional[str]
+
+
+def read_upload(upload_path, file_type, report_type):
+    """
+    Read an uploaded CSV or Excel file.
+
+    Args:
+        upload_path (str): Path to the uploaded file.
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+        report_type (str): The report the file is uploaded for.
+
+    Returns:
+        tuple: DataFrame of detected CSV properties, Arrow Table.
+    """
+    with trace_stage(
+        "ingest",
+        report_type=report_type,
+        file_type=file_type,
+        bytes=os.path.getsize(upload_path),
+    ) as span:
+        properties, table = read_uploaded_table(
+            upload_path,
+            file_type,
+            span=span,
+            report_type=report_type,
+        )
+        span["rows"] = table.num_rows
+        span["columns"] = table.num_columns
+        # Calibrates the memory estimate of admission control
+        span["table_bytes"] = table.nbytes
+    return properties, table
+
+
+def validate_upload(
+    upload_path, file_type, report_type, output_dir
+) -> ValidationResult:
+    """
+    Read, cast and test an upload, and write the validated table as Parquet.
+
+    Args:
+        upload_path (str): Path to the uploaded file.
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+        report_type (str): The report name as defined in the YAML configuration.
+        output_dir (str): The directory to write the validated table to.
+
+    Returns:
+        ValidationResult: The validation result with the column check, cast
+            errors, dbt test results, keys overlapping earlier submits and the
+            path of the validated table (None unless the columns and types are
+            valid).
+
+    Raises:
+        ValueError: If the report type is not defined in the YAML configuration.
+    """
+    columns_by_table, columns_type_by_table, _ = get_yaml_definitions()
+    if report_type not in columns_by_table:
+        raise ValueError(f"Unknown report type: {report_type}")
+
+    _, table = read_upload(upload_path, file_type, report_type)
+
+    new_names, missing_in_file, extra_in_file, suggestions = resolve_headers(
+        table.column_names, columns_by_table[report_type]
+    )
+    result = ValidationResult(
+        report_type=report_type,
+        rows=table.num_rows,
+        columns=table.num_columns,
+        column_is_valid=not missing_in_file and not extra_in_file,
+        missing_in_file=sorted(missing_in_file),
+        extra_in_file=sorted(extra_in_file),
+        suggestions=suggestions,
+        all_column_type_matched=False,
+        cast_errors=[],
+        results=None,
+        all_tests_passed=False,
+        overlapping_rows=None,
+        key_overlaps=[],
+        output_path=None,
+    )
+    if not result["column_is_valid"]:
+        return result
+
+    table = table.rename_columns(new_names)
+    with trace_stage(
+        "cast",
+        report_type=report_type,
+        rows=table.num_rows,
+        bytes=table.nbytes,
+        columns=table.num_columns,
+    ) as span:
+        casted_table, all_column_type_matched = cast_pyarrow_table_columns_to_types(
+            table, columns_type_by_table[report_type], result["cast_errors"]
+        )
+        span["all_column_type_matched"] = all_column_type_matched
+        span["cast_errors"] = len(result["cast_errors"])
+    result["all_column_type_matched"] = all_column_type_matched
+    if not all_column_type_matched:
+        return result
+
+    # Rows whose natural key was already submitted in an earlier file
+    with trace_stage("keys", report_type=report_type, rows=table.num_rows):
+        overlapping, result["key_overlaps"] = find_key_overlaps(
+            report_type, casted_table
+        )
+    if overlapping is not None:
+        result["overlapping_rows"] = int(overlapping.sum())
+
+    # Every validation gets its own database, profile and dbt target directory
+    with tempfile.TemporaryDirectory(prefix="validation-") as work_dir:
+        database = os.path.join(work_dir, "db.duckdb")
+        load_reference_tables(database, get_report_references(report_type))
+
+        con = duckdb.connect(database=database, read_only=False)
+        try:
+            con.register("casted_table", casted_table)
+            con.execute(f"CREATE TABLE {report_type} AS SELECT * FROM casted_table")
+        finally:
+            con.close()
+
+        with trace_stage("validate", report_type=report_type, rows=table.num_rows):
+            results = run_dbt_tests(report_type, work_dir)
+
+    result["results"] = results
+    result["all_tests_passed"] = results is not None and all(
+        test["status"] not in ("fail", "error") for test in results
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{report_type}-{uuid.uuid4().hex}.parquet")
+    pq.write_table(casted_table, output_path)
+    result["output_path"] = output_path
+    return result
+
+
+def submit_upload(table, report_type, original_filename):
+    """
+    Submit a validated table, unless the same data was already submitted.
+
+    Args:
+        table (pyarrow.Table): The validated table.
+        report_type (str): The report name as defined in the YAML configuration.
+        original_filename (str): The name of the uploaded file.
+
+    Returns:
+        dict: The status ('submitted' or 'duplicate'), and the upload message
+            or the previous submit of the same data.
+
+    Raises:
+        RuntimeError: If the upload failed.
+    """
+    content_hash, previous_submit = find_previous_submit(table, report_type)
+    if previous_submit:
+        return {"status": "duplicate", "previous_submit": previous_submit}
+
+    upload_status = upload_file_to_blob(
+        table, report_type, original_filename, content_hash=content_hash
+    )
+    if isinstance(upload_status, str):
+        raise RuntimeError(upload_status)
+    return {
+        "status": "submitted",
+        "message": upload_status[0],
+        "content_hash": content_hash,
+    }
@@ -0,0 +1,156 @@
+import math
+
+import streamlit as st
+
+PAGE_SIZE_OPTIONS = [50, 100, 500, 1000]
+
+
+def quote_identifier(name):
+    # Quote a column name for use in DuckDB SQL
+    return '"' + name.replace('"', '""') + '"'
+
+
+def query_table_page(
+    table,
+    offset,
+    limit,
+    sort_column=None,
+    descending=False,
+    filter_column=None,
+    filter_text=None,
+):
+    """
+    Fetch one page of a PyArrow Table, optionally filtered and sorted.
+
+    Without a filter or sort the page is a zero-copy slice of the table;
+    otherwise the filter and sort run in DuckDB directly over the Arrow data
+    and only the requested page is materialized.
+
+    Args:
+        table (pyarrow.Table): The table to page through.
+        offset (int): The index of the first row of the page.
+        limit (int): The number of rows in the page.
+        sort_column (str, optional): The column to sort by.
+        descending (bool): Sort in descending order.
+        filter_column (str, optional): The column to filter on.
+        filter_text (str, optional): Case-insensitive text the column must contain.
+
+    Returns:
+        tuple:
+            - pyarrow.Table: The rows of the page.
+            - int: The number of rows matching the filter.
+    """
+    import duckdb
+
+    if not sort_column and not (filter_column and filter_text):
+        return table.slice(offset, limit), table.num_rows
+
+    where_clause = ""
+    parameters = []
+    if filter_column and filter_text:
+        where_clause = (
+            f"WHERE CAST({quote_identifier(filter_column)} AS VARCHAR) "
+            "ILIKE '%' || ? || '%'"
+        )
+        parameters.append(filter_text)
+
+    order_clause = ""
+    if sort_column:
+        direction = "DESC" if descending else "ASC"
+        order_clause = (
+            f"ORDER BY {quote_identifier(sort_column)} {direction} NULLS LAST"
+        )
+
+    con = duckdb.connect(database=":memory:")
+    try:
+        con.register("preview_table", table)
+        matching_rows = con.execute(
+            f"SELECT count(*) FROM preview_table {where_clause}", parameters
+        ).fetchone()[0]
+        page = con.execute(
+            f"SELECT * FROM preview_table {where_clause} {order_clause} "
+            "LIMIT ? OFFSET ?",
+            parameters + [limit, offset],
+        ).fetch_arrow_table()
+    finally:
+        con.close()
+
+    return page, matching_rows
+
+
+def display_table_page(table, key):
+    """
+    Display a PyArrow Table one page at a time.
+
+    The table stays on the server; only the visible page is sent to the
+    browser, so the cost of a rerun depends on the page size, not the file size.
+
+    Args:
+        table (pyarrow.Table): The table to display.
+        key (str): A unique key for the widgets of this grid.
+    """
+    columns = table.column_names
+
+    filter_col, text_col, sort_col, order_col, size_col = st.columns([2, 3, 2, 1, 1])
+    with filter_col:
+        filter_column = st.selectbox(
+            "Filter column", [None] + columns, key=f"{key}_filter_column"
+        )
+    with text_col:
+        filter_text = st.text_input(
+            "Contains", key=f"{key}_filter_text", disabled=filter_column is None
+        )
+    with sort_col:
+        sort_column = st.selectbox("Sort by", [None] + columns, key=f"{key}_sort")
+    with order_col:
+        descending = st.toggle("Descending", key=f"{key}_descending")
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZE_OPTIONS, key=f"{key}_size")
+
+    # Go back to the first page whenever the filter, sort or page size changes
+    view = (
+        table.num_rows,
+        tuple(columns),
+        filter_column,
+        filter_text,
+        sort_column,
+        descending,
+        page_size,
+    )
+    if st.session_state.get(f"{key}_view") != view:
+        st.session_state[f"{key}_view"] = view
+        st.session_state[f"{key}_page"] = 1
+
+    page_number = st.session_state.get(f"{key}_page", 1)
+    page, matching_rows = query_table_page(
+        table,
+        (page_number - 1) * page_size,
+        page_size,
+        sort_column=sort_column,
+        descending=descending,
+        filter_column=filter_column,
+        filter_text=filter_text,
+    )
+
+    st.data_editor(
+        page,
+        disabled=True,
+        use_container_width=True,
+        key=f"{key}_grid",
+    )
+
+    page_count = max(math.ceil(matching_rows / page_size), 1)
+    info_col, page_col = st.columns([4, 1])
+    with page_col:
+        st.number_input(
+            f"Page (of {page_count:,})",
+            min_value=1,
+            max_value=page_count,
+            key=f"{key}_page",
+        )
+    with info_col:
+        st.caption(
+            f"{matching_rows:,} of {table.num_rows:,} rows · "
+            f"{table.num_columns} columns · "
+            f"{table.nbytes / (1024 * 1024):,.1f} MB in memory"
+        )
@@ -0,0 +1,138 @@
+import pandas as pd
+
+from preview_grid import quote_identifier
+
+# Upper bounds of the string length histogram buckets
+LENGTH_BINS = [0, 8, 16, 32, 64, 128, 256]
+
+# Number of most frequent values shown per column
+TOP_K = 5
+
+# DuckDB type used to check values against each YAML data type
+DUCKDB_TYPES = {
+    "string": "VARCHAR",
+    "date": "DATE",
+    "int32": "INTEGER",
+    "int64": "BIGINT",
+    "float32": "FLOAT",
+    "float64": "DOUBLE",
+    "bool": "BOOLEAN",
+}
+
+
+def get_duckdb_type(dtype):
+    """
+    Map a YAML data type descriptor to the DuckDB type used to check values.
+
+    Args:
+        dtype (str): A YAML data type, e.g. 'string', 'decimal(10,2)', 'date'.
+
+    Returns:
+        str: The DuckDB type name, or None if the type is not supported.
+    """
+    if dtype.startswith("decimal"):
+        return dtype.upper()
+    return DUCKDB_TYPES.get(dtype)
+
+
+def _format_length_histogram(histogram):
+    if not histogram:
+        return None
+    buckets = []
+    previous_bound = None
+    for bound, count in sorted(histogram.items()):
+        if not count:
+            previous_bound = bound
+            continue
+        if bound > LENGTH_BINS[-1]:
+            label = f">{LENGTH_BINS[-1]}"
+        elif bound == 0:
+            label = "empty"
+        elif previous_bound is None:
+            label = f"≤{bound}"
+        else:
+            label = f"{previous_bound + 1}-{bound}"
+        buckets.append(f"{label}: {count:,}")
+        previous_bound = bound
+    return ", ".join(buckets)
+
+
+def profile_table(table, expected_types=None):
+    """
+    Profile every column of a PyArrow Table in a single DuckDB aggregation.
+
+    All statistics are computed in one scan over the Arrow data: null counts,
+    HyperLogLog distinct estimates, min/max, approximate top values, string
+    length histograms and the number of values that cannot be cast to the
+    data type defined in the YAML.
+
+    Args:
+        table (pyarrow.Table): The uploaded table.
+        expected_types (dict, optional): File column name -> YAML data type.
+
+    Returns:
+        pandas.DataFrame: One row per column with its statistics.
+    """
+    import duckdb
+
+    expected_types = expected_types or {}
+    if table.num_columns == 0:
+        return pd.DataFrame()
+
+    expressions = []
+    for index, field in enumerate(table.schema):
+        column = quote_identifier(field.name)
+        expressions += [
+            f"count(*) - count({column}) AS c{index}_nulls",
+            f"approx_count_distinct({column}) AS c{index}_distinct",
+            f"min({column})::VARCHAR AS c{index}_min",
+            f"max({column})::VARCHAR AS c{index}_max",
+            f"approx_top_k({column}, {TOP_K})::VARCHAR[] AS c{index}_top",
+        ]
+        if field.type in ("string", "large_string"):
+            expressions.append(
+                f"histogram(length({column}), {LENGTH_BINS}) AS c{index}_lengths"
+            )
+
+        duckdb_type = get_duckdb_type(expected_types.get(field.name, ""))
+        if duckdb_type:
+            expressions.append(
+                f"count({column}) - count(TRY_CAST({column} AS {duckdb_type})) "
+                f"AS c{index}_mismatches"
+            )
+
+    con = duckdb.connect(database=":memory:")
+    try:
+        con.register("profiled_table", table)
+        cursor = con.execute(f"SELECT {', '.join(expressions)} FROM profiled_table")
+        names = [description[0] for description in cursor.description]
+        stats = dict(zip(names, cursor.fetchone()))
+    finally:
+        con.close()
+
+    rows = []
+    for index, field in enumerate(table.schema):
+        nulls = stats[f"c{index}_nulls"]
+        rows.append(
+            {
+                "Column": field.name,
+                "Type": str(field.type),
+                "YAML type": expected_types.get(field.name),
+                "Nulls": nulls,
+                "Null %": round(100 * nulls / table.num_rows, 1)
+                if table.num_rows
+                else 0.0,
+                "Distinct (approx.)": stats[f"c{index}_distinct"],
+                "Min": stats[f"c{index}_min"],
+                "Max": stats[f"c{index}_max"],
+                "Top values": ", ".join(
+                    value for value in stats[f"c{index}_top"] or [] if value is not None
+                ),
+                "Length histogram": _format_length_histogram(
+                    stats.get(f"c{index}_lengths")
+                ),
+                "Type mismatches": stats.get(f"c{index}_mismatches"),
+            }
+        )
+
+    return pd.DataFrame(rows)
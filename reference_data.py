@@ -0,0 +1,257 @@
+import functools
+import os
+import threading
+import time
+from io import BytesIO
+
+import pyarrow as pa
+
+# Local reference data: FileUploaderDBT/seeds/<reference>.parquet or .csv
+SEEDS_DIR = os.path.join("FileUploaderDBT", "seeds")
+YAML_DIR = os.path.join("FileUploaderDBT", "models", "validation")
+
+# Generic test that checks codes against a reference table
+REFERENCE_TEST_NAME = "relationships_to_reference"
+
+# How long a loaded reference is trusted before its source is checked for changes
+REFERENCE_REFRESH_SECONDS = int(os.getenv("REFERENCE_REFRESH_SECONDS", "900"))
+
+# Shared by all sessions of the process: reference name -> loaded Arrow table
+_reference_cache = {}
+_lock = threading.Lock()
+_service_client = None
+
+
+def reference_table_name(reference):
+    return f"reference_{reference}"
+
+
+def get_report_references(report_type):
+    """
+    Get the reference tables used by the relationships_to_reference tests of a report.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        list: The sorted names of the references used by the report.
+    """
+    yaml_paths = []
+    for root, _, files in os.walk(YAML_DIR):
+        for file in files:
+            if file.endswith(".yml"):
+                yaml_paths.append(os.path.join(root, file))
+
+    yaml_signature = tuple(
+        (path, os.path.getmtime(path)) for path in sorted(yaml_paths)
+    )
+    return _load_report_references(yaml_signature).get(report_type, [])
+
+
+@functools.lru_cache(maxsize=1)
+def _load_report_references(yaml_signature):
+    import yaml
+
+    references_by_table = {}
+    for path, _ in yaml_signature:
+        with open(path) as file:
+            content = yaml.safe_load(file)
+
+        for source in content.get("sources", []):
+            for table in source.get("tables", []):
+                tests = list(table.get("tests", []))
+                for column in table.get("columns", []):
+                    tests.extend(column.get("tests", []))
+
+                references = {
+                    test[REFERENCE_TEST_NAME]["reference"]
+                    for test in tests
+                    if isinstance(test, dict) and REFERENCE_TEST_NAME in test
+                }
+                if references:
+                    references_by_table[table["name"]] = sorted(references)
+
+    return references_by_table
+
+
+def _get_service_client():
+    global _service_client
+    if _service_client is None:
+        # Imported on first use. The client is not created with adls_utils,
+        # which needs Streamlit, as references are also loaded by the workers
+        from azure.identity import ClientSecretCredential
+        from azure.storage.filedatalake import DataLakeServiceClient
+
+        credential = ClientSecretCredential(
+            os.getenv("AZURE_TENANT_ID"),
+            os.getenv("AZURE_CLIENT_ID"),
+            os.getenv("AZURE_CLIENT_SECRET"),
+        )
+        _service_client = DataLakeServiceClient(
+            account_url=(
+                f"https://{os.getenv('AZURE_STORAGE_ACCOUNT_NAME')}.dfs.core.windows.net"
+            ),
+            credential=credential,
+        )
+    return _service_client
+
+
+def _find_reference_source(reference):
+    """
+    Locate the source of a reference and compute a signature of its current version.
+
+    Local seed files take precedence over data previously submitted to ADLS.
+
+    Returns:
+        tuple: The signature and a function that loads the reference as an Arrow Table.
+    """
+    for extension in (".parquet", ".csv"):
+        path = os.path.join(SEEDS_DIR, f"{reference}{extension}")
+        if os.path.exists(path):
+            signature = (path, os.path.getmtime(path), os.path.getsize(path))
+            return signature, functools.partial(_read_seed_file, path)
+
+    # Fall back to the Parquet files previously submitted for the reference report
+    container_name = os.getenv("AZURE_STORAGE_CONTAINER_NAME")
+    if not container_name:
+        raise FileNotFoundError(f"No reference data found for '{reference}'.")
+
+    file_system_client = _get_service_client().get_file_system_client(container_name)
+    paths = [
+        path
+        for path in file_system_client.get_paths(
+            path=f"{os.getenv('AZURE_STORAGE_FILE_PATH')}/{reference}"
+        )
+        if path.name.endswith(".parquet")
+    ]
+    if not paths:
+        raise FileNotFoundError(f"No reference data found for '{reference}'.")
+
+    signature = tuple(sorted((path.name, str(path.last_modified)) for path in paths))
+    return signature, functools.partial(
+        _read_submitted_files, file_system_client, [path.name for path in paths]
+    )
+
+
+def _read_seed_file(path):
+    import duckdb
+
+    con = duckdb.connect(database=":memory:")
+    try:
+        if path.endswith(".csv"):
+            # Codes are compared as text, so keep leading zeros and formatting
+            return con.execute(
+                "SELECT * FROM read_csv_auto(?, all_varchar = true)", [path]
+            ).fetch_arrow_table()
+        return con.execute("SELECT * FROM read_parquet(?)", [path]).fetch_arrow_table()
+    finally:
+        con.close()
+
+
+def _read_submitted_files(file_system_client, file_names):
+    import pyarrow.parquet as pq
+
+    tables = [
+        pq.read_table(
+            BytesIO(file_system_client.get_file_client(name).download_file().readall())
+        )
+        for name in file_names
+    ]
+    return pa.concat_tables(tables, promote_options="default")
+
+
+def get_reference_table(reference):
+    """
+    Get a reference as an Arrow Table from the shared in-memory cache.
+
+    The source is checked for changes at most every REFERENCE_REFRESH_SECONDS;
+    the data itself is only re-read when its signature changed.
+
+    Args:
+        reference (str): The reference name.
+
+    Returns:
+        dict: The cached entry with the "table" and its "signature".
+
+    Raises:
+        FileNotFoundError: If no seed file or submitted data exists for the reference.
+    """
+    with _lock:
+        cached = _reference_cache.get(reference)
+    if cached and time.time() - cached["checked_at"] < REFERENCE_REFRESH_SECONDS:
+        return cached
+
+    signature, load_reference = _find_reference_source(reference)
+    if cached and cached["signature"] == signature:
+        cached["checked_at"] = time.time()
+        return cached
+
+    entry = {
+        "table": load_reference(),
+        "signature": signature,
+        "checked_at": time.time(),
+    }
+    with _lock:
+        _reference_cache[reference] = entry
+    return entry
+
+
+def load_reference_tables(database, references):
+    """
+    Make sure the current version of each reference is loaded into DuckDB.
+
+    A reference is only (re)written when it is missing from the database or
+    its source changed since it was last materialized. The signature of the
+    materialized version is kept as the comment of its table, so it is removed
+    with the database.
+
+    Args:
+        database (str): Path to the DuckDB database used by the dbt tests.
+        references (list): The reference names to load.
+
+    Returns:
+        tuple: The signatures of the loaded references, to detect changes later.
+    """
+    import duckdb
+
+    if not references:
+        return ()
+
+    signatures = []
+    con = duckdb.connect(database=database, read_only=False)
+    try:
+        materialized = dict(
+            con.execute(
+                "SELECT table_name, comment FROM duckdb_tables() "
+                "WHERE schema_name = 'main'"
+            ).fetchall()
+        )
+        for reference in references:
+            entry = get_reference_table(reference)
+            signatures.append((reference, entry["signature"]))
+
+            table_name = reference_table_name(reference)
+            signature = repr(entry["signature"])
+            if materialized.get(table_name) == signature:
+                continue
+
+            con.register("reference_table", entry["table"])
+            con.execute(
+                f'CREATE OR REPLACE TABLE "{table_name}" AS '
+                "SELECT * FROM reference_table"
+            )
+            con.unregister("reference_table")
+            escaped_signature = signature.replace("'", "''")
+            con.execute(f"COMMENT ON TABLE \"{table_name}\" IS '{escaped_signature}'")
+    finally:
+        con.close()
+
+    return tuple(signatures)
+
+
+def refresh_reference_data():
+    """
+    Drop all cached references so they are re-read on the next validation.
+    """
+    with _lock:
+        _reference_cache.clear()
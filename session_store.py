@@ -0,0 +1,209 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+import streamlit as st
+
+# Root directory of the per-session scratch directories
+SESSION_SCRATCH_DIR = os.getenv("SESSION_SCRATCH_DIR") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_sessions"
+)
+
+# Disk budget per session; the least recently used tables are evicted beyond it
+SESSION_STORE_MAX_BYTES = int(os.getenv("SESSION_STORE_MAX_BYTES", str(2 * 1024**3)))
+
+# Tables and scratch directories unused for longer than this are removed
+SESSION_STORE_MAX_AGE_SECONDS = int(os.getenv("SESSION_STORE_MAX_AGE_SECONDS", "3600"))
+
+# Minimum interval between two sweeps of the scratch directories of ended sessions
+SWEEP_INTERVAL_SECONDS = 60
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def session_scratch_dir():
+    """
+    Return the scratch directory of the current session, creating it if needed.
+
+    Returns:
+        str: The path of the session's scratch directory.
+    """
+    if "session_store_id" not in st.session_state:
+        st.session_state["session_store_id"] = uuid.uuid4().hex
+        st.session_state["session_store"] = {}
+
+    scratch_dir = os.path.join(
+        SESSION_SCRATCH_DIR, st.session_state["session_store_id"]
+    )
+    os.makedirs(scratch_dir, exist_ok=True)
+    # The modification time marks the session as alive for the sweep
+    os.utime(scratch_dir)
+    return scratch_dir
+
+
+def scratch_file_path(file_name):
+    """
+    Return the path of a file in the session's scratch directory.
+
+    The file is removed together with the directory once the session ends.
+
+    Args:
+        file_name (str): The name of the file, e.g. 'upload-<hash>.xlsx'.
+
+    Returns:
+        str: The path of the file, which may not exist yet.
+    """
+    return os.path.join(session_scratch_dir(), file_name)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # e.g. a file that is still memory-mapped on Windows
+        logging.warning(f"Could not remove session file {path}: {e}")
+
+
+def _read_table(path):
+    # Memory-mapped: pages are loaded on access and can be reclaimed by the OS
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def put_table(name, table, key=None):
+    """
+    Store an Arrow table on disk and keep only its handle in session state.
+
+    Args:
+        name (str): The name of the table in the session store.
+        table (pyarrow.Table): The table to store.
+        key (optional): Identifies the content, e.g. the id of the uploaded file.
+
+    Returns:
+        pyarrow.Table: The stored table, memory-mapped from disk.
+    """
+    path = os.path.join(session_scratch_dir(), f"{name}-{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    delete_table(name)
+    st.session_state["session_store"][name] = {
+        "path": path,
+        "key": key,
+        "bytes": os.path.getsize(path),
+        "last_used": time.time(),
+    }
+    evict_tables(keep=name)
+    return _read_table(path)
+
+
+def get_table(name, key=None):
+    """
+    Get a table from the session store.
+
+    Args:
+        name (str): The name of the table in the session store.
+        key (optional): Only return the table if it was stored with this key.
+
+    Returns:
+        pyarrow.Table: The memory-mapped table, or None if it is not stored,
+            was evicted or was stored with another key.
+    """
+    session_scratch_dir()
+    handle = st.session_state["session_store"].get(name)
+    if handle is None or (key is not None and handle["key"] != key):
+        return None
+    if not os.path.exists(handle["path"]):
+        del st.session_state["session_store"][name]
+        return None
+
+    handle["last_used"] = time.time()
+    return _read_table(handle["path"])
+
+
+def has_table(name):
+    """
+    Check whether a table is in the session store.
+
+    Args:
+        name (str): The name of the table in the session store.
+
+    Returns:
+        bool: True if the table is stored.
+    """
+    handle = st.session_state.get("session_store", {}).get(name)
+    return handle is not None and os.path.exists(handle["path"])
+
+
+def delete_table(name):
+    """
+    Remove a table from the session store and delete its file.
+
+    Args:
+        name (str): The name of the table in the session store.
+    """
+    handle = st.session_state.get("session_store", {}).pop(name, None)
+    if handle is not None:
+        _remove_file(handle["path"])
+
+
+def evict_tables(keep=None):
+    """
+    Evict tables of the current session that are too old or over the disk budget.
+
+    Tables unused for SESSION_STORE_MAX_AGE_SECONDS are evicted first, then the
+    least recently used ones until the session fits in SESSION_STORE_MAX_BYTES.
+
+    Args:
+        keep (str, optional): A table that must not be evicted, e.g. the one just
+            stored.
+    """
+    handles = st.session_state.get("session_store", {})
+    now = time.time()
+    for name, handle in list(handles.items()):
+        if name != keep and now - handle["last_used"] > SESSION_STORE_MAX_AGE_SECONDS:
+            delete_table(name)
+
+    total_bytes = sum(handle["bytes"] for handle in handles.values())
+    for name, handle in sorted(handles.items(), key=lambda item: item[1]["last_used"]):
+        if total_bytes <= SESSION_STORE_MAX_BYTES:
+            break
+        if name == keep:
+            continue
+        total_bytes -= handle["bytes"]
+        delete_table(name)
+
+    sweep_ended_sessions()
+
+
+def sweep_ended_sessions():
+    """
+    Delete the scratch directories of sessions that have not been active for
+    SESSION_STORE_MAX_AGE_SECONDS, including leftover uploaded files.
+    """
+    global _last_sweep
+    with _sweep_lock:
+        if time.time() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        _last_sweep = time.time()
+
+    try:
+        entries = list(os.scandir(SESSION_SCRATCH_DIR))
+    except FileNotFoundError:
+        return
+
+    for entry in entries:
+        try:
+            idle_seconds = time.time() - entry.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if entry.is_dir() and idle_seconds > SESSION_STORE_MAX_AGE_SECONDS:
+            shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,80 @@
+import logging
+import os
+import threading
+
+from dbt_runner import get_dbt_manifest
+
+# Warm up the slow subsystems in a background thread when the server starts,
+# so the first user does not wait for them
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Scope of the Azure Storage access tokens
+STORAGE_TOKEN_SCOPE = "https://storage.azure.com/.default"
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+def install_duckdb_extensions():
+    import duckdb
+
+    # Downloads the spatial extension (used to read Excel files) if it is missing
+    con = duckdb.connect(database=":memory:")
+    try:
+        con.execute("INSTALL spatial;")
+    finally:
+        con.close()
+
+
+def warm_up(service_client=None):
+    """
+    Load the slow subsystems: parse the dbt project (which imports dbt),
+    install the DuckDB extensions and fetch an Azure Storage access token.
+
+    Every step is independent; a failing step is logged and skipped.
+
+    Args:
+        service_client (DataLakeServiceClient, optional): The storage client whose
+            credential should fetch a token.
+    """
+    steps = [
+        ("dbt manifest", get_dbt_manifest),
+        ("DuckDB extensions", install_duckdb_extensions),
+    ]
+    if service_client is not None:
+        steps.append(
+            (
+                "Azure token",
+                lambda: service_client.credential.get_token(STORAGE_TOKEN_SCOPE),
+            )
+        )
+
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            logging.error(f"Warm-up of the {name} failed: {e}")
+
+
+def start_warmup(service_client=None):
+    """
+    Run warm_up in a background thread, once per process, unless disabled
+    with WARMUP_ON_START=false.
+
+    Args:
+        service_client (DataLakeServiceClient, optional): The storage client whose
+            credential should fetch a token.
+    """
+    global _warmup_thread
+    if not WARMUP_ON_START:
+        return
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(
+                target=warm_up, args=(service_client,), name="warm-up", daemon=True
+            )
+            _warmup_thread.start()
@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from incremental_validation import compute_column_hashes
+
+# Local index of submitted files, one JSON lines file per report, used to skip
+# resubmissions of identical data. Mount a persistent volume here to keep the
+# index across container restarts.
+SUBMIT_INDEX_DIR = os.getenv("SUBMIT_INDEX_DIR") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_submit_index"
+)
+
+# Parquet key-value metadata key holding the content hash of a submitted file
+CONTENT_HASH_METADATA_KEY = "file_uploader.content_hash"
+
+
+def compute_content_hash(table):
+    """
+    Compute a digest of the content of a PyArrow Table.
+
+    The columns are hashed in parallel with compute_column_hashes, and the
+    digest combines the row count and the name and digest of every column.
+
+    Args:
+        table (pyarrow.Table): The table to hash.
+
+    Returns:
+        str: The hex digest of the table.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{table.num_rows}\0".encode())
+    for column_name, column_digest in compute_column_hashes(table).items():
+        digest.update(f"{column_name}\0{column_digest}\0".encode())
+    return digest.hexdigest()
+
+
+def _index_path(report_type):
+    return os.path.join(SUBMIT_INDEX_DIR, f"{report_type}.jsonl")
+
+
+def _append_entry(report_type, entry):
+    # Appending a single line is atomic, so concurrent submits need no lock
+    os.makedirs(SUBMIT_INDEX_DIR, exist_ok=True)
+    with open(_index_path(report_type), "a") as index_file:
+        index_file.write(json.dumps(entry) + "\n")
+
+
+def read_submits(report_type):
+    """
+    Read the submitted files of a report that have not been deleted since.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        dict: Blob name -> submit entry (content_hash, blob_name,
+            original_filename, rows, submitted_at).
+    """
+    submits = {}
+    try:
+        with open(_index_path(report_type)) as index_file:
+            for line in index_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.error(f"Skipping invalid submit index line: {line!r}")
+                    continue
+                if entry.get("deleted"):
+                    submits.pop(entry["blob_name"], None)
+                else:
+                    submits[entry["blob_name"]] = entry
+    except FileNotFoundError:
+        pass
+    return submits
+
+
+def find_submit(report_type, content_hash):
+    """
+    Find a previous submit of the same data.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+        content_hash (str): The digest from compute_content_hash.
+
+    Returns:
+        dict: The submit entry, or None if the data was not submitted before.
+    """
+    for entry in read_submits(report_type).values():
+        if entry["content_hash"] == content_hash:
+            return entry
+    return None
+
+
+def record_submit(report_type, content_hash, blob_name, original_filename, rows):
+    """
+    Add a submitted file to the index.
+
+    Args:
+        report_type (str): The report name as defined in the YAML configuration.
+        content_hash (str): The digest from compute_content_hash.
+        blob_name (str): The path of the file in the storage account.
+        original_filename (str): The name of the uploaded file.
+        rows (int): The number of rows submitted.
+    """
+    _append_entry(
+        report_type,
+        {
+            "content_hash": content_hash,
+            "blob_name": blob_name,
+            "original_filename": original_filename,
+            "rows": rows,
+            "submitted_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+    )
+
+
+def forget_submits(blob_names):
+    """
+    Remove deleted files from the index, so their data can be submitted again.
+
+    Args:
+        blob_names (list): Paths of deleted files, '<base path>/<report>/<file>'.
+    """
+    for blob_name in blob_names:
+        report_type = os.path.basename(os.path.dirname(blob_name))
+        if report_type and os.path.exists(_index_path(report_type)):
+            _append_entry(report_type, {"blob_name": blob_name, "deleted": True})
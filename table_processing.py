@@ -0,0 +1,518 @@
+import difflib
+import functools
+import logging
+import os
+import re
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from bidict import bidict
+
+from compressed_files import (
+    extract_zip_member,
+    find_zip_member,
+    get_uncompressed_size,
+    open_decompressed,
+    split_file_type,
+)
+from csv_reader import (
+    CSV_PYARROW_MIN_BYTES,
+    choose_csv_engine,
+    read_csv_duckdb,
+    read_csv_pyarrow,
+)
+from tracing import trace_stage
+
+# Reading, cleaning and casting uploaded tables against the YAML definitions,
+# without any Streamlit UI: problems are raised, logged or returned to the
+# caller, which displays them.
+
+try:
+    from fsspec.implementations.memory import MemoryFile, MemoryFileSystem
+    from fsspec.implementations.zip import ZipFileSystem
+except ImportError:  # Optional: without fsspec, CSV uploads are read from a temp file
+    MemoryFile = None
+    MemoryFileSystem = None
+    ZipFileSystem = None
+
+MEMORY_FILESYSTEM = MemoryFileSystem() if MemoryFileSystem is not None else None
+
+
+def get_pyarrow_dtype(dtype):
+    """
+    Map a YAML string data type descriptor to a corresponding PyArrow data type.
+
+    Args:
+    dtype (str): A string representing the data type, e.g., 'string',
+        'decimal(10,2)', 'date'.
+
+    Returns:
+    pyarrow.DataType: The corresponding PyArrow data type.
+
+    Raises:
+    ValueError: If the provided data type is not supported.
+    """
+    if dtype == "string":
+        return pa.string()
+    elif dtype.startswith("decimal"):
+        # Extract precision and scale for decimal types
+        precision, scale = map(
+            int, dtype[dtype.find("(") + 1 : dtype.find(")")].split(",")
+        )
+        return pa.decimal128(precision, scale)
+    elif dtype == "date":
+        return pa.date32()
+    elif dtype == "int32":
+        return pa.int32()
+    elif dtype == "int64":
+        return pa.int64()
+    elif dtype == "float32":
+        return pa.float32()
+    elif dtype == "float64":
+        return pa.float64()
+    elif dtype == "bool":
+        return pa.bool_()
+    # Add additional data types as necessary
+    else:
+        raise ValueError(f"Unsupported data type: {dtype}")
+
+
+def cast_pyarrow_table_columns_to_types(table, model_data_types, cast_errors=None):
+    """
+    Casts columns of a PyArrow Table to specified data types based on a schema.
+
+    Args:
+        table (pyarrow.Table): The input table to be converted.
+        model_data_types (dict): A dictionary mapping column names to data type
+            descriptors.
+        cast_errors (list, optional): Collects the error message of every column
+            that could not be cast, for the caller to display.
+
+    Returns:
+        tuple: The table with columns cast to the specified data types, and
+            whether every column could be cast.
+    """
+    new_columns = []
+    all_column_type_matched = True
+
+    for column_name in table.schema.names:
+        if column_name in model_data_types:
+            try:
+                dtype = model_data_types[column_name]
+                arrow_type = get_pyarrow_dtype(dtype)
+
+                # pyarrow.csv or duckdb int values such as [1, 2, 3] will be
+                # casted to int64
+                # due to pyarrow cannot cast directly from int64 to decimal(16,4)
+                # Check if the column is of int64 type and needs to be cast to
+                # decimal(16,4)
+                if (
+                    table.column(column_name).type == pa.int64()
+                    and dtype == "decimal(16,4)"
+                ):
+                    # Step 1: Cast from int64 to int32
+                    intermediate_column = table.column(column_name).cast(pa.int32())
+                    # Step 2: Cast from int32 to decimal(16,4)
+                    casted_column = intermediate_column.cast(arrow_type)
+                else:
+                    # Direct casting for other types
+                    casted_column = table.column(column_name).cast(arrow_type)
+
+                new_columns.append(casted_column)
+                logging.debug(f"Column '{column_name}' successfully cast to {dtype}.")
+            except Exception as e:
+                # Attempt to show unique values from the problematic column
+                try:
+                    unique_values = pc.unique(table.column(column_name))
+                    if len(unique_values) > 5:
+                        unique_values = unique_values.slice(0, 5)
+                    examples = unique_values.to_pandas().tolist()
+                except Exception as e_inner:
+                    examples = ["Error fetching examples: " + str(e_inner)]
+
+                error_message = f"""
+                    Error converting column '{column_name}' to `{dtype}`.
+                    - Error Details: `{str(e)}`
+                    - Examples of data from the column: {examples}
+                    """
+                logging.warning(
+                    f"Error converting column '{column_name}' to {dtype}: {e}"
+                )
+                if cast_errors is not None:
+                    cast_errors.append(error_message)
+                new_columns.append(table.column(column_name))
+                all_column_type_matched = False
+        else:
+            # If the column is not in the schema, use the original column
+            new_columns.append(table.column(column_name))
+
+    return pa.Table.from_arrays(
+        new_columns, names=table.schema.names
+    ), all_column_type_matched
+
+
+# Function to read schema.yml files and get table column definitions
+def get_yaml_definitions():
+    # Current working directory
+    base_dir = os.getcwd()
+    # Relative path from the current working directory
+    yaml_relative_path = os.path.join(
+        base_dir, "FileUploaderDBT", "models", "validation"
+    )
+    configuration_file_paths = []
+    for root, _, files in os.walk(yaml_relative_path):
+        for file in files:
+            if file.endswith(".yml"):
+                configuration_file_paths.append(os.path.join(root, file))
+
+    # The definitions are parsed once and reused until a YAML file changes
+    yaml_signature = tuple(
+        (path, os.path.getmtime(path)) for path in sorted(configuration_file_paths)
+    )
+    return _load_yaml_definitions(yaml_signature)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_yaml_definitions(yaml_signature):
+    import yaml
+
+    report_name_and_alias_dict = bidict()
+    columns_by_table = {}
+    columns_type_by_table = {}
+
+    for path, _ in yaml_signature:
+        try:
+            # For each model definition
+            with open(path) as file:
+                content = yaml.safe_load(file)
+
+                # Get the first defined source
+                model = content.get("sources", [])[0]
+
+                # Get the first defined table
+                table = model.get("tables", [])[0]
+
+                # Get Report name
+                report_name = table.get("name")
+                report_name_and_alias_dict[report_name] = report_name
+
+                # Get report alias if exists.
+                table_alias = table.get("table_alias")
+                if table_alias:
+                    report_name_and_alias_dict[report_name] = table_alias
+
+                # Placeholder for column_names & column_datatypes
+                column_name_dict = {}
+                column_datatype_dict = {}
+                # Get column information
+                for col in table.get("columns", []):
+                    # Column names
+                    sanatized_name = sanatize_string(col["name"])
+                    column_name_dict[sanatized_name] = col["name"]
+
+                    # datatypes
+                    column_datatype_dict[col["name"]] = col["data_type"]
+
+                columns_by_table[report_name] = column_name_dict
+                columns_type_by_table[report_name] = column_datatype_dict
+
+        except yaml.YAMLError as exc:
+            logging.error(f"Error reading YAML file {path}: {exc}")
+        except FileNotFoundError:
+            logging.error(f"File not found: {path}")
+
+    return columns_by_table, columns_type_by_table, report_name_and_alias_dict
+
+
+def get_file_size(path):
+    if path.startswith("memory://"):
+        return MEMORY_FILESYSTEM.size(path)
+    return os.path.getsize(path)
+
+
+def get_csv_column_types(column_names, report_type):
+    """
+    Maps the CSV headers to the PyArrow types of their YAML columns.
+
+    Args:
+        column_names (list): The header names of the CSV file.
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        dict: A dictionary mapping header names to PyArrow data types.
+    """
+    columns_by_table, columns_type_by_table, _ = get_yaml_definitions()
+    if report_type not in columns_by_table:
+        return {}
+
+    new_names, _, _, _ = resolve_headers(column_names, columns_by_table[report_type])
+    column_types = {}
+    for column_name, yaml_name in zip(column_names, new_names):
+        dtype = columns_type_by_table[report_type].get(yaml_name)
+        if dtype is None:
+            continue
+        try:
+            column_types[column_name] = get_pyarrow_dtype(dtype)
+        except ValueError:
+            continue
+    return column_types
+
+
+def open_csv_source(temp_file_path):
+    # pyarrow reads uploads registered in memory without copying their bytes
+    if temp_file_path.startswith("memory://"):
+        memory_file = MEMORY_FILESYSTEM.store[
+            MEMORY_FILESYSTEM._strip_protocol(temp_file_path)
+        ]
+        return pa.BufferReader(pa.py_buffer(memory_file.getvalue()))
+    return temp_file_path
+
+
+def read_uploaded_table(temp_file_path, file_type, span=None, report_type=None):
+    """
+    Reads a CSV or Excel file into an Arrow Table, removing empty rows and
+    special characters from the column names.
+
+    Args:
+        temp_file_path (str): Path to the file, on disk or registered in memory.
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+        span (dict, optional): The ingest span, to record the CSV engine used.
+        report_type (str, optional): The report the file is uploaded for; its YAML
+            data types are used by the pyarrow CSV engine.
+
+    Returns:
+        tuple: DataFrame of detected CSV properties (empty for Excel), Arrow Table.
+
+    Raises:
+        ValueError: If the file type is not supported.
+    """
+    import duckdb
+
+    # Connect to the DuckDB instance
+    con = duckdb.connect(database=":memory:", read_only=False)
+
+    # Uploads registered in memory are read through fsspec
+    if temp_file_path.startswith("memory://"):
+        con.register_filesystem(MEMORY_FILESYSTEM)
+
+    # Compressed files are decompressed while they are read
+    data_type, compression = split_file_type(file_type)
+    # Holds the file extracted from a zip archive for readers that need a path
+    extract_dir = None
+
+    # Read the file based on its type
+    try:
+        if data_type == ".csv":
+            # Processing CSV files
+            csv_path = temp_file_path
+            csv_compression = compression
+            if compression == "zip":
+                csv_compression = None
+                if ZipFileSystem is not None:
+                    # DuckDB reads the CSV file from the archive through fsspec
+                    member = find_zip_member(open_csv_source(temp_file_path))
+                    con.register_filesystem(
+                        ZipFileSystem(fo=open_csv_source(temp_file_path))
+                    )
+                    csv_path = "zip://" + member.replace("'", "''")
+                else:
+                    extract_dir = tempfile.TemporaryDirectory(prefix="upload-")
+                    csv_path = extract_zip_member(temp_file_path, extract_dir.name)
+            sniff_options = (
+                f", compression = '{csv_compression}'" if csv_compression else ""
+            )
+
+            # Use DuckDB's sniff_csv to get properties
+            df_csv_prop_sniff = con.execute(
+                f"SELECT * FROM sniff_csv('{csv_path}'{sniff_options})"
+            ).fetchdf()
+            csv_size = get_file_size(temp_file_path)
+            if compression is not None:
+                # The parser is chosen by the size of the decompressed CSV;
+                # without it, the file is assumed to be large
+                csv_size = get_uncompressed_size(
+                    open_csv_source(temp_file_path), compression
+                )
+            csv_engine = choose_csv_engine(
+                CSV_PYARROW_MIN_BYTES if csv_size is None else csv_size
+            )
+            # Both engines parse the file as sniffed, with the column
+            # types of the report
+            dialect = df_csv_prop_sniff.iloc[0].to_dict()
+            column_types = get_csv_column_types(
+                [column["name"] for column in dialect["Columns"]], report_type
+            )
+            read_auto_table = None
+            if csv_engine == "pyarrow":
+                csv_source = open_csv_source(temp_file_path)
+                if compression is not None:
+                    csv_source = open_decompressed(csv_source, compression)
+                try:
+                    read_auto_table = read_csv_pyarrow(
+                        csv_source, dialect, column_types
+                    )
+                except pa.ArrowInvalid as e:
+                    # e.g. a value that does not match its type; DuckDB keeps
+                    # such columns as text so the validation can report them
+                    logging.info(f"Falling back to DuckDB to read CSV: {e}")
+                    csv_engine = "duckdb"
+            if read_auto_table is None:
+                read_auto_table = read_csv_duckdb(
+                    con,
+                    csv_path,
+                    compression=csv_compression,
+                    column_types=column_types,
+                )
+            if span is not None:
+                span["engine"] = csv_engine
+
+            # Remove empty rows
+            read_auto_table = remove_empty_rows(read_auto_table)
+
+            # Strip column names for special characters.
+            read_auto_table = sanatize_table_column_names(read_auto_table)
+
+            # Transpose the sniffed properties DataFrame and filter
+            df_csv_prop_transposed = df_csv_prop_sniff.T
+            df_csv_prop_transposed.reset_index(inplace=True)
+            df_csv_prop_transposed.columns = ["Properties", "Values"]
+            df_csv_prop_filtered = df_csv_prop_transposed[
+                ~df_csv_prop_transposed["Properties"].isin(["Columns", "Prompt"])
+            ]  # Filter out 'Columns' and 'Prompt' rows
+
+            return df_csv_prop_filtered, read_auto_table
+
+        elif data_type == ".xlsx":
+            # Processing Excel files using DuckDB
+            # Loading the spatial extension (st_read) takes a while, so
+            # it is only loaded for Excel files
+            con.execute("INSTALL spatial;")
+            con.execute("LOAD spatial;")
+
+            excel_path = temp_file_path
+            if compression == "zip":
+                # GDAL cannot open an Excel file inside a zip archive; an
+                # Excel file is already compressed, so the extracted file
+                # is about the size of the archive
+                extract_dir = tempfile.TemporaryDirectory(prefix="upload-")
+                excel_path = extract_zip_member(temp_file_path, extract_dir.name)
+
+            read_auto_table = con.execute(
+                f"SELECT * FROM st_read('{excel_path}', "
+                "open_options = ['HEADERS=FORCE'])"
+            ).fetch_arrow_table()
+
+            # Remove empty rows
+            read_auto_table = remove_empty_rows(read_auto_table)
+
+            # Strip column names for special characters.
+            read_auto_table = sanatize_table_column_names(read_auto_table)
+
+            return pd.DataFrame(), read_auto_table
+
+        else:
+            raise ValueError(
+                f"Unsupported file type provided: {file_type}. Use CSV or Excel files."
+            )
+
+    finally:
+        # Ensure the connection is closed after processing
+        con.close()
+        if extract_dir is not None:
+            extract_dir.cleanup()
+
+
+# Compiled once; header names repeat across uploads so results are memoized
+SPECIAL_CHARACTERS_PATTERN = re.compile(r"[^a-zA-Z0-9 ]")
+
+
+@functools.lru_cache(maxsize=4096)
+def sanatize_string(string):
+    # Remove special characters using regular expression
+    sanitized_string = SPECIAL_CHARACTERS_PATTERN.sub("", string)
+    # Convert to lowercase
+    sanitized_string = sanitized_string.lower()
+    return sanitized_string
+
+
+def sanatize_string_list(string_list):
+    sanitized_list = []
+    for string in string_list:
+        sanitized_list.append(sanatize_string(string))
+    return sanitized_list
+
+
+def sanatize_table_column_names(pyarrow_table):
+    new_names = sanatize_string_list(pyarrow_table.column_names)
+    return pyarrow_table.rename_columns(new_names)
+
+
+def resolve_headers(file_columns, yaml_columns):
+    """
+    Resolves file headers against the expected YAML columns in a single pass.
+
+    Args:
+        file_columns (list): Column names of the uploaded file. Names that were
+            already sanitized at ingest are looked up directly.
+        yaml_columns (dict): Sanitized column name -> YAML column name for the report.
+
+    Returns:
+        tuple:
+            - list: The YAML column names to pass to `rename_columns`
+              (unmatched headers keep their file name).
+            - set: YAML columns that are missing in the file.
+            - set: File columns that are not defined in the YAML.
+            - dict: Extra file column -> closest missing YAML column.
+    """
+    new_names = []
+    matched = set()
+    extra_in_file = set()
+
+    for column in file_columns:
+        # Headers coming from ingest are already sanitized; only sanitize on a miss
+        key = column if column in yaml_columns else sanatize_string(column)
+        if key in yaml_columns and key not in matched:
+            matched.add(key)
+            new_names.append(yaml_columns[key])
+        else:
+            extra_in_file.add(key)
+            new_names.append(column)
+
+    missing_in_file = set(yaml_columns) - matched
+
+    # Suggest the closest missing YAML column for every unmatched header
+    suggestions = {}
+    for column in extra_in_file:
+        close_matches = difflib.get_close_matches(
+            column, missing_in_file, n=1, cutoff=0.75
+        )
+        if close_matches:
+            suggestions[column] = close_matches[0]
+
+    return new_names, missing_in_file, extra_in_file, suggestions
+
+
+def remove_empty_rows(table):
+    with trace_stage("clean", rows=len(table)) as span:
+        if isinstance(table, pd.DataFrame):  # Pandas table
+            table = table.dropna(how="all").reset_index(drop=True)
+        elif isinstance(table, pa.lib.Table):  # Pyarrow table
+            # A row is kept if any column has a value; the table is filtered in
+            # Arrow, without a pandas copy of it
+            if table.num_columns:
+                has_value = functools.reduce(
+                    pc.or_,
+                    (
+                        pc.invert(pc.is_null(column, nan_is_null=True))
+                        for column in table.columns
+                    ),
+                )
+                table = table.filter(has_value)
+        else:
+            raise ValueError(
+                "Unsupported table type. Must be a pandas DataFrame or PyArrow Table."
+            )
+        span["rows_after"] = len(table)
+        return table
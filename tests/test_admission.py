@@ -0,0 +1,63 @@
+import pytest
+
+import admission
+from admission import _next_admissible
+
+MB = 1024**2
+
+
+@pytest.fixture(autouse=True)
+def queue(monkeypatch):
+    monkeypatch.setattr(admission, "_waiting", {})
+    monkeypatch.setattr(admission, "_running", {})
+    monkeypatch.setattr(admission, "ADMISSION_MAX_JOBS_PER_USER", 1)
+
+
+def test_jobs_are_admitted_in_arrival_order():
+    admission._waiting.update({1: ("ann", 10 * MB), 2: ("bob", 10 * MB)})
+
+    assert _next_admissible(100 * MB) == 1
+
+
+def test_user_at_limit_is_skipped():
+    admission._running[1] = ("ann", 10 * MB)
+    admission._waiting.update({2: ("ann", 10 * MB), 3: ("bob", 10 * MB)})
+
+    assert _next_admissible(100 * MB) == 3
+
+
+def test_first_job_waits_for_memory():
+    admission._running[1] = ("ann", 60 * MB)
+    # The small job of carl does not overtake the large job of bob
+    admission._waiting.update({2: ("bob", 50 * MB), 3: ("carl", 10 * MB)})
+
+    assert _next_admissible(100 * MB) is None
+
+
+def test_oversized_job_is_admitted_once_nothing_runs():
+    admission._running[1] = ("ann", 10 * MB)
+    admission._waiting[2] = ("bob", 500 * MB)
+
+    assert _next_admissible(100 * MB) is None
+
+    del admission._running[1]
+
+    assert _next_admissible(100 * MB) == 2
+
+
+def test_no_budget_admits_every_user():
+    admission._running[1] = ("ann", 500 * MB)
+    admission._waiting[2] = ("bob", 500 * MB)
+
+    assert _next_admissible(0) == 2
+
+
+def test_admission_releases_the_budget(monkeypatch):
+    monkeypatch.setattr(admission, "get_memory_budget_bytes", lambda: 100 * MB)
+
+    with admission.admission("ann", 500 * MB) as waited_seconds:
+        assert waited_seconds >= 0
+        assert list(admission._running.values()) == [("ann", 500 * MB)]
+
+    assert admission._running == {}
+    assert admission._waiting == {}
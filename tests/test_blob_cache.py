@@ -0,0 +1,103 @@
+import types
+
+import pytest
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceModifiedError,
+    ResourceNotModifiedError,
+)
+
+import blob_cache
+import tracing
+
+
+class FakeDownload:
+    def __init__(self, data, etag):
+        self.data = data
+        self.properties = types.SimpleNamespace(etag=etag, last_modified="now")
+
+    def readinto(self, stream):
+        stream.write(self.data)
+        return len(self.data)
+
+
+class FakeFileClient:
+    """
+    Serves a file like Azure Data Lake Storage: a request with the current
+    ETag (If-None-Match) fails with `error` and `status_code`, as the SDK
+    raises a 304 as one of several exception types.
+    """
+
+    def __init__(self, data, etag, error=ResourceNotModifiedError, status_code=304):
+        self.data = data
+        self.etag = etag
+        self.error = error
+        self.status_code = status_code
+        self.requests = []
+
+    def download_file(self, etag=None, match_condition=None):
+        self.requests.append(etag)
+        if etag == self.etag:
+            error = self.error(message="The condition specified was not met.")
+            error.status_code = self.status_code
+            raise error
+        return FakeDownload(self.data, self.etag)
+
+
+class FakeServiceClient:
+    def __init__(self, file_client):
+        self.file_client = file_client
+
+    def get_file_system_client(self, file_system_name):
+        return self
+
+    def get_file_client(self, path):
+        return self.file_client
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_cache, "BLOB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(tracing, "METRICS_FILE", str(tmp_path / "metrics.jsonl"))
+
+
+def read_file(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize(
+    "error", [ResourceNotModifiedError, ResourceModifiedError, HttpResponseError]
+)
+def test_cached_file_is_revalidated(error):
+    file_client = FakeFileClient(b"a,b\n1,2\n", '"0x1"', error)
+    service_client = FakeServiceClient(file_client)
+
+    first_path = blob_cache.get_cached_file(service_client, "container", "a.parquet")
+    second_path = blob_cache.get_cached_file(service_client, "container", "a.parquet")
+
+    assert second_path == first_path
+    assert file_client.requests == [None, '"0x1"']
+    assert read_file(second_path) == b"a,b\n1,2\n"
+
+
+def test_changed_file_is_downloaded_again():
+    file_client = FakeFileClient(b"old", '"0x1"')
+    service_client = FakeServiceClient(file_client)
+    blob_cache.get_cached_file(service_client, "container", "a.parquet")
+
+    file_client.data, file_client.etag = b"new", '"0x2"'
+    path = blob_cache.get_cached_file(service_client, "container", "a.parquet")
+
+    assert read_file(path) == b"new"
+
+
+def test_other_errors_are_raised():
+    file_client = FakeFileClient(b"data", '"0x1"')
+    service_client = FakeServiceClient(file_client)
+    blob_cache.get_cached_file(service_client, "container", "a.parquet")
+
+    # e.g. a throttled request must not be mistaken for an unchanged file
+    file_client.error, file_client.status_code = HttpResponseError, 503
+    with pytest.raises(HttpResponseError):
+        blob_cache.get_cached_file(service_client, "container", "a.parquet")
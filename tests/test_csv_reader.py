@@ -0,0 +1,46 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from csv_reader import read_csv_duckdb, read_csv_pyarrow
+
+COLUMN_TYPES = {"Code": pa.string(), "Amount": pa.decimal128(16, 4)}
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect(database=":memory:")
+    yield con
+    con.close()
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / "upload.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def sniff(con, path):
+    cursor = con.execute(f"SELECT * FROM sniff_csv('{path}')")
+    names = [description[0] for description in cursor.description]
+    return dict(zip(names, cursor.fetchone()))
+
+
+def test_engines_read_the_yaml_types(con, tmp_path):
+    path = write_csv(tmp_path, "Code,Amount\n001,1.5\n002,2.25\n")
+
+    duckdb_table = read_csv_duckdb(con, path, column_types=COLUMN_TYPES)
+    pyarrow_table = read_csv_pyarrow(path, sniff(con, path), COLUMN_TYPES)
+
+    assert duckdb_table.schema == pyarrow_table.schema
+    assert duckdb_table.column("Code").to_pylist() == ["001", "002"]
+
+
+def test_mismatching_value_keeps_text_columns(con, tmp_path):
+    path = write_csv(tmp_path, "Code,Amount\n001,1.5\n002,x\n")
+
+    table = read_csv_duckdb(con, path, column_types=COLUMN_TYPES)
+
+    # Leading zeros survive, and the bad value is kept for the validation
+    assert table.column("Code").to_pylist() == ["001", "002"]
+    assert table.column("Amount").to_pylist() == ["1.5", "x"]
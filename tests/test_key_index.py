@@ -0,0 +1,78 @@
+import pyarrow as pa
+import pytest
+
+import key_index
+import submit_index
+from key_index import find_key_overlaps, forget_keys, record_keys
+from submit_index import record_submit
+
+KEY_COLUMNS = {"budgetsales": ["Country", "Year"]}
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(submit_index, "SUBMIT_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(key_index, "KEY_INDEX_DIR", str(tmp_path / "keys"))
+    monkeypatch.setattr(
+        key_index,
+        "get_report_key_columns",
+        lambda report_type: KEY_COLUMNS.get(report_type, []),
+    )
+
+
+def submit(blob_name, countries, years):
+    table = pa.table({"Country": countries, "Year": years})
+    record_submit("budgetsales", blob_name, blob_name, blob_name, table.num_rows)
+    record_keys("budgetsales", blob_name, table)
+
+
+def test_overlapping_rows_are_marked():
+    submit("files/budgetsales/a.parquet", ["BE", "NL", "LU"], [2024, 2024, 2024])
+    submit("files/budgetsales/b.parquet", ["BE"], [2025])
+    # An empty segment matches nothing
+    submit("files/budgetsales/empty.parquet", [], pa.array([], pa.int64()))
+
+    table = pa.table(
+        {
+            "Country": ["FR", "LU", "BE", "BE", "NL"],
+            # Keys are hashed as strings, so the type does not matter
+            "Year": ["2024", "2024", "2025", "2023", "2024"],
+        }
+    )
+    overlapping, overlaps = find_key_overlaps("budgetsales", table)
+
+    assert overlapping.tolist() == [False, True, True, False, True]
+    assert [
+        (overlap["blob_name"], overlap["overlapping_rows"]) for overlap in overlaps
+    ] == [("files/budgetsales/a.parquet", 2), ("files/budgetsales/b.parquet", 1)]
+
+
+def test_deleted_submit_does_not_overlap():
+    submit("files/budgetsales/a.parquet", ["BE"], [2024])
+    forget_keys(["files/budgetsales/a.parquet"])
+
+    overlapping, overlaps = find_key_overlaps(
+        "budgetsales", pa.table({"Country": ["BE"], "Year": [2024]})
+    )
+
+    assert overlapping.tolist() == [False]
+    assert overlaps == []
+
+
+def test_changed_key_definition_ignores_old_segments(monkeypatch):
+    submit("files/budgetsales/a.parquet", ["BE"], [2024])
+    monkeypatch.setitem(KEY_COLUMNS, "budgetsales", ["Country"])
+
+    overlapping, overlaps = find_key_overlaps(
+        "budgetsales", pa.table({"Country": ["BE"], "Year": [2024]})
+    )
+
+    assert overlapping.tolist() == [False]
+    assert overlaps == []
+
+
+def test_report_without_key_is_not_checked():
+    overlapping, overlaps = find_key_overlaps("other", pa.table({"Country": ["BE"]}))
+
+    assert overlapping is None
+    assert overlaps == []
@@ -0,0 +1,57 @@
+import duckdb
+import pytest
+
+import reference_data
+from reference_data import load_reference_tables, refresh_reference_data
+
+
+@pytest.fixture
+def seeds_dir(tmp_path, monkeypatch):
+    seeds_dir = tmp_path / "seeds"
+    seeds_dir.mkdir()
+    monkeypatch.setattr(reference_data, "SEEDS_DIR", str(seeds_dir))
+    monkeypatch.setattr(reference_data, "_reference_cache", {})
+    return seeds_dir
+
+
+def read_codes(database):
+    con = duckdb.connect(database)
+    try:
+        rows = con.execute("SELECT code FROM reference_countries ORDER BY code")
+        return [row[0] for row in rows.fetchall()]
+    finally:
+        con.close()
+
+
+def test_unchanged_reference_is_not_rewritten(seeds_dir, tmp_path):
+    (seeds_dir / "countries.csv").write_text("code\nBE\nNL\n")
+    database = str(tmp_path / "db.duckdb")
+    signatures = load_reference_tables(database, ["countries"])
+
+    con = duckdb.connect(database)
+    con.execute("INSERT INTO reference_countries VALUES ('LU')")
+    con.close()
+
+    assert load_reference_tables(database, ["countries"]) == signatures
+    assert read_codes(database) == ["BE", "LU", "NL"]
+
+
+def test_changed_reference_is_rewritten(seeds_dir, tmp_path):
+    (seeds_dir / "countries.csv").write_text("code\nBE\nNL\n")
+    database = str(tmp_path / "db.duckdb")
+    load_reference_tables(database, ["countries"])
+
+    (seeds_dir / "countries.csv").write_text("code\nFR\n")
+    refresh_reference_data()
+    load_reference_tables(database, ["countries"])
+
+    assert read_codes(database) == ["FR"]
+
+
+def test_new_database_gets_the_reference(seeds_dir, tmp_path):
+    (seeds_dir / "countries.csv").write_text("code\nBE\n")
+    load_reference_tables(str(tmp_path / "first.duckdb"), ["countries"])
+
+    load_reference_tables(str(tmp_path / "second.duckdb"), ["countries"])
+
+    assert read_codes(str(tmp_path / "second.duckdb")) == ["BE"]
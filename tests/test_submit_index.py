@@ -0,0 +1,46 @@
+import pytest
+
+import submit_index
+from submit_index import find_submit, forget_submits, read_submits, record_submit
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(submit_index, "SUBMIT_INDEX_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_deleted_submit_is_forgotten():
+    record_submit("budgetsales", "a1", "files/budgetsales/a.parquet", "a.csv", 2)
+    record_submit("budgetsales", "b2", "files/budgetsales/b.parquet", "b.csv", 3)
+
+    forget_submits(["files/budgetsales/a.parquet"])
+
+    assert list(read_submits("budgetsales")) == ["files/budgetsales/b.parquet"]
+    assert find_submit("budgetsales", "a1") is None
+    assert find_submit("budgetsales", "b2")["original_filename"] == "b.csv"
+
+
+def test_submit_after_delete_is_indexed_again():
+    blob_name = "files/budgetsales/a.parquet"
+    record_submit("budgetsales", "a1", blob_name, "a.csv", 2)
+    forget_submits([blob_name])
+
+    record_submit("budgetsales", "a1", blob_name, "a.csv", 2)
+
+    assert find_submit("budgetsales", "a1")["blob_name"] == blob_name
+
+
+def test_forget_without_index_writes_nothing(index_dir):
+    forget_submits(["files/budgetsales/a.parquet", "a.parquet"])
+
+    assert read_submits("budgetsales") == {}
+    assert list(index_dir.iterdir()) == []
+
+
+def test_invalid_lines_are_skipped(index_dir):
+    record_submit("budgetsales", "a1", "files/budgetsales/a.parquet", "a.csv", 2)
+    with open(index_dir / "budgetsales.jsonl", "a") as index_file:
+        index_file.write('{"blob_name": \n')
+
+    assert list(read_submits("budgetsales")) == ["files/budgetsales/a.parquet"]
@@ -0,0 +1,33 @@
+import pyarrow as pa
+
+from table_processing import cast_pyarrow_table_columns_to_types
+
+MODEL_DATA_TYPES = {"Code": "string", "Amount": "decimal(16,4)"}
+
+
+def test_columns_are_cast(capsys):
+    table = pa.table({"Code": ["001"], "Amount": pa.array([2], pa.int64())})
+
+    casted_table, all_column_type_matched = cast_pyarrow_table_columns_to_types(
+        table, MODEL_DATA_TYPES, []
+    )
+
+    assert all_column_type_matched
+    assert casted_table.schema.field("Amount").type == pa.decimal128(16, 4)
+    assert capsys.readouterr().out == ""
+
+
+def test_cast_errors_are_returned(capsys):
+    table = pa.table({"Code": ["001"], "Amount": ["x"]})
+    cast_errors = []
+
+    casted_table, all_column_type_matched = cast_pyarrow_table_columns_to_types(
+        table, MODEL_DATA_TYPES, cast_errors
+    )
+
+    assert not all_column_type_matched
+    assert casted_table.column("Amount").to_pylist() == ["x"]
+    assert len(cast_errors) == 1
+    assert "Error converting column 'Amount'" in cast_errors[0]
+    # Only the caller displays the errors
+    assert capsys.readouterr().out == ""
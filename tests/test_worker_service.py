@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+import worker_service
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, function, job_id, request):
+        self.jobs.append(request)
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(worker_service, "UPLOAD_DIR", str(upload_dir))
+    monkeypatch.setattr(worker_service, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(worker_service, "_executor", FakeExecutor())
+    return upload_dir
+
+
+def submit(upload_path):
+    return worker_service.submit_job(
+        {"upload_path": str(upload_path), "file_type": ".csv", "report_type": "x"}
+    )
+
+
+def test_upload_in_upload_dir_is_accepted(upload_dir):
+    upload_path = upload_dir / "upload.csv"
+    upload_path.write_text("a\n1\n")
+
+    submit(upload_path)
+
+    assert worker_service._executor.jobs[0]["upload_path"] == os.path.realpath(
+        upload_path
+    )
+
+
+def test_upload_outside_upload_dir_is_rejected(upload_dir, tmp_path):
+    outside_path = tmp_path / "secret.csv"
+    outside_path.write_text("a\n1\n")
+    (upload_dir / "link.csv").symlink_to(outside_path)
+
+    for upload_path in (
+        outside_path,
+        upload_dir / ".." / "secret.csv",
+        upload_dir / "link.csv",
+    ):
+        with pytest.raises(ValueError, match="Upload must be in"):
+            submit(upload_path)
+    assert worker_service._executor.jobs == []
+
+
+def test_expired_job_files_are_swept(upload_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(worker_service, "OUTPUT_DIR", str(tmp_path / "outputs"))
+    monkeypatch.setattr(worker_service, "_last_sweep", 0.0)
+    paths = {}
+    for directory in ("jobs", "uploads", "outputs"):
+        (tmp_path / directory).mkdir(exist_ok=True)
+        for age in ("old", "new"):
+            paths[directory, age] = tmp_path / directory / f"{age}.json"
+            paths[directory, age].write_text("{}")
+    expired = time.time() - worker_service.VALIDATION_JOB_MAX_AGE_SECONDS - 60
+    for directory in ("jobs", "uploads", "outputs"):
+        os.utime(paths[directory, "old"], (expired, expired))
+
+    worker_service.sweep_expired_jobs()
+
+    assert [key for key, path in paths.items() if path.exists()] == [
+        ("jobs", "new"),
+        ("uploads", "new"),
+        ("outputs", "new"),
+    ]
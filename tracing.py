@@ -0,0 +1,302 @@
+import collections
+import datetime
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages that are wrapped in spans
+STAGES = [
+    "ingest",
+    "clean",
+    "profile",
+    "cast",
+    "validate",
+    "keys",
+    "encode",
+    "upload",
+    "list",
+    "download",
+    "preview",
+    "query",
+    "export",
+]
+
+# Span output: JSON lines (one span per line) or an OpenMetrics text snapshot
+METRICS_FILE = os.getenv("METRICS_FILE") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_metrics.jsonl"
+)
+METRICS_FORMAT = os.getenv("METRICS_FORMAT", "jsonl").lower()
+
+# Number of recent spans kept in memory for the admin panel percentiles
+METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", "5000"))
+
+# Interval (seconds) at which the resident memory of the process is sampled
+# while at least one span is open
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("METRICS_MEMORY_SAMPLE_INTERVAL", "0.05"))
+
+_spans = collections.deque(maxlen=METRICS_BUFFER_SIZE)
+_counters = collections.Counter()
+_active_spans = {}
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_sampler_thread = None
+
+
+def current_rss_bytes():
+    """
+    Return the current resident set size of the process in bytes.
+
+    Returns:
+        int: The resident memory in bytes, or 0 if it cannot be determined.
+    """
+    try:
+        # Linux (including the Docker image): second field is resident pages
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+
+        # Fallback to the high-water mark (kilobytes on Linux, bytes on macOS)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+def _sample_memory():
+    # Runs in a daemon thread and records the highest RSS seen by every open span
+    global _sampler_thread
+    while True:
+        with _lock:
+            if not _active_spans:
+                _sampler_thread = None
+                return
+            rss = current_rss_bytes()
+            for record in _active_spans.values():
+                if rss > record["_peak_rss"]:
+                    record["_peak_rss"] = rss
+        time.sleep(MEMORY_SAMPLE_INTERVAL)
+
+
+def _ensure_sampler():
+    global _sampler_thread
+    if _sampler_thread is None:
+        _sampler_thread = threading.Thread(
+            target=_sample_memory, name="metrics-memory-sampler", daemon=True
+        )
+        _sampler_thread.start()
+
+
+@contextmanager
+def trace_stage(stage, **attributes):
+    """
+    Time a pipeline stage and record it as a span.
+
+    The yielded dictionary can be updated inside the block with attributes that
+    are only known at the end of the stage (e.g. ``rows`` or ``bytes``).
+
+    Args:
+        stage (str): The stage name, one of STAGES.
+        **attributes: Span attributes such as report_type, rows or bytes.
+
+    Yields:
+        dict: The span attributes, which can be extended by the caller.
+    """
+    span_attributes = dict(attributes)
+    rss_start = current_rss_bytes()
+    record = {"_peak_rss": rss_start}
+    span_id = id(record)
+
+    with _lock:
+        _active_spans[span_id] = record
+        _ensure_sampler()
+
+    status = "ok"
+    started_at = datetime.datetime.now().isoformat(timespec="milliseconds")
+    start = time.perf_counter()
+    try:
+        yield span_attributes
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        rss_end = current_rss_bytes()
+        with _lock:
+            _active_spans.pop(span_id, None)
+        peak_rss = max(record["_peak_rss"], rss_end)
+
+        record_span(
+            {
+                "stage": stage,
+                "started_at": started_at,
+                "duration_ms": round(duration_ms, 3),
+                "status": status,
+                "peak_memory_delta_bytes": max(peak_rss - rss_start, 0),
+                "memory_delta_bytes": rss_end - rss_start,
+                **span_attributes,
+            }
+        )
+
+
+def record_span(span):
+    """
+    Store a finished span in memory and write it to the metrics file.
+
+    Args:
+        span (dict): The span to record.
+    """
+    with _lock:
+        _spans.append(span)
+
+    try:
+        if METRICS_FORMAT == "openmetrics":
+            # Rewrite the snapshot so scrapers always see the full current state
+            snapshot = export_openmetrics()
+            with _write_lock, open(METRICS_FILE, "w") as metrics_file:
+                metrics_file.write(snapshot)
+        else:
+            with _write_lock, open(METRICS_FILE, "a") as metrics_file:
+                metrics_file.write(json.dumps(span, default=str) + "\n")
+    except OSError as e:
+        logging.error(f"Failed to write metrics: {e}")
+
+
+def get_spans(stage=None):
+    """
+    Return the spans kept in memory, optionally for a single stage.
+
+    Args:
+        stage (str, optional): Only return spans of this stage.
+
+    Returns:
+        list: A list of span dictionaries, oldest first.
+    """
+    with _lock:
+        spans = list(_spans)
+    if stage is not None:
+        spans = [span for span in spans if span["stage"] == stage]
+    return spans
+
+
+def increment_counter(name, value=1):
+    """
+    Add to a process-wide counter, e.g. cache hits or bytes saved.
+
+    Args:
+        name (str): The counter name, in snake case.
+        value (int): The amount to add.
+    """
+    with _lock:
+        _counters[name] += value
+
+
+def get_counters():
+    """
+    Return the current value of every counter.
+
+    Returns:
+        dict: Counter name -> value.
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def _percentile(sorted_values, percentile):
+    # Nearest-rank percentile on an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def stage_summary():
+    """
+    Summarise the recorded spans per stage.
+
+    Returns:
+        list: One dictionary per stage with count, p50/p95 latency (ms),
+            errors and the largest peak memory delta (bytes).
+    """
+    spans_by_stage = collections.defaultdict(list)
+    for span in get_spans():
+        spans_by_stage[span["stage"]].append(span)
+
+    summary = []
+    for stage in sorted(spans_by_stage, key=_stage_order):
+        spans = spans_by_stage[stage]
+        durations = sorted(span["duration_ms"] for span in spans)
+        summary.append(
+            {
+                "stage": stage,
+                "count": len(spans),
+                "errors": sum(span["status"] == "error" for span in spans),
+                "p50_ms": _percentile(durations, 50),
+                "p95_ms": _percentile(durations, 95),
+                "max_peak_memory_delta_bytes": max(
+                    span["peak_memory_delta_bytes"] for span in spans
+                ),
+            }
+        )
+    return summary
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def export_openmetrics():
+    """
+    Render the recorded spans in the OpenMetrics text exposition format.
+
+    Returns:
+        str: Summary metrics of stage latency and peak memory deltas.
+    """
+    lines = [
+        "# TYPE file_uploader_stage_duration_seconds summary",
+        "# UNIT file_uploader_stage_duration_seconds seconds",
+        "# HELP file_uploader_stage_duration_seconds Duration of pipeline stages.",
+    ]
+    memory_lines = [
+        "# TYPE file_uploader_stage_peak_memory_delta_bytes gauge",
+        "# UNIT file_uploader_stage_peak_memory_delta_bytes bytes",
+        "# HELP file_uploader_stage_peak_memory_delta_bytes "
+        "Largest peak memory increase observed during a stage.",
+    ]
+
+    for stage_stats in stage_summary():
+        stage = stage_stats["stage"]
+        durations = [span["duration_ms"] for span in get_spans(stage)]
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(
+                f'file_uploader_stage_duration_seconds{{stage="{stage}",'
+                f'quantile="{quantile}"}} {stage_stats[key] / 1000}'
+            )
+        lines.append(
+            f'file_uploader_stage_duration_seconds_sum{{stage="{stage}"}} '
+            f"{sum(durations) / 1000}"
+        )
+        lines.append(
+            f'file_uploader_stage_duration_seconds_count{{stage="{stage}"}} '
+            f"{stage_stats['count']}"
+        )
+        memory_lines.append(
+            f'file_uploader_stage_peak_memory_delta_bytes{{stage="{stage}"}} '
+            f"{stage_stats['max_peak_memory_delta_bytes']}"
+        )
+
+    counter_lines = []
+    for name, value in sorted(get_counters().items()):
+        counter_lines += [
+            f"# TYPE file_uploader_{name} counter",
+            f"file_uploader_{name}_total {value}",
+        ]
+
+    return "\n".join(lines + memory_lines + counter_lines + ["# EOF"]) + "\n"
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+# URL of the validation worker service; validations run in the Streamlit
+# process when it is not set
+VALIDATION_WORKER_URL = os.getenv("VALIDATION_WORKER_URL", "").rstrip("/")
+
+# Upload files are handed to the workers through this shared directory
+VALIDATION_SHARED_DIR = os.getenv("VALIDATION_SHARED_DIR") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_worker"
+)
+VALIDATION_UPLOAD_DIR = os.path.join(VALIDATION_SHARED_DIR, "uploads")
+
+VALIDATION_POLL_INTERVAL = float(os.getenv("VALIDATION_POLL_INTERVAL", "0.5"))
+VALIDATION_TIMEOUT = float(os.getenv("VALIDATION_TIMEOUT", "900"))
+
+
+def use_validation_worker():
+    return bool(VALIDATION_WORKER_URL)
+
+
+def _request(method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(
+        f"{VALIDATION_WORKER_URL}{path}",
+        data=data,
+        method=method,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        # The worker describes bad requests in the response body
+        try:
+            message = json.load(e).get("error", str(e))
+        except ValueError:
+            message = str(e)
+        raise RuntimeError(f"Validation worker error: {message}") from e
+
+
+def submit_validation(upload_path, file_type, report_type):
+    """
+    Dispatch the validation of an upload to the worker service.
+
+    Args:
+        upload_path (str): Path to the upload, readable by the workers.
+        file_type (str): Type of the file, e.g. '.csv', '.xlsx' or '.csv.gz'.
+        report_type (str): The report name as defined in the YAML configuration.
+
+    Returns:
+        str: The id of the validation job.
+    """
+    response = _request(
+        "POST",
+        "/jobs",
+        {
+            "upload_path": upload_path,
+            "file_type": file_type,
+            "report_type": report_type,
+        },
+    )
+    return response["job_id"]
+
+
+def get_validation_job(job_id):
+    """
+    Get the current state of a validation job.
+
+    Args:
+        job_id (str): The id of the validation job.
+
+    Returns:
+        dict: The job with its status and, once done, its result.
+    """
+    return _request("GET", f"/jobs/{job_id}")
+
+
+def wait_for_validation(job_id, timeout=None, poll_interval=None):
+    """
+    Poll a validation job until it is done or failed.
+
+    Args:
+        job_id (str): The id of the validation job.
+        timeout (float, optional): Seconds to wait; defaults to VALIDATION_TIMEOUT.
+        poll_interval (float, optional): Seconds between polls.
+
+    Returns:
+        dict: The finished job.
+
+    Raises:
+        TimeoutError: If the job did not finish in time.
+    """
+    deadline = time.monotonic() + (timeout or VALIDATION_TIMEOUT)
+    while True:
+        job = get_validation_job(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Validation job {job_id} did not finish in time.")
+        time.sleep(poll_interval or VALIDATION_POLL_INTERVAL)
@@ -0,0 +1,251 @@
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from compressed_files import SUPPORTED_FILE_TYPES
+
+# Validation worker: runs the pipeline for uploads referenced by path and
+# serves the job status over HTTP.
+#
+#   POST /jobs      {"upload_path": ..., "file_type": ".csv", "report_type": ...}
+#                   -> 202 {"job_id": ...}
+#   GET  /jobs/<id> -> {"status": "queued|running|done|failed", "result": {...}}
+#   GET  /health    -> {"status": "ok", "workers": n}
+#
+# Job files are kept in VALIDATION_SHARED_DIR, so any worker sharing that
+# directory (e.g. a mounted volume) can answer status requests.
+
+load_dotenv()
+
+# The worker has no authentication: it must only be reachable from the app.
+# Bind to a private interface (e.g. 0.0.0.0 inside a private network) only
+# when the app runs on another host.
+WORKER_HOST = os.getenv("VALIDATION_WORKER_HOST", "127.0.0.1")
+WORKER_PORT = int(os.getenv("VALIDATION_WORKER_PORT", "8600"))
+WORKER_PROCESSES = int(os.getenv("VALIDATION_WORKERS", str(os.cpu_count() or 1)))
+SHARED_DIR = os.getenv("VALIDATION_SHARED_DIR") or os.path.join(
+    tempfile.gettempdir(), "file_uploader_worker"
+)
+JOBS_DIR = os.path.join(SHARED_DIR, "jobs")
+# Jobs can only read uploads in this directory
+UPLOAD_DIR = os.path.join(SHARED_DIR, "uploads")
+OUTPUT_DIR = os.path.join(SHARED_DIR, "outputs")
+
+# Job states, uploads and outputs older than this are removed; the app polls a
+# job for at most VALIDATION_TIMEOUT and then moves its output away
+VALIDATION_JOB_MAX_AGE_SECONDS = int(
+    os.getenv("VALIDATION_JOB_MAX_AGE_SECONDS", "3600")
+)
+# Minimum interval between two sweeps of the shared directory
+SWEEP_INTERVAL_SECONDS = 60
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_executor = None
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def job_file_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def write_job(job_id, job):
+    """
+    Atomically write the state of a job to the shared jobs directory.
+
+    Args:
+        job_id (str): The job id.
+        job (dict): The job state.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    partial_path = f"{job_file_path(job_id)}.{uuid.uuid4().hex}.partial"
+    with open(partial_path, "w") as job_file:
+        json.dump(job, job_file, default=str)
+    os.replace(partial_path, job_file_path(job_id))
+
+
+def read_job(job_id):
+    """
+    Read the state of a job.
+
+    Args:
+        job_id (str): The job id.
+
+    Returns:
+        dict: The job state, or None if the job does not exist.
+    """
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(job_file_path(job_id)) as job_file:
+            return json.load(job_file)
+    except FileNotFoundError:
+        return None
+
+
+def init_worker_process():
+    # The pipeline resolves the dbt project and YAML files from the app directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    from startup import start_warmup
+
+    start_warmup()
+
+
+def run_job(job_id, request):
+    # Runs in a worker process; the pipeline is imported there, not in the server
+    from pipeline import validate_upload
+
+    write_job(job_id, {**request, "status": "running"})
+    try:
+        result = validate_upload(
+            request["upload_path"],
+            request["file_type"],
+            request["report_type"],
+            OUTPUT_DIR,
+        )
+    except Exception as e:
+        logging.error(f"Validation job {job_id} failed: {traceback.format_exc()}")
+        write_job(job_id, {**request, "status": "failed", "error": str(e)})
+        return
+    write_job(job_id, {**request, "status": "done", "result": result})
+
+
+def sweep_expired_jobs():
+    """
+    Delete the job states, uploads and outputs in the shared directory that
+    are older than VALIDATION_JOB_MAX_AGE_SECONDS, e.g. of app sessions that
+    ended before they loaded the result of their job.
+    """
+    global _last_sweep
+    with _sweep_lock:
+        if time.time() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        _last_sweep = time.time()
+
+    for directory in (JOBS_DIR, UPLOAD_DIR, OUTPUT_DIR):
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            try:
+                age_seconds = time.time() - entry.stat().st_mtime
+                if entry.is_file() and age_seconds > VALIDATION_JOB_MAX_AGE_SECONDS:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+
+def submit_job(request):
+    """
+    Queue a validation job on the process pool.
+
+    Args:
+        request (dict): The upload_path, file_type and report_type of the upload.
+
+    Returns:
+        str: The job id.
+
+    Raises:
+        ValueError: If the request is missing a field, or the upload does not
+            exist or is outside the shared uploads directory.
+    """
+    for field in ("upload_path", "file_type", "report_type"):
+        if not request.get(field):
+            raise ValueError(f"Missing field: {field}")
+    # Resolve symbolic links and '..', so a job cannot read any other file
+    upload_dir = os.path.realpath(UPLOAD_DIR)
+    upload_path = os.path.realpath(request["upload_path"])
+    if os.path.commonpath([upload_dir, upload_path]) != upload_dir:
+        raise ValueError(f"Upload must be in {UPLOAD_DIR}: {request['upload_path']}")
+    request = {**request, "upload_path": upload_path}
+    if request["file_type"] not in SUPPORTED_FILE_TYPES:
+        raise ValueError(
+            f"Unsupported file type provided. Use one of {SUPPORTED_FILE_TYPES}."
+        )
+    if not os.path.exists(request["upload_path"]):
+        raise ValueError(f"Upload not found: {request['upload_path']}")
+
+    sweep_expired_jobs()
+    job_id = uuid.uuid4().hex
+    request = {key: request[key] for key in ("upload_path", "file_type", "report_type")}
+    write_job(job_id, {**request, "status": "queued"})
+    _executor.submit(run_job, job_id, request)
+    return job_id
+
+
+class WorkerRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "workers": WORKER_PROCESSES})
+        elif self.path.startswith("/jobs/"):
+            job = read_job(self.path[len("/jobs/") :])
+            if job is None:
+                self._send_json(404, {"error": "Job not found"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job_id = submit_job(json.loads(self.rfile.read(length) or b"{}"))
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(202, {"job_id": job_id})
+
+    def log_message(self, message_format, *args):
+        logging.info(f"{self.address_string()} {message_format % args}")
+
+
+def main():
+    global _executor
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(JOBS_DIR, exist_ok=True)
+
+    # dbt and DuckDB are not fork-safe, so worker processes are spawned
+    _executor = ProcessPoolExecutor(
+        max_workers=WORKER_PROCESSES,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker_process,
+    )
+    server = ThreadingHTTPServer((WORKER_HOST, WORKER_PORT), WorkerRequestHandler)
+    logging.info(
+        f"Validation worker listening on {WORKER_HOST}:{WORKER_PORT} "
+        f"with {WORKER_PROCESSES} processes, shared directory {SHARED_DIR}"
+    )
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()